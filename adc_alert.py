@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+ADS1115 ALERT/RDY Pin
+Edge detectie op de ALERT/RDY uitgang van de ADS1115 via een GPIO ingang
+
+De ALERT/RDY uitgang is open-drain en actief laag; de GPIO gebruikt de
+interne pull-up. Adafruit_BBIO bewaakt de pin met epoll in een eigen
+thread, zodat er geen CPU tijd aan pollen besteed wordt. De pin dient
+voor comparator alarmen en als conversion-ready signaal in continuous mode.
+
+Aansluiting (standaard):
+- ADS1115 ALERT/RDY -> P9_15
+"""
+
+import time
+import threading
+try:
+    import Adafruit_BBIO.GPIO as GPIO
+except ImportError:
+    print("Waarschuwing: Adafruit_BBIO niet gevonden. ALERT/RDY pin in test modus...")
+    GPIO = None
+
+
+DEFAULT_ALERT_PIN = "P9_15"
+
+
+class AlertPin:
+    """GPIO ingang met edge events voor de ADS1115 ALERT/RDY uitgang"""
+
+    def __init__(self, gpio_pin=DEFAULT_ALERT_PIN, callback=None):
+        """
+        Initialiseer ALERT/RDY ingang
+
+        Args:
+            gpio_pin: BeagleBone GPIO pin (default P9_15)
+            callback: Optionele functie callback(edge_time) die vanuit de
+                      GPIO event thread aangeroepen wordt bij elke
+                      dalende flank (time.monotonic() tijdstip)
+        """
+        self.gpio_pin = gpio_pin
+        self.callback = callback
+        self.available = False
+        self.last_edge = None
+        self.edge_count = 0
+        self._ready = threading.Event()
+
+        try:
+            if GPIO:
+                GPIO.setup(self.gpio_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+                GPIO.add_event_detect(self.gpio_pin, GPIO.FALLING,
+                                      callback=self._on_edge)
+                self.available = True
+                print(f"✓ ALERT/RDY ingang geïnitialiseerd op {gpio_pin}")
+            else:
+                print("⚠ Test modus: ALERT/RDY ingang niet geïnitialiseerd")
+
+        except Exception as e:
+            print(f"✗ Fout bij initialiseren ALERT/RDY ingang: {e}")
+
+    def _on_edge(self, _pin):
+        """Edge handler (GPIO event thread)"""
+        self.last_edge = time.monotonic()
+        self.edge_count += 1
+        self._ready.set()
+        if self.callback:
+            try:
+                self.callback(self.last_edge)
+            except Exception as e:
+                print(f"✗ Fout in ALERT callback: {e}")
+
+    def clear(self):
+        """Vergeet eerdere flanken (voor wait_edge)"""
+        self._ready.clear()
+
+    def wait_edge(self, timeout):
+        """
+        Wacht op de volgende dalende flank
+
+        Args:
+            timeout: Maximale wachttijd in seconden
+
+        Returns:
+            time.monotonic() tijdstip van de flank, of None bij timeout
+        """
+        if not self._ready.wait(timeout):
+            return None
+        self._ready.clear()
+        return self.last_edge
+
+    def cleanup(self):
+        """Cleanup GPIO resources"""
+        if GPIO and self.available:
+            try:
+                GPIO.remove_event_detect(self.gpio_pin)
+                GPIO.cleanup(self.gpio_pin)
+            except Exception as e:
+                print(f"✗ Fout bij cleanup ALERT/RDY ingang: {e}")
+        self.available = False
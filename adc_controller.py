@@ -5,23 +5,156 @@ ADS1115 ADC Controller
 """
 
 import time
+import threading
+import numpy as np
+from adc_statistics import OnlineStatistics
+from adc_filters import create_filter
+from channel_alignment import align_samples
+from adc_alert import AlertPin, DEFAULT_ALERT_PIN
+from i2c_transport import get_transport, I2CError
+from i2c_trace import WRITE, READ, WRITE_READ
 try:
     import board
     import busio
     import adafruit_ads1x15.ads1115 as ADS
+    from adafruit_ads1x15.ads1x15 import Mode
     from adafruit_ads1x15.analog_in import AnalogIn
 except ImportError:
     print("Waarschuwing: Adafruit ADS1x15 library niet gevonden. Test modus...")
     board = None
     ADS = None
+    Mode = None
     AnalogIn = None
 
 
+class _ScanSchedule:
+    """Kiest het volgende kanaal in een scan op basis van per-kanaal rates"""
+    
+    def __init__(self, channels, rates=None):
+        """
+        Args:
+            channels: Kanaal nummers in scan volgorde
+            rates: Optionele dict {kanaal: samples per seconde}
+        """
+        self.channels = tuple(dict.fromkeys(channels))
+        for channel in self.channels:
+            if channel not in range(4):
+                raise ValueError(f"Ongeldig kanaal: {channel}")
+        rates = rates or {}
+        self.periods = {ch: (1.0 / rates[ch] if rates.get(ch) else 0.0)
+                        for ch in self.channels}
+        self.due = {ch: 0.0 for ch in self.channels}
+        self._order = 0
+    
+    def next(self, now):
+        """
+        Kies het volgende kanaal en reserveer zijn sample moment
+        
+        Kanalen die aan de beurt zijn gaan round-robin; anders het kanaal
+        dat het eerst aan de beurt komt.
+        
+        Args:
+            now: Huidige time.monotonic() tijd
+            
+        Returns:
+            Tuple (kanaal, start): start is het vroegste tijdstip voor de
+            conversie (in het verleden = direct)
+        """
+        n = len(self.channels)
+        chosen = None
+        for k in range(n):
+            channel = self.channels[(self._order + k) % n]
+            if self.due[channel] <= now:
+                chosen = channel
+                self._order = (self._order + k + 1) % n
+                break
+        if chosen is None:
+            chosen = min(self.channels, key=self.due.get)
+        
+        start = self.due[chosen]
+        period = self.periods[chosen]
+        if period:
+            # Vast raster; na een achterstand niet inhalen maar opnieuw beginnen
+            self.due[chosen] = max(start + period, now)
+        return chosen, start
+    
+    def defer(self, channel, start):
+        """Maak een reservering ongedaan (kanaal is nog niet gesampled)"""
+        self.due[channel] = start
+
+
+class ChannelConfig:
+    """Logische ADC ingang met voorgecompileerd config woord"""
+    
+    def __init__(self, name, pos, neg=None, gain=1, data_rate=128):
+        """
+        Args:
+            name: Naam of nummer waaronder de ingang geregistreerd is
+            pos: Positieve ingang (0-3)
+            neg: Negatieve ingang voor een differentieel paar, of None
+                 voor single-ended (t.o.v. GND)
+            gain: PGA gain
+            data_rate: ADS1115 data rate
+        """
+        self.name = name
+        self.pos = pos
+        self.neg = neg
+        self.gain = gain
+        self.data_rate = data_rate
+        
+        # Ingevuld door ADCController._compile_input
+        self.config = 0
+        self.lsb = 0.0
+        self.conversion_time = 0.0
+    
+    @property
+    def differential(self):
+        """True voor een differentieel paar"""
+        return self.neg is not None
+
+
 class ADCController:
     """Controller voor ADS1115 16-bit ADC"""
     
     # ADS1115 configuratie
-    GAIN = 1  # Gain 1 = +/- 4.096V range
+    GAIN = 1  # Gain 1 = +/- 4.096V range (standaard voor elk kanaal)
+    GAINS = (2/3, 1, 2, 4, 8, 16)
+    DEFAULT_DATA_RATE = 128  # Samples per seconde (ADS1115 default)
+    DATA_RATES = (8, 16, 32, 64, 128, 250, 475, 860)
+    MAX_DATA_RATE = 860
+    
+    # Full-scale bereik per PGA gain instelling (Volt)
+    PGA_RANGE = {2/3: 6.144, 1: 4.096, 2: 2.048, 4: 1.024, 8: 0.512, 16: 0.256}
+    
+    # ADS1115 registers en config bits (datasheet tabel 8)
+    REG_CONVERSION = 0x00
+    REG_CONFIG = 0x01
+    REG_LO_THRESH = 0x02
+    REG_HI_THRESH = 0x03
+    CONFIG_OS_SINGLE = 0x8000
+    CONFIG_MODE_SINGLE = 0x0100
+    CONFIG_COMP_DISABLE = 0x0003
+    CONFIG_COMP_WINDOW = 0x0010
+    CONFIG_COMP_LATCH = 0x0004
+    COMP_QUEUE_BITS = {1: 0x0000, 2: 0x0001, 4: 0x0002}  # Conversies voor ALERT
+    COMP_REARM_INTERVAL = 0.05  # Poll interval (s) voor het herwapenen na een alarm
+    MUX_SINGLE_ENDED = {0: 0x4000, 1: 0x5000, 2: 0x6000, 3: 0x7000}
+    MUX_DIFFERENTIAL = {(0, 1): 0x0000, (0, 3): 0x1000, (1, 3): 0x2000, (2, 3): 0x3000}
+    GAIN_BITS = {2/3: 0x0000, 1: 0x0200, 2: 0x0400, 4: 0x0600, 8: 0x0800, 16: 0x0A00}
+    RATE_BITS = {8: 0x0000, 16: 0x0020, 32: 0x0040, 64: 0x0060,
+                 128: 0x0080, 250: 0x00A0, 475: 0x00C0, 860: 0x00E0}
+    
+    # Auto-ranging drempels (fractie van full-scale)
+    AUTORANGE_CLIP = 0.9      # Boven deze waarde direct naar het grootste bereik
+    AUTORANGE_UP = 0.4        # Onder deze fractie van het volgende bereik: gain omhoog
+    AUTORANGE_HOLD = 3        # Aantal blokken onder de drempel voor gain omhoog
+    
+    # Pauze na een I2C fout in de stream/scan loop (s)
+    I2C_ERROR_PAUSE = 0.01
+    
+    # Marge op de conversietijd (interne oscillator +/- 10%)
+    CONVERSION_MARGIN = 1.1
+    CONVERSION_OVERHEAD = 0.00005  # Wake-up tijd in single-shot mode (s)
     
     def __init__(self, i2c_bus=2, address=0x48):
         """
@@ -34,22 +167,75 @@ class ADCController:
         self.i2c_bus = i2c_bus
         self.address = address
         self.adc = None
-        self.channels = {}
+        self.channels = {}  # AnalogIn per kanaal (continuous mode via de driver)
+        self.inputs = {}    # Kanaal register: naam -> ChannelConfig
+        
+        # Hardware toegang is exclusief (stream thread en directe reads)
+        self._lock = threading.RLock()
+        
+        # Continue acquisitie
+        self.streaming = False
+        self.stream_thread = None
+        self.stream_channel = None
+        self._block_listeners = []
+        
+        # Multi-channel scan
+        self.scanning = False
+        self.scan_thread = None
+        self.scan_channels = ()
+        self._frame_listeners = []
+        
+        # Kanalen die een nieuwe acquisitie moet blijven meten (protection)
+        self.protected_channels = ()
+        
+        # Comparator en ALERT/RDY pin
+        self.alert_pin = None
+        self._comparator = None       # Actieve comparator instelling (dict)
+        self._rearm_thread = None     # Wacht na een alarm tot de ingang terug is
+        self._alert_listeners = []
+        self._use_ready_pin = False   # RDY pin voor de stream pacing
+        self._ready_mode = False      # ALERT/RDY staat op conversion-ready
+        
+        # Voorgealloceerde I2C buffers voor directe register toegang
+        self._tx_buf = bytearray(3)
+        self._ptr_buf = bytearray([self.REG_CONVERSION])
+        self._rx_buf = bytearray(2)
+        
+        # Transactie beschrijving voor de I2C tracer (adres, richting, bytes)
+        self._trace_write = (address, WRITE, 3)
+        self._trace_conversion = (address, WRITE_READ, 3)
+        self._trace_value = (address, READ, 2)
+        
+        # PGA gain per kanaal en de bijbehorende Volt per LSB
+        self.channel_gains = {ch: self.GAIN for ch in range(4)}
+        self.channel_lsb = {ch: self.PGA_RANGE[self.GAIN] / 32768.0 for ch in range(4)}
+        self._lsb_array = np.array([self.channel_lsb[ch] for ch in range(4)])
+        self._autorange = {}  # kanaal -> dict met min/max gain en hold teller
+        
+        # Single-ended kanalen 0-3 staan altijd in het register
+        for ch in range(4):
+            self.register_input(ch, ch)
+        
+        # Lopende statistiek per kanaal (O(1) geheugen)
+        full_scale = self.PGA_RANGE[self.GAIN]
+        self.statistics = {ch: OnlineStatistics(-full_scale, full_scale)
+                           for ch in range(4)}
+        
+        # Totaal aantal gelezen samples per kanaal (voor metrics, niet te resetten)
+        self.sample_counts = {ch: 0 for ch in range(4)}
+        
+        # Decimatie filters per kanaal en hun laatste output
+        self.filters = {}
+        self.filtered_values = {}
+        self._filtered_listeners = []
+        
+        # Gedeelde I2C transactie laag (retries, breaker, bus recovery)
+        self.transport = get_transport(i2c_bus)
         
         try:
             if board and ADS:
-                # Initialiseer I2C direct met bus 2 (P9_19 = SCL, P9_20 = SDA)
-                # BeagleBone Black I2C-2 bus (/dev/i2c-2)
-                from board import SCL, SDA
-                i2c = busio.I2C(SCL, SDA)
-                self.adc = ADS.ADS1115(i2c, address=address, gain=self.GAIN)
-                
-                # Configureer alle 4 single-ended kanalen
-                # AnalogIn accepteert integers 0-3 als kanaal nummers
-                self.channels[0] = AnalogIn(self.adc, 0)
-                self.channels[1] = AnalogIn(self.adc, 1)
-                self.channels[2] = AnalogIn(self.adc, 2)
-                self.channels[3] = AnalogIn(self.adc, 3)
+                self._connect()
+                self.transport.add_reinit(self._reconnect)
                 
                 print(f"✓ ADS1115 ADC geïnitialiseerd op adres 0x{address:02X}")
             else:
@@ -59,6 +245,27 @@ class ADCController:
             print(f"✗ Fout bij initialiseren ADC: {e}")
             self.adc = None
     
+    def _connect(self):
+        """Maak verbinding met de ADS1115 en configureer de kanalen"""
+        # Initialiseer I2C direct met bus 2 (P9_19 = SCL, P9_20 = SDA)
+        # BeagleBone Black I2C-2 bus (/dev/i2c-2)
+        from board import SCL, SDA
+        i2c = busio.I2C(SCL, SDA)
+        self.adc = ADS.ADS1115(i2c, address=self.address, gain=self.GAIN)
+        
+        # Configureer alle 4 single-ended kanalen
+        # AnalogIn accepteert integers 0-3 als kanaal nummers
+        self.channels[0] = AnalogIn(self.adc, 0)
+        self.channels[1] = AnalogIn(self.adc, 1)
+        self.channels[2] = AnalogIn(self.adc, 2)
+        self.channels[3] = AnalogIn(self.adc, 3)
+    
+    def _reconnect(self):
+        """Herinitialiseer na een I2C bus recovery (comparator en stream herstellen zich)"""
+        with self._lock:
+            self._connect()
+            self._release_library_state()
+    
     def read_channel(self, channel):
         """
         Lees één ADC kanaal
@@ -74,13 +281,18 @@ class ADCController:
             return 1.23 + (channel * 0.1)
         
         try:
-            if channel in self.channels:
-                voltage = self.channels[channel].voltage
+            if channel in range(4):
+                voltage = self.read_input(channel)
+                self.statistics[channel].add(voltage)
+                self.sample_counts[channel] += 1
                 return voltage
             else:
                 print(f"✗ Ongeldig kanaal: {channel}")
                 return 0.0
                 
+        except I2CError as e:
+            self.transport.log_error(f"lezen kanaal {channel}", e)
+            return 0.0
         except Exception as e:
             print(f"✗ Fout bij lezen kanaal {channel}: {e}")
             return 0.0
@@ -99,29 +311,1117 @@ class ADCController:
             return 1000 + (channel * 100)
         
         try:
-            if channel in self.channels:
-                raw_value = self.channels[channel].value
-                return raw_value
+            if channel in range(4):
+                return self.read_input_raw(channel)
             else:
                 print(f"✗ Ongeldig kanaal: {channel}")
                 return 0
                 
+        except I2CError as e:
+            self.transport.log_error(f"lezen kanaal {channel}", e)
+            return 0
         except Exception as e:
             print(f"✗ Fout bij lezen kanaal {channel}: {e}")
             return 0
     
+    def register_input(self, name, pos, neg=None, gain=None, data_rate=DEFAULT_DATA_RATE):
+        """
+        Registreer een logische ingang in het kanaal register
+        
+        Het config woord (mux, gain, data rate, single-shot start) wordt
+        hier één keer berekend; een read is daarna alleen een register
+        write, een wachttijd en een register read.
+        
+        Args:
+            name: Naam van de ingang (kanalen 0-3 zijn al geregistreerd)
+            pos: Positieve ingang (0-3)
+            neg: Negatieve ingang voor een differentieel paar (None = GND)
+            gain: PGA gain (default: GAIN, of de kanaal gain voor 0-3)
+            data_rate: ADS1115 data rate
+            
+        Returns:
+            ChannelConfig van de ingang
+        """
+        if neg is None and pos not in self.MUX_SINGLE_ENDED:
+            raise ValueError(f"Ongeldig kanaal: {pos}")
+        if neg is not None and (pos, neg) not in self.MUX_DIFFERENTIAL:
+            raise ValueError(f"Ongeldig differentieel paar: {pos}-{neg} "
+                             f"(kies uit {list(self.MUX_DIFFERENTIAL)})")
+        if data_rate not in self.DATA_RATES:
+            raise ValueError(f"Data rate moet een van {self.DATA_RATES} zijn")
+        if gain is None:
+            gain = self.channel_gains[name] if name in self.channel_gains else self.GAIN
+        if gain not in self.GAINS:
+            raise ValueError(f"Gain moet een van {self.GAINS} zijn")
+        
+        entry = ChannelConfig(name, pos, neg, gain, data_rate)
+        self._compile_input(entry)
+        self.inputs[name] = entry
+        return entry
+    
+    def unregister_input(self, name):
+        """Verwijder een ingang uit het register (kanalen 0-3 blijven)"""
+        if name in range(4):
+            raise ValueError("Single-ended kanalen 0-3 kunnen niet verwijderd worden")
+        self.inputs.pop(name, None)
+    
+    def _compile_input(self, entry):
+        """Bereken config woord, Volt per LSB en conversietijd van een ingang"""
+        mux = (self.MUX_SINGLE_ENDED[entry.pos] if entry.neg is None
+               else self.MUX_DIFFERENTIAL[(entry.pos, entry.neg)])
+        entry.config = (self.CONFIG_OS_SINGLE | mux | self.GAIN_BITS[entry.gain] |
+                        self.CONFIG_MODE_SINGLE | self.RATE_BITS[entry.data_rate] |
+                        self.CONFIG_COMP_DISABLE)
+        entry.lsb = self.PGA_RANGE[entry.gain] / 32768.0
+        entry.conversion_time = self._conversion_time(entry.data_rate)
+    
+    def read_input_raw(self, name):
+        """
+        Lees een geregistreerde ingang (ruwe waarde, single-shot)
+        
+        Args:
+            name: Naam van de ingang
+            
+        Returns:
+            Ruwe ADC waarde (16-bit signed)
+        """
+        entry = self.inputs[name]
+        if not self.adc:
+            return 4000 if entry.differential else 1000 + (entry.pos * 100)
+        
+        with self._lock:
+            self._write_config_word(entry.config)
+            self._wait_until(time.monotonic() + entry.conversion_time)
+            raw = self._read_conversion()
+            self._release_library_state()
+        return raw
+    
+    def read_input(self, name):
+        """
+        Lees een geregistreerde ingang
+        
+        Args:
+            name: Naam van de ingang
+            
+        Returns:
+            Spanning in Volt
+        """
+        entry = self.inputs[name]
+        if not self.adc:
+            # Test modus - dummy waarden als voorheen
+            return 0.5 if entry.differential else 1.23 + (entry.pos * 0.1)
+        return self.read_input_raw(name) * entry.lsb
+    
+    def raw_to_voltage(self, raw, channel=None):
+        """
+        Converteer ruwe ADC waarde(n) naar spanning
+        
+        Ruwe waarden in een blok zijn altijd opgenomen met de gain die het
+        kanaal heeft op het moment dat het blok verwerkt wordt; gain
+        wijzigingen (ook door auto-ranging) gaan pas in tussen blokken.
+        
+        Args:
+            raw: Ruwe 16-bit waarde of numpy array met waarden
+            channel: Kanaal nummer (0-3) voor de gain, of None voor de
+                     standaard gain (GAIN)
+            
+        Returns:
+            Spanning in Volt (float of numpy array)
+        """
+        if channel is None:
+            return raw * (self.PGA_RANGE[self.GAIN] / 32768.0)
+        return raw * self.channel_lsb[channel]
+    
+    def frame_to_voltage(self, channels, raw):
+        """
+        Converteer een interleaved scan frame naar spanning
+        
+        Args:
+            channels: Kanaal nummer per sample (numpy array)
+            raw: Ruwe waarde per sample (numpy array)
+            
+        Returns:
+            numpy array met spanningen
+        """
+        return raw * self._lsb_array[channels]
+    
+    def set_channel_gain(self, channel, gain):
+        """
+        Stel de PGA gain van een kanaal in
+        
+        Args:
+            channel: Kanaal nummer (0-3)
+            gain: Een van GAINS (2/3 = +/-6.144V ... 16 = +/-0.256V)
+        """
+        if channel not in range(4):
+            raise ValueError(f"Ongeldig kanaal: {channel}")
+        if gain not in self.GAINS:
+            raise ValueError(f"Gain moet een van {self.GAINS} zijn")
+        self.channel_gains[channel] = gain
+        self.channel_lsb[channel] = self.PGA_RANGE[gain] / 32768.0
+        self._lsb_array[channel] = self.channel_lsb[channel]
+        
+        entry = self.inputs[channel]
+        entry.gain = gain
+        self._compile_input(entry)
+        
+        # Filter toestand in ruwe codes hoort bij de oude gain
+        filt = self.filters.get(channel)
+        if filt is not None:
+            filt.reset()
+    
+    def get_channel_gain(self, channel):
+        """Huidige PGA gain van een kanaal"""
+        return self.channel_gains[channel]
+    
+    def set_autorange(self, channel, enabled=True, min_gain=1, max_gain=16):
+        """
+        Schakel automatische gain keuze in voor een kanaal
+        
+        Na elk blok wordt de hoogste gain gekozen waarbij het signaal niet
+        clipt. Bij clipping gaat het kanaal direct naar min_gain; een
+        hogere gain wordt pas gekozen na AUTORANGE_HOLD rustige blokken.
+        De gain zit in het config woord van elke conversie, dus schakelen
+        kost geen extra I2C transacties in een scan.
+        
+        Args:
+            channel: Kanaal nummer (0-3)
+            enabled: True = auto-ranging aan
+            min_gain: Laagste gain (grootste bereik); 1 = +/-4.096V past
+                      bij de 3.3V voeding
+            max_gain: Hoogste gain (kleinste bereik)
+        """
+        if channel not in range(4):
+            raise ValueError(f"Ongeldig kanaal: {channel}")
+        if not enabled:
+            self._autorange.pop(channel, None)
+            return
+        if min_gain not in self.GAINS or max_gain not in self.GAINS:
+            raise ValueError(f"Gain moet een van {self.GAINS} zijn")
+        self._autorange[channel] = {"min": min_gain, "max": max_gain, "hold": 0}
+    
+    def _select_gain(self, gain):
+        """Zet de PGA gain van de driver (alleen een register write bij wijziging)"""
+        if self.adc.gain != gain:
+            self.adc.gain = gain
+    
+    def _update_autorange(self, channel, raw):
+        """
+        Kies een nieuwe gain op basis van de piekwaarde van een blok
+        
+        Args:
+            channel: Kanaal nummer (0-3)
+            raw: Ruwe waarden van het laatste blok
+        """
+        state = self._autorange.get(channel)
+        if state is None or len(raw) == 0:
+            return
+        
+        peak = int(np.max(np.abs(raw.astype(np.int32))))
+        gain = self.channel_gains[channel]
+        
+        if peak >= self.AUTORANGE_CLIP * 32767:
+            state["hold"] = 0
+            if gain != state["min"]:
+                self.set_channel_gain(channel, state["min"])
+            return
+        
+        # Hoogste gain waarin de piek ruim past
+        peak_volts = peak * self.channel_lsb[channel]
+        best = gain
+        for candidate in self.GAINS:
+            if (gain < candidate <= state["max"] and
+                    peak_volts < self.AUTORANGE_UP * self.PGA_RANGE[candidate]):
+                best = candidate
+        
+        if best == gain:
+            state["hold"] = 0
+            return
+        
+        state["hold"] += 1
+        if state["hold"] >= self.AUTORANGE_HOLD:
+            state["hold"] = 0
+            self.set_channel_gain(channel, best)
+    
+    def capture_block(self, channel, n_samples, data_rate=MAX_DATA_RATE,
+                      trigger=None, trigger_index=0):
+        """
+        Neem een blok samples op in continuous mode
+        
+        De ADS1115 wordt tijdelijk in continuous mode gezet zodat elke
+        read alleen het conversie register uitleest (geen config write
+        en geen wachttijd per sample). Na afloop wordt single-shot mode
+        met de standaard data rate hersteld.
+        
+        Args:
+            channel: Kanaal nummer (0-3)
+            n_samples: Aantal samples
+            data_rate: ADS1115 data rate in samples per seconde (max 860)
+            trigger: Optionele functie die aangeroepen wordt vlak voor
+                     sample trigger_index (bijv. een DAC write), zodat de
+                     actie op dezelfde tijdbasis als de samples ligt
+            trigger_index: Sample index waarop trigger aangeroepen wordt
+            
+        Returns:
+            Tuple (timestamps, raw): numpy arrays met time.monotonic()
+            tijdstempels (float64) en ruwe ADC waarden (int16)
+        """
+        if data_rate not in self.DATA_RATES:
+            raise ValueError(f"Data rate moet een van {self.DATA_RATES} zijn")
+        if channel not in range(4):
+            raise ValueError(f"Ongeldig kanaal: {channel}")
+        
+        timestamps = np.empty(n_samples, dtype=np.float64)
+        raw = np.empty(n_samples, dtype=np.int16)
+        
+        with self._lock:
+            try:
+                self._start_continuous(channel, data_rate)
+                self._read_continuous(channel, timestamps, raw, time.monotonic(),
+                                      1.0 / data_rate, trigger, trigger_index)
+            finally:
+                self._stop_continuous()
+        
+        # Geen auto-ranging: de aanroeper rekent raw om met de huidige gain
+        self._dispatch_block(channel, timestamps, raw, autorange=False)
+        return timestamps, raw
+    
+    def _start_continuous(self, channel, data_rate):
+        """Zet de ADS1115 in continuous mode op een kanaal"""
+        if not self.adc:
+            return
+        
+        self.adc.data_rate = data_rate
+        self._select_gain(self.channel_gains[channel])
+        self.adc.mode = Mode.CONTINUOUS
+        
+        # Forceer een mux write bij de eerste read: de mode write
+        # hierboven heeft de register pointer op config gezet
+        self.adc._last_pin_read = None
+        
+        # Eerste read configureert de mux en wacht op twee conversies
+        self.transport.execute(self._read_value, self.channels[channel],
+                               trace=self._trace_value)
+        
+        if self._use_ready_pin and self.alert_pin and self.alert_pin.available:
+            # Conversion-ready: Hi_thresh MSB = 1, Lo_thresh MSB = 0 en
+            # de comparator aan; ALERT/RDY pulseert na elke conversie
+            self._write_register(self.REG_LO_THRESH, 0x0000)
+            self._write_register(self.REG_HI_THRESH, 0x8000)
+            config = self._config_word(channel, data_rate)
+            config &= ~(self.CONFIG_OS_SINGLE | self.CONFIG_MODE_SINGLE |
+                        self.CONFIG_COMP_DISABLE)
+            self._write_register(self.REG_CONFIG, config)
+            # Zet de register pointer terug voor de snelle reads van de driver
+            self._read_conversion()
+            self.alert_pin.clear()
+            self._ready_mode = True
+    
+    def _stop_continuous(self):
+        """Herstel single-shot mode met de standaard data rate"""
+        if not self.adc:
+            return
+        
+        self._ready_mode = False
+        self.adc.mode = Mode.SINGLE
+        self.adc.data_rate = self.DEFAULT_DATA_RATE
+        self._restore_comparator()
+    
+    def _read_continuous(self, channel, timestamps, raw, next_time, interval,
+                         trigger=None, trigger_index=0):
+        """
+        Vul voorgealloceerde arrays met samples in continuous mode
+        
+        Args:
+            channel: Kanaal nummer (0-3)
+            timestamps: Array voor de tijdstempels
+            raw: Array voor de ruwe waarden
+            next_time: Tijdstip (time.monotonic()) van het eerste sample
+            interval: Sample interval in seconden
+            trigger: Optionele functie vlak voor sample trigger_index
+            trigger_index: Sample index voor de trigger
+            
+        Returns:
+            Tijdstip van het volgende sample (voor aansluitende blokken)
+        """
+        if not self.adc:
+            # Test modus - dummy waarden op een ideale tijdbasis, in real-time
+            n_samples = len(raw)
+            timestamps[:] = max(next_time, time.monotonic()) + np.arange(n_samples) * interval
+            raw[:] = 1000 + (channel * 100)
+            if trigger:
+                time.sleep(trigger_index * interval)
+                trigger()
+            time.sleep(max(timestamps[-1] - time.monotonic(), 0))
+            return timestamps[-1] + interval
+        
+        analog_in = self.channels[channel]
+        ready_timeout = 2.0 * interval * self.CONVERSION_MARGIN
+        for i in range(len(raw)):
+            # Wacht tot de volgende conversie klaar is
+            edge = None
+            if self._ready_mode:
+                edge = self.alert_pin.wait_edge(ready_timeout)
+            else:
+                remaining = next_time - time.monotonic()
+                if remaining > 0.001:
+                    time.sleep(remaining - 0.001)
+                while time.monotonic() < next_time:
+                    pass
+            if trigger and i == trigger_index:
+                trigger()
+            raw[i] = self.transport.execute(self._read_value, analog_in,
+                                            trace=self._trace_value)
+            timestamps[i] = edge if edge is not None else time.monotonic()
+            next_time += interval
+        
+        return next_time
+    
+    def add_block_listener(self, listener):
+        """
+        Registreer een functie die elk opgenomen sample blok ontvangt
+        
+        Args:
+            listener: Functie listener(channel, timestamps, raw)
+        """
+        if listener not in self._block_listeners:
+            self._block_listeners.append(listener)
+    
+    def remove_block_listener(self, listener):
+        """Verwijder een geregistreerde block listener"""
+        if listener in self._block_listeners:
+            self._block_listeners.remove(listener)
+    
+    def _dispatch_block(self, channel, timestamps, raw, autorange=True):
+        """Verwerk een sample blok: statistiek, filters en listeners"""
+        self.statistics[channel].update(self.raw_to_voltage(raw, channel))
+        self.sample_counts[channel] += len(raw)
+        
+        for listener in self._block_listeners:
+            try:
+                listener(channel, timestamps, raw)
+            except Exception as e:
+                print(f"✗ Fout in block listener: {e}")
+        
+        filt = self.filters.get(channel)
+        if filt is not None:
+            t_out, codes_out = filt.process(timestamps, raw)
+            if len(codes_out):
+                volts_out = self.raw_to_voltage(codes_out, channel)
+                self.filtered_values[channel] = (t_out[-1], volts_out[-1])
+                for listener in self._filtered_listeners:
+                    try:
+                        listener(channel, t_out, volts_out)
+                    except Exception as e:
+                        print(f"✗ Fout in filter listener: {e}")
+        
+        # Gain wissels pas na verwerking van het blok
+        if autorange:
+            self._update_autorange(channel, raw)
+    
+    def configure_filter(self, channel, kind="cic", decimation=16, **kwargs):
+        """
+        Configureer een decimatie filter op een kanaal
+        
+        Het filter verwerkt alle blokken van dat kanaal (stream en
+        capture_block). Bij 860 SPS en decimatie 16 levert dat ~54
+        gefilterde waarden per seconde met ~2 bits extra resolutie.
+        
+        Args:
+            channel: Kanaal nummer (0-3)
+            kind: 'average', 'cic' of 'fir'
+            decimation: Decimatie factor
+            **kwargs: Extra filter parameters (order, taps, num_taps)
+        """
+        if channel not in range(4):
+            raise ValueError(f"Ongeldig kanaal: {channel}")
+        self.filters[channel] = create_filter(kind, decimation, **kwargs)
+        self.filtered_values.pop(channel, None)
+    
+    def remove_filter(self, channel):
+        """Verwijder het decimatie filter van een kanaal"""
+        self.filters.pop(channel, None)
+        self.filtered_values.pop(channel, None)
+    
+    def add_filtered_listener(self, listener):
+        """
+        Registreer een functie die de gefilterde output ontvangt
+        
+        Args:
+            listener: Functie listener(channel, timestamps, volts)
+        """
+        if listener not in self._filtered_listeners:
+            self._filtered_listeners.append(listener)
+    
+    def remove_filtered_listener(self, listener):
+        """Verwijder een geregistreerde filter listener"""
+        if listener in self._filtered_listeners:
+            self._filtered_listeners.remove(listener)
+    
+    def read_channel_filtered(self, channel, data_rate=MAX_DATA_RATE):
+        """
+        Lees een gefilterde waarde van een kanaal
+        
+        Als het kanaal gestreamd wordt, is dit de laatste filter output
+        (geen I2C verkeer). Anders wordt een kort blok op hoge data rate
+        opgenomen en door het filter gehaald.
+        
+        Args:
+            channel: Kanaal nummer (0-3)
+            data_rate: Data rate voor de opname als er geen stream loopt
+            
+        Returns:
+            Gefilterde spanning in Volt
+        """
+        filt = self.filters.get(channel)
+        if filt is None:
+            raise ValueError(f"Geen filter geconfigureerd op CH{channel}")
+        
+        if self.streaming and channel in self.filtered_values:
+            return self.filtered_values[channel][1]
+        
+        # Genoeg samples voor een volledig ingeschakelde output
+        filt.reset()
+        self.capture_block(channel, filt.settle_samples, data_rate)
+        return self.filtered_values[channel][1]
+    
+    def start_stream(self, channel, block_size=64, data_rate=MAX_DATA_RATE):
+        """
+        Start continue acquisitie van een kanaal in een achtergrond thread
+        
+        Elk blok van block_size samples wordt aan de statistiek en de
+        block listeners doorgegeven. Andere reads blijven mogelijk; de
+        stream herstelt zijn configuratie daarna zelf.
+        
+        Args:
+            channel: Kanaal nummer (0-3)
+            block_size: Samples per blok
+            data_rate: ADS1115 data rate in samples per seconde
+        """
+        if data_rate not in self.DATA_RATES:
+            raise ValueError(f"Data rate moet een van {self.DATA_RATES} zijn")
+        if channel not in range(4):
+            raise ValueError(f"Ongeldig kanaal: {channel}")
+        self._check_protected([channel])
+        
+        self.stop_scan()
+        self.stop_stream()
+        self.stream_channel = channel
+        self.streaming = True
+        self.stream_thread = threading.Thread(target=self._stream_loop,
+                                              args=(channel, block_size, data_rate),
+                                              daemon=True)
+        self.stream_thread.start()
+        print(f"✓ ADC stream gestart op CH{channel} @ {data_rate} SPS")
+    
+    def _stream_loop(self, channel, block_size, data_rate):
+        """
+        Thread functie voor continue acquisitie
+        
+        Args:
+            channel: Kanaal nummer (0-3)
+            block_size: Samples per blok
+            data_rate: ADS1115 data rate
+        """
+        interval = 1.0 / data_rate
+        next_time = None
+        
+        # Een nieuwe stream begint met een schone filter toestand
+        if channel in self.filters:
+            self.filters[channel].reset()
+        
+        try:
+            while self.streaming:
+                timestamps = np.empty(block_size, dtype=np.float64)
+                raw = np.empty(block_size, dtype=np.int16)
+                
+                try:
+                    with self._lock:
+                        # Herstart continuous mode als een andere read de
+                        # configuratie gewijzigd heeft
+                        if next_time is None or (self.adc and (
+                                self.adc.mode != Mode.CONTINUOUS or
+                                self.adc._last_pin_read is None or
+                                self.adc.gain != self.channel_gains[channel])):
+                            self._start_continuous(channel, data_rate)
+                            next_time = time.monotonic()
+                        next_time = self._read_continuous(channel, timestamps, raw,
+                                                          next_time, interval)
+                except I2CError as e:
+                    # Blok overslaan; de stream herstart na herstel van de bus
+                    self.transport.log_error("ADC stream", e)
+                    next_time = None
+                    time.sleep(self.I2C_ERROR_PAUSE)
+                    continue
+                
+                self._dispatch_block(channel, timestamps, raw)
+                
+        except Exception as e:
+            print(f"✗ Fout in ADC stream: {e}")
+            self.streaming = False
+        finally:
+            with self._lock:
+                self._stop_continuous()
+    
+    def acquired_channels(self):
+        """Kanalen die de lopende stream of scan meet (lege set = geen acquisitie)"""
+        if self.streaming:
+            return {self.stream_channel}
+        if self.scanning:
+            return set(self.scan_channels)
+        return set()
+    
+    def _check_protected(self, channels):
+        """
+        Weiger een acquisitie die bewaakte kanalen niet meer meet
+        
+        Een stream of scan vervangt de lopende acquisitie; zonder samples
+        op die kanalen zouden de protection regels stil uitvallen.
+        
+        Raises:
+            RuntimeError: Als een bewaakt kanaal niet in channels zit
+        """
+        missing = sorted(set(self.protected_channels) - set(channels))
+        if missing:
+            raise RuntimeError(f"Protection bewaakt CH{missing}; deze acquisitie meet "
+                               f"die kanalen niet (stop eerst protection)")
+    
+    def stop_stream(self):
+        """Stop continue acquisitie"""
+        if self.streaming:
+            self.streaming = False
+            if self.stream_thread and self.stream_thread.is_alive():
+                self.stream_thread.join(timeout=1.0)
+    
+    def get_statistics(self, channel=None):
+        """
+        Lees de lopende statistiek van een of alle kanalen
+        
+        Args:
+            channel: Kanaal nummer (0-3), of None voor alle kanalen
+            
+        Returns:
+            dict met count, min, max, mean, rms en std (Volt), of een
+            dict per kanaal als channel None is
+        """
+        if channel is None:
+            return {ch: stats.snapshot() for ch, stats in self.statistics.items()}
+        return self.statistics[channel].snapshot()
+    
+    def reset_statistics(self, channel=None):
+        """
+        Start een nieuw statistiek venster
+        
+        Args:
+            channel: Kanaal nummer (0-3), of None voor alle kanalen
+        """
+        channels = self.statistics.keys() if channel is None else [channel]
+        for ch in channels:
+            self.statistics[ch].reset()
+    
+    def _config_word(self, channel, data_rate):
+        """
+        Bereken het single-shot config woord voor een kanaal
+        
+        Args:
+            channel: Kanaal nummer (0-3)
+            data_rate: ADS1115 data rate
+            
+        Returns:
+            16-bit config woord inclusief OS bit (start conversie)
+        """
+        return (self.CONFIG_OS_SINGLE | self.MUX_SINGLE_ENDED[channel] |
+                self.GAIN_BITS[self.channel_gains[channel]] | self.CONFIG_MODE_SINGLE |
+                self.RATE_BITS[data_rate] | self.CONFIG_COMP_DISABLE)
+    
+    def _write_config_word(self, config):
+        """Schrijf een config woord (start een single-shot conversie)"""
+        self._write_register(self.REG_CONFIG, config)
+    
+    def _write_register(self, register, value):
+        """Schrijf een 16-bit register"""
+        buf = self._tx_buf
+        buf[0] = register
+        buf[1] = (value >> 8) & 0xFF
+        buf[2] = value & 0xFF
+        self.transport.execute(self._i2c_write, buf, trace=self._trace_write)
+    
+    def _i2c_write(self, buf):
+        """Eén I2C write transactie"""
+        with self.adc.i2c_device as i2c:
+            i2c.write(buf)
+    
+    def _i2c_read_conversion(self):
+        """Eén I2C transactie: pointer naar conversie register en 2 bytes lezen"""
+        with self.adc.i2c_device as i2c:
+            i2c.write_then_readinto(self._ptr_buf, self._rx_buf)
+    
+    @staticmethod
+    def _read_value(analog_in):
+        """Lees een kanaal via de driver (één transactie in continuous mode)"""
+        return analog_in.value
+    
+    def _read_conversion(self):
+        """Lees het conversie register (16-bit signed)"""
+        self.transport.execute(self._i2c_read_conversion, trace=self._trace_conversion)
+        value = (self._rx_buf[0] << 8) | self._rx_buf[1]
+        return value - 0x10000 if value & 0x8000 else value
+    
+    def _conversion_time(self, data_rate):
+        """Wachttijd voor een single-shot conversie inclusief marge"""
+        return self.CONVERSION_MARGIN / data_rate + self.CONVERSION_OVERHEAD
+    
+    def _scan_into(self, schedule, channels, timestamps, raw, data_rate, pending):
+        """
+        Pipelined scan: vul voorgealloceerde arrays met samples
+        
+        Zodra een conversie klaar is wordt eerst het config woord van het
+        volgende kanaal geschreven (start de volgende conversie), en pas
+        daarna het resultaat van de vorige conversie gelezen. Het conversie
+        register blijft geldig tot de nieuwe conversie klaar is, dus de
+        mux omschakeling en de read overlappen met de volgende conversie.
+        
+        Args:
+            schedule: _ScanSchedule die het volgende kanaal kiest
+            channels: Array voor de kanaal nummers
+            timestamps: Array voor de tijdstempels (midden van de conversie)
+            raw: Array voor de ruwe waarden
+            data_rate: ADS1115 data rate
+            pending: (kanaal, start tijd, gain) van de lopende conversie,
+                     of None
+            
+        Returns:
+            (kanaal, start tijd, gain) van de conversie die nog loopt
+        """
+        conversion_time = self._conversion_time(data_rate)
+        configs = {ch: self._config_word(ch, data_rate) for ch in schedule.channels}
+        
+        if not self.adc:
+            # Test modus - dummy waarden in real-time
+            for i in range(len(raw)):
+                channel, start = schedule.next(time.monotonic())
+                start = max(time.monotonic(), start)
+                time.sleep(max(start + conversion_time - time.monotonic(), 0))
+                channels[i] = channel
+                timestamps[i] = start + conversion_time / 2.0
+                raw[i] = 1000 + (channel * 100)
+            return None
+        
+        i = 0
+        while i < len(raw):
+            if pending is None:
+                # Geen conversie in de pipeline: start het eerste kanaal
+                channel, start = schedule.next(time.monotonic())
+                self._wait_until(start)
+                self._write_config_word(configs[channel])
+                pending = (channel, time.monotonic(), self.channel_gains[channel])
+                continue
+            
+            current, started, gain = pending
+            done = started + conversion_time
+            self._wait_until(done)
+            
+            # Start de volgende conversie voordat de vorige uitgelezen wordt
+            channel, start = schedule.next(done)
+            if start <= time.monotonic() + conversion_time:
+                self._wait_until(start)
+                self._write_config_word(configs[channel])
+                pending = (channel, time.monotonic(), self.channel_gains[channel])
+            else:
+                # Volgende kanaal is nog niet aan de beurt: pipeline leeg
+                schedule.defer(channel, start)
+                pending = None
+            
+            channels[i] = current
+            timestamps[i] = (started + done) / 2.0
+            value = self._read_conversion()
+            if gain != self.channel_gains[current]:
+                # Conversie liep nog met de gain van voor een bereik wissel
+                value = int(round(value * self.PGA_RANGE[gain] /
+                                  self.PGA_RANGE[self.channel_gains[current]]))
+                value = min(max(value, -32768), 32767)
+            raw[i] = value
+            i += 1
+        
+        return pending
+    
+    @staticmethod
+    def _wait_until(deadline):
+        """Wacht tot een time.monotonic() tijdstip (sleep + korte spin)"""
+        remaining = deadline - time.monotonic()
+        if remaining > 0.001:
+            time.sleep(remaining - 0.001)
+        while time.monotonic() < deadline:
+            pass
+    
+    def scan_once(self, channels=(0, 1, 2, 3), data_rate=DEFAULT_DATA_RATE, rounds=1):
+        """
+        Lees een lijst kanalen met een pipelined scan
+        
+        Args:
+            channels: Kanaal nummers
+            data_rate: ADS1115 data rate
+            rounds: Aantal keer dat elk kanaal gelezen wordt
+            
+        Returns:
+            Tuple (channels, timestamps, raw) numpy arrays
+        """
+        schedule = _ScanSchedule(channels)
+        n = len(schedule.channels) * rounds
+        frame = (np.empty(n, dtype=np.uint8), np.empty(n, dtype=np.float64),
+                 np.empty(n, dtype=np.int16))
+        
+        with self._lock:
+            pending = self._scan_into(schedule, *frame, data_rate, None)
+            if pending is not None:
+                # Laat de laatste (overbodige) conversie uitlopen
+                self._wait_until(pending[1] + self._conversion_time(data_rate))
+            self._release_library_state()
+        
+        return frame
+    
+    def _release_library_state(self):
+        """
+        Laat de Adafruit driver de mux opnieuw configureren na directe toegang
+        
+        Als er geen stream of scan loopt wordt een ingestelde comparator
+        opnieuw actief gemaakt.
+        """
+        if self.adc:
+            self.adc._last_pin_read = None
+            if not (self.streaming or self.scanning):
+                self._restore_comparator()
+    
+    def attach_alert_pin(self, gpio_pin=DEFAULT_ALERT_PIN, use_for_ready=True):
+        """
+        Koppel de ALERT/RDY uitgang van de ADS1115 aan een GPIO ingang
+        
+        Args:
+            gpio_pin: BeagleBone GPIO pin met de ALERT/RDY verbinding
+            use_for_ready: Gebruik de pin ook als conversion-ready signaal
+                           in streaming mode (in plaats van timer pacing)
+            
+        Returns:
+            True als de pin beschikbaar is
+        """
+        if self.alert_pin:
+            self.alert_pin.cleanup()
+        self.alert_pin = AlertPin(gpio_pin, callback=self._on_alert)
+        self._use_ready_pin = use_for_ready
+        return self.alert_pin.available
+    
+    def set_comparator(self, name, low, high, window=False, latch=True, queue=1):
+        """
+        Bewaak een ingang met de hardware comparator van de ADS1115
+        
+        De ADS1115 converteert de ingang continu en trekt ALERT/RDY laag
+        bij een overschrijding; de alert listeners worden via een GPIO
+        edge event aangeroepen, zonder polling. Andere reads, streams en
+        scans onderbreken de bewaking tijdelijk; daarna wordt de
+        comparator automatisch opnieuw ingesteld.
+        
+        Args:
+            name: Geregistreerde ingang (kanaal 0-3 of eigen naam)
+            low: Onderste drempel in Volt
+            high: Bovenste drempel in Volt
+            window: False = traditioneel (alarm boven high, reset onder
+                    low: hysterese), True = window (alarm buiten low-high)
+            latch: Alarm blijft actief tot de conversie gelezen is
+            queue: Aantal opeenvolgende overschrijdingen (1, 2 of 4)
+        
+        Na een alarm wordt de comparator uitgeschakeld (de conversies lopen
+        door) tot de ingang terug is: onder low (traditioneel) of binnen
+        low-high (window). Zo geeft een latch per overschrijding één alarm
+        in plaats van een alarm per conversie.
+        """
+        if low >= high:
+            raise ValueError("Onderste drempel moet lager zijn dan de bovenste")
+        if queue not in self.COMP_QUEUE_BITS:
+            raise ValueError(f"Queue moet een van {tuple(self.COMP_QUEUE_BITS)} zijn")
+        
+        entry = self.inputs[name]
+        low_code = min(max(int(round(low / entry.lsb)), -32768), 32767)
+        high_code = min(max(int(round(high / entry.lsb)), -32768), 32767)
+        
+        # Continuous mode op de ingang met de comparator aan
+        config = entry.config & ~(self.CONFIG_OS_SINGLE | self.CONFIG_MODE_SINGLE |
+                                  self.CONFIG_COMP_DISABLE)
+        config |= self.COMP_QUEUE_BITS[queue]
+        if window:
+            config |= self.CONFIG_COMP_WINDOW
+        if latch:
+            config |= self.CONFIG_COMP_LATCH
+        
+        self._comparator = {
+            "name": name,
+            "lsb": entry.lsb,
+            "low": low_code & 0xFFFF,
+            "high": high_code & 0xFFFF,
+            "low_code": low_code,
+            "high_code": high_code,
+            "window": window,
+            "config": config,
+            "armed": True,
+        }
+        with self._lock:
+            self._restore_comparator()
+    
+    def clear_comparator(self):
+        """Stop de comparator bewaking (ADC terug naar single-shot)"""
+        self._comparator = None
+        if not self.adc:
+            return
+        with self._lock:
+            self._write_register(self.REG_CONFIG, self.inputs[0].config &
+                                 ~self.CONFIG_OS_SINGLE)
+            self._release_library_state()
+    
+    def _restore_comparator(self):
+        """Schrijf de comparator instelling (na ander gebruik van de ADC)"""
+        comparator = self._comparator
+        if comparator is None or not self.adc:
+            return
+        config = comparator["config"]
+        if not comparator["armed"]:
+            config |= self.CONFIG_COMP_DISABLE
+        self._write_register(self.REG_LO_THRESH, comparator["low"])
+        self._write_register(self.REG_HI_THRESH, comparator["high"])
+        self._write_register(self.REG_CONFIG, config)
+        self.adc._last_pin_read = None
+    
+    def _comparator_clear(self, comparator, raw):
+        """True als de ingang terug is binnen de hysterese band (of het venster)"""
+        if comparator["window"]:
+            return comparator["low_code"] <= raw <= comparator["high_code"]
+        return raw < comparator["low_code"]
+    
+    def _rearm_loop(self, comparator):
+        """Herwapen de comparator zodra de ingang terug is (eigen thread)"""
+        while self._comparator is comparator and not comparator["armed"]:
+            time.sleep(self.COMP_REARM_INTERVAL)
+            if self.streaming or self.scanning or self._ready_mode:
+                continue  # Conversie register is van de acquisitie
+            with self._lock:
+                if self._comparator is not comparator:
+                    return
+                try:
+                    raw = self._read_conversion()
+                except I2CError:
+                    continue
+                if self._comparator_clear(comparator, raw):
+                    comparator["armed"] = True
+                    try:
+                        self._restore_comparator()
+                    except I2CError as e:
+                        print(f"⚠ Comparator niet herwapend: {e}")
+    
+    def add_alert_listener(self, listener):
+        """
+        Registreer een functie die aangeroepen wordt bij een comparator alarm
+        
+        Args:
+            listener: Functie listener(name, timestamp, voltage); timestamp
+                      is het time.monotonic() tijdstip van de ALERT flank.
+                      De aanroep gebeurt vanuit de GPIO event thread.
+        """
+        if listener not in self._alert_listeners:
+            self._alert_listeners.append(listener)
+    
+    def remove_alert_listener(self, listener):
+        """Verwijder een geregistreerde alert listener"""
+        if listener in self._alert_listeners:
+            self._alert_listeners.remove(listener)
+    
+    def cleanup(self):
+        """Stop acquisitie en comparator en geef de ALERT/RDY pin vrij"""
+        self.stop_stream()
+        self.stop_scan()
+        self.clear_comparator()
+        if self.alert_pin:
+            self.alert_pin.cleanup()
+            self.alert_pin = None
+    
+    def _on_alert(self, edge_time):
+        """ALERT/RDY flank (GPIO event thread)"""
+        comparator = self._comparator
+        if self._ready_mode or comparator is None or not self.adc:
+            return
+        
+        if not comparator["armed"]:
+            return
+        
+        # Lees de conversie die het alarm gaf (wist ook de latch) en
+        # schakel de comparator uit tot de ingang terug is
+        with self._lock:
+            raw = self._read_conversion()
+            comparator["armed"] = False
+            self._restore_comparator()
+        voltage = raw * comparator["lsb"]
+        self._rearm_thread = threading.Thread(target=self._rearm_loop, args=(comparator,),
+                                              daemon=True)
+        self._rearm_thread.start()
+        
+        for listener in self._alert_listeners:
+            try:
+                listener(comparator["name"], edge_time, voltage)
+            except Exception as e:
+                print(f"✗ Fout in alert listener: {e}")
+    
+    def add_frame_listener(self, listener):
+        """
+        Registreer een functie die elk scan frame ontvangt
+        
+        Args:
+            listener: Functie listener(channels, timestamps, raw) met
+                      interleaved numpy arrays
+        """
+        if listener not in self._frame_listeners:
+            self._frame_listeners.append(listener)
+    
+    def remove_frame_listener(self, listener):
+        """Verwijder een geregistreerde frame listener"""
+        if listener in self._frame_listeners:
+            self._frame_listeners.remove(listener)
+    
+    def _dispatch_frame(self, channels, timestamps, raw):
+        """Verwerk een scan frame: frame listeners en per-kanaal blokken"""
+        for listener in self._frame_listeners:
+            try:
+                listener(channels, timestamps, raw)
+            except Exception as e:
+                print(f"✗ Fout in frame listener: {e}")
+        
+        for channel in np.unique(channels):
+            mask = channels == channel
+            self._dispatch_block(int(channel), timestamps[mask], raw[mask])
+    
+    def start_scan(self, channels=(0, 1, 2, 3), rates=None, frame_size=64,
+                   data_rate=MAX_DATA_RATE):
+        """
+        Start een round-robin scan over meerdere kanalen
+        
+        Args:
+            channels: Kanaal nummers in scan volgorde
+            rates: Optionele dict {kanaal: samples per seconde}; kanalen
+                   zonder rate worden zo vaak mogelijk gelezen
+            frame_size: Samples per frame (alle kanalen samen)
+            data_rate: ADS1115 data rate (bepaalt de conversietijd)
+        """
+        if data_rate not in self.DATA_RATES:
+            raise ValueError(f"Data rate moet een van {self.DATA_RATES} zijn")
+        schedule = _ScanSchedule(channels, rates)
+        self._check_protected(schedule.channels)
+        
+        self.stop_stream()
+        self.stop_scan()
+        self.scan_channels = tuple(schedule.channels)
+        self.scanning = True
+        self.scan_thread = threading.Thread(target=self._scan_loop,
+                                            args=(schedule, frame_size, data_rate),
+                                            daemon=True)
+        self.scan_thread.start()
+        print(f"✓ ADC scan gestart op CH{list(schedule.channels)} @ {data_rate} SPS")
+    
+    def _scan_loop(self, schedule, frame_size, data_rate):
+        """
+        Thread functie voor de multi-channel scan
+        
+        Args:
+            schedule: _ScanSchedule
+            frame_size: Samples per frame
+            data_rate: ADS1115 data rate
+        """
+        pending = None
+        try:
+            while self.scanning:
+                frame = (np.empty(frame_size, dtype=np.uint8),
+                         np.empty(frame_size, dtype=np.float64),
+                         np.empty(frame_size, dtype=np.int16))
+                try:
+                    with self._lock:
+                        pending = self._scan_into(schedule, *frame, data_rate, pending)
+                except I2CError as e:
+                    # Frame overslaan en de pipeline opnieuw starten
+                    self.transport.log_error("ADC scan", e)
+                    pending = None
+                    time.sleep(self.I2C_ERROR_PAUSE)
+                    continue
+                self._dispatch_frame(*frame)
+        except Exception as e:
+            print(f"✗ Fout in ADC scan: {e}")
+            self.scanning = False
+        finally:
+            with self._lock:
+                self._release_library_state()
+    
+    def stop_scan(self):
+        """Stop de multi-channel scan"""
+        if self.scanning:
+            self.scanning = False
+            if self.scan_thread and self.scan_thread.is_alive():
+                self.scan_thread.join(timeout=1.0)
+    
     def read_all_channels(self):
         """
         Lees alle 4 kanalen
         
+        De kanalen worden pipelined gelezen: de mux omschakeling naar het
+        volgende kanaal overlapt met het uitlezen van het vorige.
+        
         Returns:
             List met 4 voltage waarden [CH0, CH1, CH2, CH3]
         """
-        values = []
-        for channel in range(4):
-            values.append(self.read_channel(channel))
+        if not self.adc:
+            return [self.read_channel(channel) for channel in range(4)]
+        
+        try:
+            channels, _, raw = self.scan_once((0, 1, 2, 3))
+        except I2CError as e:
+            self.transport.log_error("lezen kanalen", e)
+            return [0.0] * 4
+        except Exception as e:
+            print(f"✗ Fout bij lezen kanalen: {e}")
+            return [0.0] * 4
+        
+        values = [0.0] * 4
+        for channel, value in zip(channels, self.frame_to_voltage(channels, raw)):
+            values[channel] = float(value)
+            self.statistics[channel].add(values[channel])
+            self.sample_counts[channel] += 1
         return values
     
+    def read_all_channels_timed(self):
+        """
+        Lees alle 4 kanalen met de tijdstempel van elke conversie
+        
+        Returns:
+            Tuple (timestamps, values): twee lists met 4 elementen; de
+            tijdstempel is het midden van de conversie (time.monotonic())
+        """
+        channels, timestamps, raw = self.scan_once((0, 1, 2, 3))
+        volts = self.frame_to_voltage(channels, raw)
+        order = np.argsort(channels)
+        return timestamps[order].tolist(), volts[order].tolist()
+    
+    def read_all_channels_aligned(self):
+        """
+        Lees alle 4 kanalen op één gemeenschappelijk tijdstip
+        
+        Elk kanaal wordt twee keer gelezen (twee pipelined rondes) en
+        lineair geïnterpoleerd naar het midden van de scan, zodat de vier
+        waarden bij hetzelfde moment horen.
+        
+        Returns:
+            Tuple (timestamp, values): gemeenschappelijk tijdstip en list
+            met 4 voltage waarden [CH0, CH1, CH2, CH3]
+        """
+        channels, timestamps, raw = self.scan_once((0, 1, 2, 3), rounds=2)
+        instant = float(timestamps.mean())
+        aligned = align_samples(channels, timestamps,
+                                self.frame_to_voltage(channels, raw),
+                                (0, 1, 2, 3), np.array([instant]))
+        return instant, aligned[0].tolist()
+    
     def read_all_channels_raw(self):
         """
         Lees alle 4 kanalen (ruwe waarden)
@@ -149,19 +1449,14 @@ class ADCController:
             return 0.5
         
         try:
-            from adafruit_ads1x15.analog_in import AnalogIn
-            
-            # Gebruik integers 0-3 als kanaal nummers
-            pin_map = [0, 1, 2, 3]
-            
-            if pos_channel < 4 and neg_channel < 4:
-                diff_channel = AnalogIn(self.adc, 
-                                       pin_map[pos_channel], 
-                                       pin_map[neg_channel])
-                return diff_channel.voltage
-            else:
-                print(f"✗ Ongeldige kanalen: {pos_channel}, {neg_channel}")
-                return 0.0
+            key = (pos_channel, neg_channel)
+            if key not in self.inputs:
+                if key not in self.MUX_DIFFERENTIAL:
+                    print(f"✗ Ongeldige kanalen: {pos_channel}, {neg_channel}")
+                    return 0.0
+                # Eerste keer: registreer het paar onder (pos, neg)
+                self.register_input(key, pos_channel, neg_channel)
+            return self.read_input(key)
                 
         except Exception as e:
             print(f"✗ Fout bij differentieel lezen: {e}")
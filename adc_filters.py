@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+ADC Decimatie Filters
+Oversampling filters voor de ADS1115: moving average, CIC en FIR
+
+De ADC draait op een hoge data rate; de filters middelen en decimeren de
+samples naar een lagere output rate met een betere effectieve resolutie.
+Alle filters verwerken hele blokken gevectoriseerd en bewaren hun toestand
+tussen blokken, zodat een stream zonder naden gefilterd wordt.
+
+Elk filter heeft dezelfde interface:
+    process(timestamps, values) -> (timestamps_out, values_out)
+    reset()
+    decimation, settle_samples
+"""
+
+import numpy as np
+
+
+class MovingAverageDecimator:
+    """Boxcar gemiddelde over groepen van R samples"""
+
+    def __init__(self, decimation):
+        """
+        Args:
+            decimation: Decimatie factor R (samples per output)
+        """
+        self.decimation = decimation
+        # Input samples nodig voor de eerste geldige output
+        self.settle_samples = decimation
+        self.reset()
+
+    def reset(self):
+        """Wis de filter toestand"""
+        self._pending_t = np.empty(0)
+        self._pending_x = np.empty(0)
+
+    def process(self, timestamps, values):
+        """
+        Filter en decimeer een blok
+
+        Args:
+            timestamps: Sample tijden (numpy array)
+            values: Sample waarden (numpy array)
+
+        Returns:
+            Tuple (timestamps_out, values_out); de output tijd is het
+            gemiddelde van de tijden in de groep
+        """
+        t = np.concatenate((self._pending_t, timestamps))
+        x = np.concatenate((self._pending_x, np.asarray(values, dtype=np.float64)))
+
+        n_out = len(x) // self.decimation
+        used = n_out * self.decimation
+        self._pending_t = t[used:]
+        self._pending_x = x[used:]
+
+        t_out = t[:used].reshape(n_out, self.decimation).mean(axis=1)
+        x_out = x[:used].reshape(n_out, self.decimation).mean(axis=1)
+        return t_out, x_out
+
+
+class CICDecimator:
+    """Cascaded integrator-comb decimator (integer rekenwerk)"""
+
+    def __init__(self, decimation, order=3):
+        """
+        Args:
+            decimation: Decimatie factor R
+            order: Aantal integrator/comb trappen N
+        """
+        self.decimation = decimation
+        self.order = order
+        self.gain = float(decimation ** order)
+        # Groepsvertraging in input samples
+        self.delay = order * (decimation - 1) / 2.0
+        self.settle_samples = decimation * (order + 1)
+        self.reset()
+
+    def reset(self):
+        """Wis de filter toestand"""
+        self._history_t = np.empty(0)
+        self._integrators = np.zeros(self.order, dtype=np.int64)
+        self._combs = np.zeros(self.order, dtype=np.int64)
+        self._phase = 0
+        self._warmup = self.order
+
+    def process(self, timestamps, values):
+        """
+        Filter en decimeer een blok
+
+        Args:
+            timestamps: Sample tijden (numpy array)
+            values: Ruwe ADC waarden (numpy array, integers)
+
+        Returns:
+            Tuple (timestamps_out, values_out); de output tijd is
+            gecorrigeerd voor de groepsvertraging van het filter
+            (geïnterpoleerd tussen de werkelijke sample tijden, ook
+            over de grens met het vorige blok)
+        """
+        x = np.asarray(values, dtype=np.int64)
+        if len(x) == 0:
+            return np.empty(0), np.empty(0)
+
+        # Integrators op de volle rate (cumsum met carry uit het vorige blok)
+        for stage in range(self.order):
+            x = np.cumsum(x)
+            x += self._integrators[stage]
+            self._integrators[stage] = x[-1]
+
+        # Decimeer: elk R-de sample, aansluitend op de fase van het vorige blok
+        first = (self.decimation - 1 - self._phase) % self.decimation
+        idx = np.arange(first, len(x), self.decimation)
+        self._phase = (self._phase + len(x)) % self.decimation
+        y = x[idx]
+
+        # Combs op de lage rate
+        for stage in range(self.order):
+            previous = np.concatenate(([self._combs[stage]], y[:-1]))
+            if len(y):
+                self._combs[stage] = y[-1]
+            y = y - previous
+
+        # Output tijd: delay samples terug, met de tijden van vorige blokken
+        offset = len(self._history_t)
+        t = np.concatenate((self._history_t, np.asarray(timestamps, dtype=np.float64)))
+        t_out = np.interp(idx + offset - self.delay, np.arange(len(t)), t)
+        self._history_t = t[-(int(np.ceil(self.delay)) + 1):]
+        y_out = y / self.gain
+
+        # Eerste outputs na reset zijn nog niet ingeschakeld
+        if self._warmup:
+            skip = min(self._warmup, len(y_out))
+            self._warmup -= skip
+            t_out, y_out = t_out[skip:], y_out[skip:]
+
+        return t_out, y_out
+
+
+class FIRDecimator:
+    """Windowed-sinc laagdoorlaat FIR met decimatie"""
+
+    def __init__(self, decimation, taps=None, num_taps=None):
+        """
+        Args:
+            decimation: Decimatie factor R
+            taps: Eigen filter coëfficiënten (optioneel)
+            num_taps: Aantal taps voor het standaard ontwerp (default 4*R+1)
+        """
+        self.decimation = decimation
+        if taps is None:
+            taps = self.design_lowpass(decimation, num_taps or 4 * decimation + 1)
+        self.taps = np.asarray(taps, dtype=np.float64)
+        self.delay = (len(self.taps) - 1) / 2.0
+        self.settle_samples = len(self.taps) + decimation
+        self.reset()
+
+    @staticmethod
+    def design_lowpass(decimation, num_taps):
+        """
+        Ontwerp een laagdoorlaat filter met cutoff op de nieuwe Nyquist
+
+        Args:
+            decimation: Decimatie factor R
+            num_taps: Aantal taps
+
+        Returns:
+            numpy array met taps (DC gain 1)
+        """
+        cutoff = 0.5 / decimation  # Relatief t.o.v. de input sample rate
+        n = np.arange(num_taps) - (num_taps - 1) / 2.0
+        taps = np.sinc(2 * cutoff * n) * np.blackman(num_taps)
+        return taps / taps.sum()
+
+    def reset(self):
+        """Wis de filter toestand"""
+        self._history_t = np.empty(0)
+        self._history_x = np.empty(0)
+        self._phase = 0
+
+    def process(self, timestamps, values):
+        """
+        Filter en decimeer een blok
+
+        Args:
+            timestamps: Sample tijden (numpy array)
+            values: Sample waarden (numpy array)
+
+        Returns:
+            Tuple (timestamps_out, values_out); de output tijd is de tijd
+            van het sample in het midden van het filter venster
+        """
+        num_taps = len(self.taps)
+        t = np.concatenate((self._history_t, timestamps))
+        x = np.concatenate((self._history_x, np.asarray(values, dtype=np.float64)))
+
+        # Output posities: eind van elk volledig venster, om de R samples
+        ends = np.arange(num_taps - 1 + self._phase, len(x), self.decimation)
+        if len(ends):
+            windows = np.lib.stride_tricks.sliding_window_view(x, num_taps)
+            y_out = windows[ends - (num_taps - 1)] @ self.taps[::-1]
+            t_out = t[ends - int(self.delay)]
+            next_end = ends[-1] + self.decimation
+        else:
+            y_out = np.empty(0)
+            t_out = np.empty(0)
+            next_end = num_taps - 1 + self._phase
+
+        # Bewaar de laatste num_taps-1 samples voor het volgende blok
+        keep = min(len(x), num_taps - 1)
+        self._phase = next_end - len(x) + keep - (num_taps - 1)
+        self._history_t = t[len(t) - keep:]
+        self._history_x = x[len(x) - keep:]
+
+        return t_out, y_out
+
+
+FILTER_TYPES = {
+    "average": MovingAverageDecimator,
+    "cic": CICDecimator,
+    "fir": FIRDecimator,
+}
+
+
+def create_filter(kind, decimation, **kwargs):
+    """
+    Maak een decimatie filter aan
+
+    Args:
+        kind: 'average', 'cic' of 'fir'
+        decimation: Decimatie factor
+        **kwargs: Extra parameters voor het filter (order, taps, num_taps)
+
+    Returns:
+        Filter instantie
+    """
+    if kind not in FILTER_TYPES:
+        raise ValueError(f"Onbekend filter type: {kind} (kies uit {list(FILTER_TYPES)})")
+    return FILTER_TYPES[kind](decimation, **kwargs)
+
+
+# Test functie
+if __name__ == "__main__":
+    print("ADC Decimatie Filter Test")
+    print("=" * 50)
+
+    rate = 860
+    t = np.arange(8600) / rate
+    rng = np.random.default_rng(1)
+    signal = 10000 + 2000 * np.sin(2 * np.pi * 1.0 * t)
+    raw = np.round(signal + 20 * rng.standard_normal(len(t))).astype(np.int16)
+
+    for kind in FILTER_TYPES:
+        filt = create_filter(kind, 16)
+        outputs = [filt.process(tb, xb) for tb, xb in
+                   zip(np.array_split(t, 37), np.array_split(raw, 37))]
+        t_out = np.concatenate([o[0] for o in outputs])
+        y_out = np.concatenate([o[1] for o in outputs])
+        error = y_out - (10000 + 2000 * np.sin(2 * np.pi * 1.0 * t_out))
+        print(f"  {kind:8s}: {len(y_out)} outputs, ruis {np.std(error[10:]):.2f} LSB "
+              f"(input: {np.std(raw - signal):.2f} LSB)")
+
+    print("\n✓ Test voltooid")
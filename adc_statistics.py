@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Online Statistiek
+Lopende min/max/mean/RMS/std en histogram zonder samples op te slaan
+
+Blokken worden samengevoegd met het parallelle Welford algoritme (Chan et al.),
+zodat de statistiek numeriek stabiel blijft bij uren aan samples en het
+geheugengebruik constant is.
+"""
+
+import math
+import threading
+import numpy as np
+
+
+class OnlineStatistics:
+    """Welford-style accumulator met vast histogram"""
+
+    def __init__(self, hist_min=-4.096, hist_max=4.096, hist_bins=64):
+        """
+        Initialiseer accumulator
+
+        Args:
+            hist_min: Ondergrens van het histogram
+            hist_max: Bovengrens van het histogram
+            hist_bins: Aantal histogram bins
+        """
+        self.hist_min = hist_min
+        self.hist_max = hist_max
+        self.hist_bins = hist_bins
+        self._bin_scale = hist_bins / (hist_max - hist_min)
+        self._lock = threading.Lock()
+        self.histogram = np.zeros(hist_bins, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        """Start een nieuw statistiek venster"""
+        with self._lock:
+            self.count = 0
+            self.mean = 0.0
+            self.m2 = 0.0          # Som van gekwadrateerde afwijkingen
+            self.sum_sq = 0.0      # Som van kwadraten (voor RMS)
+            self.min = math.inf
+            self.max = -math.inf
+            self.histogram[:] = 0
+            self.window_start = None
+
+    def _bin(self, values):
+        """Histogram bin index (buiten bereik valt in de buitenste bins)"""
+        idx = ((values - self.hist_min) * self._bin_scale).astype(np.int64)
+        return np.clip(idx, 0, self.hist_bins - 1)
+
+    def update(self, values):
+        """
+        Voeg een blok samples toe
+
+        Args:
+            values: numpy array met samples
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n = values.size
+        if n == 0:
+            return
+
+        block_mean = values.mean()
+        block_m2 = np.sum((values - block_mean) ** 2)
+        block_sum_sq = np.dot(values, values)
+        block_min = values.min()
+        block_max = values.max()
+        counts = np.bincount(self._bin(values), minlength=self.hist_bins)
+
+        with self._lock:
+            # Parallelle Welford merge van (count, mean, m2)
+            total = self.count + n
+            delta = block_mean - self.mean
+            self.mean += delta * n / total
+            self.m2 += block_m2 + delta * delta * self.count * n / total
+            self.count = total
+
+            self.sum_sq += block_sum_sq
+            self.min = min(self.min, block_min)
+            self.max = max(self.max, block_max)
+            self.histogram += counts
+
+    def add(self, value):
+        """
+        Voeg een enkel sample toe (klassieke Welford stap)
+
+        Args:
+            value: Sample waarde
+        """
+        with self._lock:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+
+            self.sum_sq += value * value
+            if value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+            idx = int((value - self.hist_min) * self._bin_scale)
+            self.histogram[min(max(idx, 0), self.hist_bins - 1)] += 1
+
+    def snapshot(self):
+        """
+        Lees de huidige statistiek
+
+        Returns:
+            dict met count, min, max, mean, rms, std en histogram
+            (counts en bin randen)
+        """
+        with self._lock:
+            count = self.count
+            if count == 0:
+                return {"count": 0, "min": None, "max": None, "mean": None,
+                        "rms": None, "std": None,
+                        "histogram": self.histogram.copy(),
+                        "bin_edges": self.bin_edges()}
+            return {
+                "count": count,
+                "min": float(self.min),
+                "max": float(self.max),
+                "mean": float(self.mean),
+                "rms": math.sqrt(self.sum_sq / count),
+                "std": math.sqrt(self.m2 / (count - 1)) if count > 1 else 0.0,
+                "histogram": self.histogram.copy(),
+                "bin_edges": self.bin_edges(),
+            }
+
+    def bin_edges(self):
+        """Randen van de histogram bins"""
+        return np.linspace(self.hist_min, self.hist_max, self.hist_bins + 1)
+
+
+# Test functie
+if __name__ == "__main__":
+    print("Online Statistiek Test")
+    print("=" * 50)
+
+    stats = OnlineStatistics(0.0, 3.3, 33)
+    rng = np.random.default_rng(1)
+    data = 1.65 + 0.2 * rng.standard_normal(100000)
+
+    for block in np.array_split(data, 1000):
+        stats.update(block)
+    stats.add(1.65)
+    data = np.append(data, 1.65)
+
+    result = stats.snapshot()
+    print(f"  count: {result['count']}")
+    print(f"  mean:  {result['mean']:.6f}  (numpy: {data.mean():.6f})")
+    print(f"  std:   {result['std']:.6f}  (numpy: {data.std(ddof=1):.6f})")
+    print(f"  rms:   {result['rms']:.6f}  (numpy: {np.sqrt(np.mean(data ** 2)):.6f})")
+    print(f"  min:   {result['min']:.6f}  max: {result['max']:.6f}")
+
+    print("\n✓ Test voltooid")
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Arbitrary Waveform
+Afspelen van (lange) opgenomen profielen vanuit een bestand
+
+Een profiel is een .npy bestand met float samples (spanning in V of
+stroom in mA) op een vaste sample rate, die in een JSON bestand ernaast
+staat (<profiel>.json). Het profiel wordt gemapt, niet ingelezen; een
+prefetch thread kopieert het volgende blok samples alvast naar het
+geheugen terwijl het huidige blok afgespeeld wordt (double buffering),
+zodat de output loop nooit op de SD kaart wacht. Het geheugengebruik is
+twee blokken, ongeacht de lengte van het profiel.
+
+Tussen twee samples wordt lineair geïnterpoleerd; snelheid, schaal en
+offset kunnen tijdens het afspelen gewijzigd worden.
+
+Gebruik:
+    convert_csv("veldmeting.csv", "veldmeting.npy", column=1, time_column=0)
+    player = ArbPlayer(ArbWaveform("veldmeting.npy"), loop=True, speed=2.0)
+    controller.start_current_arb(player)
+"""
+
+import os
+import csv
+import json
+import time
+import threading
+import numpy as np
+
+
+def _sidecar(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def save_profile(path, samples, sample_rate, unit=None):
+    """
+    Sla een profiel op (.npy met JSON metadata ernaast)
+
+    Args:
+        path: Pad van het .npy bestand
+        samples: Samples (numpy array)
+        sample_rate: Samples per seconde
+        unit: Eenheid ("V" of "mA"), alleen informatief
+    """
+    np.save(path, np.asarray(samples, dtype=np.float32))
+    with open(_sidecar(path), "w") as f:
+        json.dump({"sample_rate": sample_rate, "unit": unit}, f)
+
+
+def convert_csv(csv_path, npy_path, column=0, time_column=None, sample_rate=None,
+                unit=None, delimiter=","):
+    """
+    Converteer een CSV profiel naar een .npy profiel (constant geheugen)
+
+    Het bestand wordt twee keer gelezen: eerst tellen, daarna direct in
+    een gemapt .npy bestand schrijven.
+
+    Args:
+        csv_path: CSV bestand (regels die niet numeriek zijn worden overgeslagen)
+        npy_path: Doelbestand
+        column: Kolom met de waarden
+        time_column: Kolom met tijd in seconden (bepaalt de sample rate)
+        sample_rate: Sample rate als er geen tijdkolom is
+        unit: Eenheid voor de metadata
+
+    Returns:
+        Aantal samples
+    """
+    def rows():
+        with open(csv_path, newline="") as f:
+            for row in csv.reader(f, delimiter=delimiter):
+                try:
+                    yield float(row[column]), (float(row[time_column])
+                                               if time_column is not None else None)
+                except (ValueError, IndexError):
+                    continue  # Header of lege regel
+
+    count = 0
+    first_t = last_t = None
+    for _, t in rows():
+        if first_t is None:
+            first_t = t
+        last_t = t
+        count += 1
+    if count < 2:
+        raise ValueError(f"Te weinig samples in {csv_path}")
+    if time_column is not None:
+        # Uniform bemonsterd verondersteld; resampling zie capture_replay.py
+        sample_rate = (count - 1) / (last_t - first_t)
+    if not sample_rate:
+        raise ValueError("Geef een tijdkolom of een sample rate op")
+
+    samples = np.lib.format.open_memmap(npy_path, mode="w+", dtype=np.float32,
+                                        shape=(count,))
+    chunk = np.empty(65536, dtype=np.float32)
+    offset = fill = 0
+    for value, _ in rows():
+        chunk[fill] = value
+        fill += 1
+        if fill == len(chunk):
+            samples[offset:offset + fill] = chunk
+            offset += fill
+            fill = 0
+    samples[offset:offset + fill] = chunk[:fill]
+    samples.flush()
+    del samples
+
+    with open(_sidecar(npy_path), "w") as f:
+        json.dump({"sample_rate": sample_rate, "unit": unit}, f)
+    return count
+
+
+class ArbWaveform:
+    """Gemapt profiel bestand"""
+
+    def __init__(self, path, sample_rate=None):
+        """
+        Open een profiel
+
+        Args:
+            path: .npy bestand, of een ruw little-endian float32 bestand
+            sample_rate: Sample rate (default: uit <profiel>.json)
+        """
+        self.path = path
+        metadata = {}
+        if os.path.exists(_sidecar(path)):
+            with open(_sidecar(path)) as f:
+                metadata = json.load(f)
+        self.unit = metadata.get("unit")
+        self.sample_rate = sample_rate or metadata.get("sample_rate")
+        if not self.sample_rate:
+            raise ValueError(f"Geen sample rate bekend voor {path}")
+
+        if path.endswith(".npy"):
+            self.samples = np.load(path, mmap_mode="r")
+        else:
+            self.samples = np.memmap(path, dtype="<f4", mode="r")
+        if self.samples.ndim != 1 or len(self.samples) < 2:
+            raise ValueError(f"Profiel moet minstens 2 samples (1D) bevatten: {path}")
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def duration(self):
+        """Duur van één doorloop in seconden (bij speed 1)"""
+        return len(self) / self.sample_rate
+
+    def read_block(self, index, size, loop):
+        """
+        Kopieer blok index (size samples plus één voor de interpolatie)
+
+        Args:
+            index: Blok nummer
+            size: Samples per blok
+            loop: True = na het laatste sample volgt het eerste
+
+        Returns:
+            numpy float64 array
+        """
+        start = index * size
+        stop = min(start + size + 1, len(self))
+        block = np.array(self.samples[start:stop], dtype=np.float64)
+        if stop - start < size + 1 and stop == len(self):
+            # Laatste blok: aanvullen met het begin (loop) of de eindwaarde
+            tail = self.samples[0] if loop else self.samples[-1]
+            block = np.append(block, tail)
+        return block
+
+
+class ArbPlayer:
+    """Speelt een ArbWaveform af met prefetch van het volgende blok"""
+
+    def __init__(self, waveform, loop=True, speed=1.0, scale=1.0, offset=0.0,
+                 block_size=65536):
+        """
+        Args:
+            waveform: ArbWaveform
+            loop: Herhalen na het einde
+            speed: Afspeelsnelheid (1.0 = origineel)
+            scale: Vermenigvuldiging van de samples
+            offset: Optelling na schaling (waarde = offset + scale * sample)
+            block_size: Samples per prefetch blok
+        """
+        self.waveform = waveform
+        self.loop = loop
+        self.speed = speed
+        self.scale = scale
+        self.offset = offset
+        self.block_size = block_size
+        self.blocks = -(-len(waveform) // block_size)
+
+        self.position = 0.0     # In samples van het profiel
+        self._last = None
+        self._blocks = {}       # Maximaal twee blokken: huidig en volgend
+        self._wanted = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self.running = False
+        self.prefetch_misses = 0
+        self.finished = False
+
+    def _next_index(self, index):
+        if index + 1 < self.blocks:
+            return index + 1
+        return 0 if self.loop else None
+
+    def _prefetch_loop(self):
+        """Thread functie: laad het gevraagde blok"""
+        while True:
+            with self._cond:
+                while self.running and (self._wanted is None or self._wanted in self._blocks):
+                    self._cond.wait()
+                if not self.running:
+                    return
+                index = self._wanted
+            block = self.waveform.read_block(index, self.block_size, self.loop)
+            with self._cond:
+                self._blocks[index] = block
+
+    def start(self):
+        """Start de prefetch thread en laad het eerste blok"""
+        self.running = True
+        self.finished = False
+        index = int(self.position) // self.block_size
+        self._blocks = {index: self.waveform.read_block(index, self.block_size, self.loop)}
+        self._wanted = self._next_index(index)
+        self._last = None
+        self._thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop de prefetch thread"""
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+    def seek(self, seconds):
+        """Spring naar een positie (seconden in het profiel)"""
+        with self._cond:
+            self.position = (seconds * self.waveform.sample_rate) % len(self.waveform)
+            self._blocks.clear()
+            self._wanted = int(self.position) // self.block_size
+            self._cond.notify()
+
+    def _block(self, index):
+        """Blok uit de buffer; bij een prefetch miss direct laden"""
+        with self._cond:
+            block = self._blocks.get(index)
+            if block is None:
+                self.prefetch_misses += 1
+                block = self.waveform.read_block(index, self.block_size, self.loop)
+                self._blocks[index] = block
+            # Alleen het huidige en het volgende blok bewaren
+            wanted = self._next_index(index)
+            for stale in [k for k in self._blocks if k not in (index, wanted)]:
+                del self._blocks[stale]
+            if wanted != self._wanted:
+                self._wanted = wanted
+                self._cond.notify()
+        return block
+
+    def next_value(self, now=None):
+        """
+        Waarde voor het huidige moment; schuift de positie op
+
+        Args:
+            now: time.monotonic() (default: nu)
+
+        Returns:
+            Geïnterpoleerde en geschaalde waarde, of None als het profiel
+            afgelopen is (zonder loop)
+        """
+        if now is None:
+            now = time.monotonic()
+        if self._last is not None:
+            self.position += (now - self._last) * self.speed * self.waveform.sample_rate
+        self._last = now
+
+        length = len(self.waveform)
+        if self.position >= length - 1 and not self.loop:
+            self.finished = True
+            return None
+        self.position %= length
+
+        index = int(self.position) // self.block_size
+        block = self._block(index)
+        local = self.position - index * self.block_size
+        i = int(local)
+        fraction = local - i
+        sample = block[i] + (block[i + 1] - block[i]) * fraction
+        return self.offset + self.scale * sample
+
+
+# Test functie
+if __name__ == "__main__":
+    import tempfile
+
+    print("Arbitrary Waveform Test")
+    print("=" * 50)
+
+    directory = tempfile.mkdtemp(prefix="imc_arb_")
+
+    # CSV met tijdkolom naar .npy
+    csv_path = os.path.join(directory, "profiel.csv")
+    with open(csv_path, "w") as f:
+        f.write("t,ma\n")
+        for k in range(1000):
+            f.write(f"{k * 0.01:.2f},{12 + 8 * np.sin(k * 0.01):.4f}\n")
+    count = convert_csv(csv_path, os.path.join(directory, "profiel.npy"),
+                        column=1, time_column=0, unit="mA")
+    print(f"  CSV geconverteerd: {count} samples")
+
+    # Groot profiel: 5M samples op 1 kHz
+    path = os.path.join(directory, "lang.npy")
+    save_profile(path, np.sin(np.arange(5_000_000) * 2 * np.pi / 1000.0), 1000.0, "V")
+    player = ArbPlayer(ArbWaveform(path), speed=37.0, scale=1.0, offset=1.65,
+                       block_size=16384)
+    player.start()
+    t = time.monotonic()
+    values = []
+    for step in range(200):
+        values.append(player.next_value(t + step * 0.01))
+        time.sleep(0.001)
+    player.stop()
+    print(f"  {len(values)} waarden, bereik {min(values):.3f}..{max(values):.3f}, "
+          f"positie {player.position:.0f}, prefetch misses: {player.prefetch_misses}")
+
+    print("\n✓ Test voltooid")
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Async Controller
+asyncio facade over de DAC, ADC en relay controllers
+
+Alle hardware I/O van de facade loopt via één dedicated executor thread:
+de I2C bus en de GPIO worden nooit vanuit de event loop aangeroepen en
+nooit door meerdere facade aanroepen tegelijk. Ramps, golfvormen en
+relay bursts zijn coroutines die klaar zijn als de output klaar is;
+ADC streams zijn async iterators over de blokken van de acquisitie
+thread van de ADCController.
+
+Zo kunnen meerdere stimuli en metingen in één event loop gecoördineerd
+worden:
+
+    async def test(ctrl):
+        ramp = asyncio.create_task(ctrl.ramp_voltage(0.0, 3.0, duration=2.0))
+        async with contextlib.aclosing(ctrl.stream(0, block_size=64)) as blocks:
+            async for channel, t, volts in blocks:
+                if ramp.done():
+                    break
+        await ctrl.relay_burst(10, count=5)
+
+    asyncio.run(test(AsyncController(dac, adc, relay)))
+"""
+
+import asyncio
+import concurrent.futures
+from waveform_generator import WaveformGenerator
+
+
+class AsyncController:
+    """asyncio facade met één executor voor alle hardware I/O"""
+
+    # Update rate van ramps en golfvormen (gelijk aan de output loops)
+    UPDATE_RATE = 100.0
+
+    def __init__(self, dac, adc, relay, waveform=None):
+        """
+        Initialiseer facade
+
+        Args:
+            dac: DACController instantie
+            adc: ADCController instantie
+            relay: RelayController instantie
+            waveform: Optionele WaveformGenerator (default: eigen instantie)
+        """
+        self.dac = dac
+        self.adc = adc
+        self.relay = relay
+        self.waveform = waveform or WaveformGenerator()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="hardware_io")
+
+    @classmethod
+    def from_controller(cls, controller):
+        """Facade over de hardware van een BeagleBoneController"""
+        return cls(controller.dac, controller.adc, controller.relay, controller.waveform)
+
+    async def _io(self, function, *args):
+        """Voer een blokkerende hardware aanroep uit in de executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    # DAC
+
+    async def set_voltage(self, voltage):
+        """Stel de spanning in (0-3.3V); True als de write gelukt is"""
+        return await self._io(self.dac.set_voltage_output, voltage)
+
+    async def set_current(self, current_ma):
+        """Stel de stroom in (4-20mA); True als de write gelukt is"""
+        return await self._io(self.dac.set_current_output, current_ma)
+
+    async def _run_profile(self, setter, profile, duration, rate):
+        """
+        Schrijf een profiel op een vast tijdraster tot duration verstreken is
+
+        Het raster is absoluut (loop.time()), zodat vertraging van een
+        enkele write niet doorwerkt in de rest van het profiel.
+
+        Args:
+            setter: Async setter (set_voltage of set_current)
+            profile: Functie profile(elapsed) -> waarde
+            duration: Duur in seconden (None = tot annulering)
+            rate: Updates per seconde
+
+        Returns:
+            Aantal geslaagde writes
+        """
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / rate
+        start = loop.time()
+        writes = 0
+        k = 0
+        while True:
+            elapsed = k * interval
+            if duration is not None and elapsed > duration:
+                break
+            if await setter(profile(elapsed)):
+                writes += 1
+            k += 1
+            delay = start + k * interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Achter op het raster: sla gemiste punten over
+                k = int((loop.time() - start) / interval) + 1
+        return writes
+
+    async def ramp_voltage(self, start_v, end_v, duration, rate=UPDATE_RATE):
+        """
+        Lineaire spanningsramp; klaar als de eindwaarde geschreven is
+
+        Returns:
+            Aantal geslaagde writes
+        """
+        writes = await self._run_profile(
+            self.set_voltage,
+            lambda t: self.waveform.generate_ramp(start_v, end_v, duration, t),
+            duration, rate)
+        await self.set_voltage(end_v)
+        return writes + 1
+
+    async def ramp_current(self, start_i, end_i, duration, rate=UPDATE_RATE):
+        """
+        Lineaire stroomramp; klaar als de eindwaarde geschreven is
+
+        Returns:
+            Aantal geslaagde writes
+        """
+        writes = await self._run_profile(
+            self.set_current,
+            lambda t: self.waveform.generate_ramp(start_i, end_i, duration, t),
+            duration, rate)
+        await self.set_current(end_i)
+        return writes + 1
+
+    async def voltage_waveform(self, wave_type, min_v, max_v, frequency,
+                               duration=None, rate=UPDATE_RATE):
+        """
+        Spanningsgolfvorm; loopt tot duration verstreken is of tot annulering
+
+        Returns:
+            Aantal geslaagde writes
+        """
+        generator = WaveformGenerator()  # Eigen fase per golfvorm
+        return await self._run_profile(
+            self.set_voltage,
+            lambda t: generator.generate(wave_type, min_v, max_v, frequency),
+            duration, rate)
+
+    async def current_waveform(self, wave_type, min_i, max_i, frequency,
+                               duration=None, rate=UPDATE_RATE):
+        """
+        Stroomgolfvorm; loopt tot duration verstreken is of tot annulering
+
+        Returns:
+            Aantal geslaagde writes
+        """
+        generator = WaveformGenerator()
+        return await self._run_profile(
+            self.set_current,
+            lambda t: generator.generate(wave_type, min_i, max_i, frequency),
+            duration, rate)
+
+    # Relay
+
+    async def set_relay(self, state):
+        """Zet de relay constant AAN of UIT"""
+        await self._io(self.relay.set_state, state)
+
+    async def start_relay(self, frequency):
+        """Start periodiek schakelen in de relay thread"""
+        return await self._io(self.relay.start_switching, frequency)
+
+    async def stop_relay(self):
+        """Stop schakelen en zet de relay UIT"""
+        await self._io(self.relay.stop)
+
+    async def relay_burst(self, frequency, count):
+        """
+        Geef een vast aantal pulsen; klaar na de laatste flank
+
+        Args:
+            frequency: Pulsfrequentie in Hz
+            count: Aantal pulsen
+
+        Returns:
+            Aantal gegeven pulsen
+        """
+        loop = asyncio.get_running_loop()
+        half_period = 1.0 / (2.0 * frequency)
+        start = loop.time()
+        try:
+            for edge in range(2 * count):
+                await self._io(self.relay.set_state, edge % 2 == 0)
+                delay = start + (edge + 1) * half_period - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        finally:
+            # Ook bij annulering de relay UIT achterlaten
+            await asyncio.shield(self._io(self.relay.set_state, False))
+        return count
+
+    # ADC
+
+    async def read_channel(self, channel):
+        """Lees één kanaal (Volt)"""
+        return await self._io(self.adc.read_channel, channel)
+
+    async def read_all_channels(self):
+        """Lees alle 4 kanalen (Volt)"""
+        return await self._io(self.adc.read_all_channels)
+
+    async def stream(self, channel, block_size=64, data_rate=None, max_blocks=16):
+        """
+        Async iterator over de blokken van een ADC stream
+
+        De acquisitie loopt in de stream thread van de ADCController; de
+        blokken worden via call_soon_threadsafe in een begrensde queue
+        gezet. Als de consument niet bijhoudt wordt het oudste blok
+        weggegooid. De stream stopt als de iterator gesloten wordt
+        (gebruik contextlib.aclosing bij een break uit de loop).
+
+        Args:
+            channel: Kanaal nummer (0-3)
+            block_size: Samples per blok
+            data_rate: ADS1115 data rate (default: maximale data rate)
+            max_blocks: Maximaal aantal gebufferde blokken
+
+        Yields:
+            Tuple (channel, timestamps, volts)
+        """
+        loop = asyncio.get_running_loop()
+        blocks = asyncio.Queue(maxsize=max_blocks)
+
+        def put(block):
+            if blocks.full():
+                blocks.get_nowait()
+            blocks.put_nowait(block)
+
+        def listener(block_channel, timestamps, raw):
+            if block_channel != channel:
+                return
+            volts = self.adc.raw_to_voltage(raw, channel)
+            loop.call_soon_threadsafe(put, (channel, timestamps, volts))
+
+        self.adc.add_block_listener(listener)
+        await self._io(self.adc.start_stream, channel, block_size,
+                       data_rate or self.adc.MAX_DATA_RATE)
+        try:
+            while True:
+                yield await blocks.get()
+        finally:
+            self.adc.remove_block_listener(listener)
+            await asyncio.shield(self._io(self.adc.stop_stream))
+
+    async def monitor(self, interval=0.5):
+        """
+        Async iterator over periodieke metingen van alle kanalen
+
+        Args:
+            interval: Tijd tussen metingen in seconden
+
+        Yields:
+            List met 4 spanningen
+        """
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        while True:
+            yield await self.read_all_channels()
+            next_time += interval
+            await asyncio.sleep(max(next_time - loop.time(), 0))
+
+    def close(self):
+        """Stop de executor (wacht op lopende hardware aanroepen)"""
+        self.executor.shutdown(wait=True)
+
+
+# Test functie
+if __name__ == "__main__":
+    import time
+    from dac_controller import DACController
+    from adc_controller import ADCController
+    from relay_controller import RelayController
+
+    print("Async Controller Test")
+    print("=" * 50)
+
+    async def main(ctrl):
+        start = time.monotonic()
+        ramp = asyncio.create_task(ctrl.ramp_voltage(0.0, 3.0, duration=0.05))
+        burst = asyncio.create_task(ctrl.relay_burst(50, count=3))
+        values = []
+        async for volts in ctrl.monitor(interval=0.01):
+            values.append(volts)
+            if ramp.done() and burst.done():
+                break
+        print(f"  Ramp: {ramp.result()} writes, burst: {burst.result()} pulsen, "
+              f"{len(values)} metingen in {time.monotonic() - start:.3f}s")
+
+    controller = AsyncController(DACController(), ADCController(), RelayController())
+    asyncio.run(main(controller))
+    controller.close()
+
+    print("\n✓ Test voltooid")
@@ -11,9 +11,30 @@ from dac_controller import DACController
 from adc_controller import ADCController
 from relay_controller import RelayController
 from waveform_generator import WaveformGenerator
+from protection_rules import RuleEngine
+from output_watchdog import Watchdog
+from latency_histogram import LatencyMonitor
+from metrics_exporter import MetricsExporter, DEFAULT_PORT as METRICS_PORT, \
+    DEFAULT_HOST as METRICS_HOST
+from controller_daemon import ControllerDaemon, DEFAULT_SOCKET as DAEMON_SOCKET
 
 class BeagleBoneController:
-    def __init__(self):
+    # Maximale tijd tussen twee geslaagde writes van een output loop (100Hz)
+    WATCHDOG_DEADLINE = 0.2
+    
+    # Tick van de output loops; een cyclus die langer duurt telt als overrun
+    LOOP_PERIOD = 0.01
+    
+    def __init__(self, metrics_port=None, metrics_host=METRICS_HOST,
+                 safe_voltage=0.0, safe_current=4.0, safe_relay=False):
+        """
+        Args:
+            metrics_port: TCP poort van de Prometheus metrics (None = uit)
+            metrics_host: Adres van de metrics server (default alleen lokaal)
+            safe_voltage: Spanning in de safe state (V)
+            safe_current: Stroom in de safe state (mA)
+            safe_relay: Relay in de safe state (False = open, True = gesloten)
+        """
         print("Initialiseren van BeagleBone controller...")
         try:
             self.dac = DACController()
@@ -28,12 +49,71 @@ class BeagleBoneController:
             
             self.voltage_thread = None
             self.current_thread = None
+            self.replay_start = None  # Tijd van de eerste replay update
+            
+            # Output writes en safe-state sluiten elkaar uit
+            self._output_lock = threading.Lock()
+            self.safe_state_reason = None
+            self.configure_safe_state(safe_voltage, safe_current, safe_relay)
+            
+            # Menu modus: pauzes zodat de gebruiker de meldingen kan lezen
+            # (de daemon zet dit uit)
+            self.interactive = True
+            self.loop_overruns = {"voltage": 0, "current": 0}
+            
+            # Bewaking van de ADC ingangen tijdens het sturen
+            self.protection = RuleEngine(self.adc)
+            
+            # Safe state als een output loop vastloopt
+            self.watchdog = Watchdog(self.enter_safe_state)
+            self.watchdog.start()
+            
+            # Latency per aanroep van de hot paths (uit tot latency.enable())
+            self.latency = LatencyMonitor()
+            self.latency.instrument(self.dac, "set_voltage_output")
+            self.latency.instrument(self.dac, "set_current_output")
+            self.latency.instrument(self.adc, "read_channel")
+            self.latency.attach(self.relay, "edge_latency", "RelayController.edge")
+            
+            # Prometheus metrics voor bewaking van het test rack (opt-in)
+            self.metrics = None
+            if metrics_port is not None:
+                self.start_metrics(metrics_port, metrics_host)
             
             print("✓ Initialisatie succesvol")
         except Exception as e:
             print(f"✗ Fout bij initialisatie: {e}")
             sys.exit(1)
     
+    def start_metrics(self, port=METRICS_PORT, host=METRICS_HOST):
+        """
+        Start de Prometheus metrics server
+        
+        Args:
+            port: TCP poort
+            host: Adres om op te luisteren ("" = alle interfaces)
+            
+        Returns:
+            True als de server luistert
+        """
+        self.stop_metrics()
+        self.metrics = MetricsExporter(self, port=port, host=host)
+        if not self.metrics.start():
+            self.metrics = None
+            return False
+        return True
+    
+    def stop_metrics(self):
+        """Stop de metrics server (indien gestart)"""
+        if self.metrics:
+            self.metrics.stop()
+            self.metrics = None
+    
+    def _pause(self, seconds):
+        """Wacht zodat een melding leesbaar blijft (alleen in de menu modus)"""
+        if self.interactive:
+            time.sleep(seconds)
+    
     def clear_screen(self):
         """Clear terminal scherm"""
         print("\033[2J\033[H", end="")
@@ -52,6 +132,7 @@ class BeagleBoneController:
         print("5. Status weergeven")
         print("6. Alles stoppen")
         print("7. Afsluiten")
+        print("8. Latency metingen")
         print()
         print("=" * 60)
     
@@ -166,120 +247,355 @@ class BeagleBoneController:
         
         if choice == "1":
             freq = float(input("Frequentie (0.01-60Hz): "))
-            if 0.01 <= freq <= 60:
-                self.relay.start_switching(freq)
-                self.relay_running = True
-                print(f"✓ Relay schakelt op {freq}Hz")
-                time.sleep(2)
+            self.start_relay(freq)
+        elif choice == "2":
+            self.set_relay(True)
+        elif choice == "3":
+            self.set_relay(False)
+        elif choice == "4":
+            return
+    
+    def latency_menu(self):
+        """Menu voor de latency metingen"""
+        self.clear_screen()
+        print("=" * 60)
+        print(" Latency Metingen")
+        print("=" * 60)
+        print()
+        print(f"Meting: {'AAN' if self.latency.enabled else 'UIT'}")
+        print()
+        print(f"1. Meting {'uitzetten' if self.latency.enabled else 'aanzetten'}")
+        print("2. Rapport tonen (p50/p99/max)")
+        print("3. Histogrammen wissen")
+        print("4. Terug naar hoofdmenu")
+        print()
+        
+        choice = input("Keuze: ").strip()
+        
+        if choice == "1":
+            if self.latency.enabled:
+                self.latency.disable()
+                print("✓ Latency meting uit (histogrammen blijven bewaard)")
             else:
-                print("✗ Frequentie moet tussen 0.01 en 60 Hz zijn")
-                time.sleep(2)
+                self.latency.enable()
+                print("✓ Latency meting aan")
+            self._pause(1)
         elif choice == "2":
-            self.relay.set_state(True)
-            self.relay_running = False
-            print("✓ Relay is AAN")
-            time.sleep(1)
+            print()
+            self.latency.print_report()
+            input("\nDruk op Enter om terug te gaan...")
         elif choice == "3":
-            self.relay.stop()
-            self.relay_running = False
-            print("✓ Relay is UIT")
-            time.sleep(1)
+            self.latency.reset()
+            print("✓ Histogrammen gewist")
+            self._pause(1)
         elif choice == "4":
             return
     
+    def start_relay(self, frequency):
+        """Start het schakelen van de relay"""
+        if 0.01 <= frequency <= 60:
+            self.relay.start_switching(frequency)
+            self.relay_running = True
+            print(f"✓ Relay schakelt op {frequency}Hz")
+            self._pause(2)
+            return True
+        print("✗ Frequentie moet tussen 0.01 en 60 Hz zijn")
+        self._pause(2)
+        return False
+    
+    def set_relay(self, state):
+        """Zet de relay constant AAN of UIT"""
+        if state:
+            self.relay.set_state(True)
+        else:
+            self.relay.stop()
+        self.relay_running = False
+        print(f"✓ Relay is {'AAN' if state else 'UIT'}")
+        self._pause(1)
+        return True
+    
     def set_constant_voltage(self, voltage):
         """Stel vaste spanning in"""
         if 0 <= voltage <= 3.3:
             self.stop_voltage()
-            self.dac.set_voltage_output(voltage)
-            print(f"✓ Spanning ingesteld op {voltage}V")
-            time.sleep(2)
-        else:
-            print("✗ Spanning moet tussen 0 en 3.3V zijn")
-            time.sleep(2)
+            ok = self.dac.set_voltage_output(voltage)
+            if ok:
+                print(f"✓ Spanning ingesteld op {voltage}V")
+            else:
+                print(f"✗ Spanning niet ingesteld: DAC write mislukt")
+            self._pause(2)
+            return ok
+        print("✗ Spanning moet tussen 0 en 3.3V zijn")
+        self._pause(2)
+        return False
     
     def set_constant_current(self, current_ma):
         """Stel vaste stroom in"""
         if 4 <= current_ma <= 20:
             self.stop_current()
-            self.dac.set_current_output(current_ma)
-            print(f"✓ Stroom ingesteld op {current_ma}mA")
-            time.sleep(2)
-        else:
-            print("✗ Stroom moet tussen 4 en 20mA zijn")
-            time.sleep(2)
+            ok = self.dac.set_current_output(current_ma)
+            if ok:
+                print(f"✓ Stroom ingesteld op {current_ma}mA")
+            else:
+                print(f"✗ Stroom niet ingesteld: DAC write mislukt")
+            self._pause(2)
+            return ok
+        print("✗ Stroom moet tussen 4 en 20mA zijn")
+        self._pause(2)
+        return False
     
     def start_voltage_waveform(self, wave_type, min_v, max_v, frequency):
         """Start voltage waveform in aparte thread"""
         self.stop_voltage()
         self.voltage_running = True
         
+        heartbeat = self.watchdog.register("voltage", self.WATCHDOG_DEADLINE)
+        
         def voltage_loop():
-            while self.voltage_running:
-                voltage = self.waveform.generate(wave_type, min_v, max_v, frequency)
-                self.dac.set_voltage_output(voltage)
-                time.sleep(0.01)  # 100Hz update rate
+            try:
+                while self.voltage_running:
+                    tick = time.monotonic()
+                    voltage = self.waveform.generate(wave_type, min_v, max_v, frequency)
+                    with self._output_lock:
+                        if not self.voltage_running:
+                            break
+                        if self.dac.set_voltage_output(voltage):
+                            heartbeat.beat()
+                    self._count_overrun("voltage", tick)
+                    time.sleep(0.01)  # 100Hz update rate
+            finally:
+                self.watchdog.unregister("voltage", heartbeat)
         
         self.voltage_thread = threading.Thread(target=voltage_loop, daemon=True)
         self.voltage_thread.start()
         print(f"✓ Spanningsbron gestart: {wave_type} {min_v}-{max_v}V @ {frequency}Hz")
-        time.sleep(2)
+        self._pause(2)
+        return True
     
     def start_current_waveform(self, wave_type, min_i, max_i, frequency):
         """Start current waveform in aparte thread"""
         self.stop_current()
         self.current_running = True
         
+        heartbeat = self.watchdog.register("current", self.WATCHDOG_DEADLINE)
+        
         def current_loop():
-            while self.current_running:
-                current = self.waveform.generate(wave_type, min_i, max_i, frequency)
-                self.dac.set_current_output(current)
-                time.sleep(0.01)  # 100Hz update rate
+            try:
+                while self.current_running:
+                    tick = time.monotonic()
+                    current = self.waveform.generate(wave_type, min_i, max_i, frequency)
+                    with self._output_lock:
+                        if not self.current_running:
+                            break
+                        if self.dac.set_current_output(current):
+                            heartbeat.beat()
+                    self._count_overrun("current", tick)
+                    time.sleep(0.01)  # 100Hz update rate
+            finally:
+                self.watchdog.unregister("current", heartbeat)
         
         self.current_thread = threading.Thread(target=current_loop, daemon=True)
         self.current_thread.start()
         print(f"✓ Stroombron gestart: {wave_type} {min_i}-{max_i}mA @ {frequency}Hz")
-        time.sleep(2)
+        self._pause(2)
+        return True
     
     def start_voltage_ramp(self, start_v, end_v, duration):
         """Start voltage ramp"""
         self.stop_voltage()
         self.voltage_running = True
         
+        heartbeat = self.watchdog.register("voltage", self.WATCHDOG_DEADLINE)
+        
         def ramp_loop():
             start_time = time.time()
-            while self.voltage_running and (time.time() - start_time) < duration:
-                elapsed = time.time() - start_time
-                progress = elapsed / duration
-                voltage = start_v + (end_v - start_v) * progress
-                self.dac.set_voltage_output(voltage)
-                time.sleep(0.01)
-            self.voltage_running = False
+            try:
+                while self.voltage_running and (time.time() - start_time) < duration:
+                    tick = time.monotonic()
+                    elapsed = time.time() - start_time
+                    progress = elapsed / duration
+                    voltage = start_v + (end_v - start_v) * progress
+                    with self._output_lock:
+                        if not self.voltage_running:
+                            break
+                        if self.dac.set_voltage_output(voltage):
+                            heartbeat.beat()
+                    self._count_overrun("voltage", tick)
+                    time.sleep(0.01)
+                self.voltage_running = False
+            finally:
+                self.watchdog.unregister("voltage", heartbeat)
         
         self.voltage_thread = threading.Thread(target=ramp_loop, daemon=True)
         self.voltage_thread.start()
         print(f"✓ Voltage ramp gestart: {start_v}V → {end_v}V in {duration}s")
-        time.sleep(2)
+        self._pause(2)
+        return True
     
     def start_current_ramp(self, start_i, end_i, duration):
         """Start current ramp"""
         self.stop_current()
         self.current_running = True
         
+        heartbeat = self.watchdog.register("current", self.WATCHDOG_DEADLINE)
+        
         def ramp_loop():
             start_time = time.time()
-            while self.current_running and (time.time() - start_time) < duration:
-                elapsed = time.time() - start_time
-                progress = elapsed / duration
-                current = start_i + (end_i - start_i) * progress
-                self.dac.set_current_output(current)
-                time.sleep(0.01)
-            self.current_running = False
+            try:
+                while self.current_running and (time.time() - start_time) < duration:
+                    tick = time.monotonic()
+                    elapsed = time.time() - start_time
+                    progress = elapsed / duration
+                    current = start_i + (end_i - start_i) * progress
+                    with self._output_lock:
+                        if not self.current_running:
+                            break
+                        if self.dac.set_current_output(current):
+                            heartbeat.beat()
+                    self._count_overrun("current", tick)
+                    time.sleep(0.01)
+                self.current_running = False
+            finally:
+                self.watchdog.unregister("current", heartbeat)
         
         self.current_thread = threading.Thread(target=ramp_loop, daemon=True)
         self.current_thread.start()
         print(f"✓ Current ramp gestart: {start_i}mA → {end_i}mA in {duration}s")
-        time.sleep(2)
+        self._pause(2)
+        return True
+    
+    def start_voltage_arb(self, player):
+        """
+        Speel een arbitrary waveform af op de spanningsuitgang
+        
+        Args:
+            player: ArbPlayer (zie arb_waveform.py)
+        """
+        self.stop_voltage()
+        self.voltage_running = True
+        player.start()
+        
+        heartbeat = self.watchdog.register("voltage", self.WATCHDOG_DEADLINE)
+        
+        def arb_loop():
+            try:
+                while self.voltage_running:
+                    tick = time.monotonic()
+                    voltage = player.next_value(tick)
+                    if voltage is None:
+                        break  # Einde van het profiel (zonder loop)
+                    with self._output_lock:
+                        if not self.voltage_running:
+                            break
+                        if self.dac.set_voltage_output(voltage):
+                            heartbeat.beat()
+                    self._count_overrun("voltage", tick)
+                    time.sleep(0.01)
+                self.voltage_running = False
+            finally:
+                player.stop()
+                self.watchdog.unregister("voltage", heartbeat)
+        
+        self.voltage_thread = threading.Thread(target=arb_loop, daemon=True)
+        self.voltage_thread.start()
+        print(f"✓ Arbitrary waveform gestart op spanningsuitgang: "
+              f"{player.waveform.path} ({player.waveform.duration:.1f}s)")
+        self._pause(2)
+        return True
+    
+    def start_current_arb(self, player):
+        """
+        Speel een arbitrary waveform af op de stroomuitgang
+        
+        Args:
+            player: ArbPlayer (zie arb_waveform.py)
+        """
+        self.stop_current()
+        self.current_running = True
+        player.start()
+        
+        heartbeat = self.watchdog.register("current", self.WATCHDOG_DEADLINE)
+        
+        def arb_loop():
+            try:
+                while self.current_running:
+                    tick = time.monotonic()
+                    current = player.next_value(tick)
+                    if current is None:
+                        break
+                    with self._output_lock:
+                        if not self.current_running:
+                            break
+                        if self.dac.set_current_output(current):
+                            heartbeat.beat()
+                    self._count_overrun("current", tick)
+                    time.sleep(0.01)
+                self.current_running = False
+            finally:
+                player.stop()
+                self.watchdog.unregister("current", heartbeat)
+        
+        self.current_thread = threading.Thread(target=arb_loop, daemon=True)
+        self.current_thread.start()
+        print(f"✓ Arbitrary waveform gestart op stroomuitgang: "
+              f"{player.waveform.path} ({player.waveform.duration:.1f}s)")
+        self._pause(2)
+        return True
+    
+    def start_replay(self, program, loop=False):
+        """
+        Speel een gecompileerd replay programma af (zie capture_replay.py)
+        
+        De codes zijn vooraf berekend; elke update is een lookup op een
+        absoluut tijdraster en een I2C write.
+        
+        Args:
+            program: ReplayProgram voor de spannings- of stroomuitgang
+            loop: Herhalen na het einde
+        """
+        name = program.output
+        getattr(self, f"stop_{name}")()
+        setattr(self, f"{name}_running", True)
+        
+        heartbeat = self.watchdog.register(name, self.WATCHDOG_DEADLINE)
+        
+        def replay_loop():
+            start = time.monotonic()
+            self.replay_start = start
+            try:
+                while getattr(self, f"{name}_running"):
+                    tick = time.monotonic()
+                    k = int((tick - start) * program.rate)
+                    if k >= len(program):
+                        if not loop:
+                            break
+                        k %= len(program)
+                    with self._output_lock:
+                        if not getattr(self, f"{name}_running"):
+                            break
+                        if self.dac.set_output_code(name, program.codes[k],
+                                                    program.setpoints[k]):
+                            heartbeat.beat()
+                    self._count_overrun(name, tick)
+                    # Wachten tot het volgende punt van het raster
+                    next_time = start + (int((tick - start) * program.rate) + 1) / program.rate
+                    time.sleep(max(next_time - time.monotonic(), 0))
+                setattr(self, f"{name}_running", False)
+            finally:
+                self.watchdog.unregister(name, heartbeat)
+        
+        thread = threading.Thread(target=replay_loop, daemon=True)
+        setattr(self, f"{name}_thread", thread)
+        thread.start()
+        print(f"✓ Replay gestart op {name} output: {len(program)} updates "
+              f"({program.duration:.1f}s)")
+        self._pause(2)
+        return True
+    
+    def _count_overrun(self, name, tick):
+        """Tel een output cyclus die langer duurde dan de loop tick"""
+        if time.monotonic() - tick > self.LOOP_PERIOD:
+            self.loop_overruns[name] += 1
     
     def stop_voltage(self):
         """Stop voltage output"""
@@ -305,6 +621,9 @@ class BeagleBoneController:
         print("Druk op CTRL+C om te stoppen")
         print()
         
+        # Nieuw statistiek venster voor deze meting
+        self.adc.reset_statistics()
+        
         try:
             while True:
                 values = self.adc.read_all_channels()
@@ -313,9 +632,22 @@ class BeagleBoneController:
                       f"CH2: {values[2]:7.3f}V  CH3: {values[3]:7.3f}V", end="")
                 time.sleep(0.5)
         except KeyboardInterrupt:
+            self.show_adc_statistics()
             print("\n\nTerug naar menu...")
             time.sleep(1)
     
+    def show_adc_statistics(self):
+        """Toon de statistiek van het huidige ADC venster"""
+        print("\n")
+        print(f"{'':4} {'N':>7} {'Min':>8} {'Max':>8} {'Mean':>8} {'RMS':>8} {'Std':>8}")
+        for channel, stats in self.adc.get_statistics().items():
+            if stats['count'] == 0:
+                print(f"CH{channel}: {0:7d}")
+                continue
+            print(f"CH{channel}: {stats['count']:7d} {stats['min']:7.3f}V "
+                  f"{stats['max']:7.3f}V {stats['mean']:7.3f}V "
+                  f"{stats['rms']:7.3f}V {stats['std']:7.4f}V")
+    
     def show_status(self):
         """Toon huidige status"""
         self.clear_screen()
@@ -326,10 +658,101 @@ class BeagleBoneController:
         print(f"Spanningsbron: {'ACTIEF' if self.voltage_running else 'GESTOPT'}")
         print(f"Stroombron:    {'ACTIEF' if self.current_running else 'GESTOPT'}")
         print(f"Relay:         {'ACTIEF' if self.relay_running else 'GESTOPT'}")
+        if self.protection.rules:
+            tripped = self.protection.tripped()
+            if self.protection.running:
+                state = "ACTIEF"
+            elif self.protection.armed:
+                state = "GEEN ACQUISITIE"  # Stream/scan gestopt: regels zien geen samples
+            else:
+                state = "GESTOPT"
+            print(f"Protection:    {state}, "
+                  f"{len(self.protection.rules)} regel(s), "
+                  f"{'ALARM: ' + ', '.join(tripped) if tripped else 'geen alarm'}")
+        if self.safe_state_reason:
+            pending = " (NIET BEVESTIGD: DAC write mislukt)" if self.safe_state_pending else ""
+            print(f"Safe state:    {self.safe_state_reason}{pending}")
+        i2c = self.dac.transport.stats()
+        if i2c["errors"] or i2c["state"] != "closed":
+            print(f"I2C bus:       {i2c['state']}, {i2c['errors']} fouten, "
+                  f"{i2c['retries']} retries, {i2c['recoveries']} recovery")
+        if self.watchdog.stall_count:
+            print(f"Watchdog:      {self.watchdog.stall_count} stilstand(en), "
+                  f"log: {self.watchdog.log_path}")
+        if self.latency.enabled or any(h.count for h in self.latency.histograms.values()):
+            print()
+            self.latency.print_report()
         print()
         print("=" * 60)
         input("\nDruk op Enter om terug te gaan...")
     
+    def enter_safe_state(self, reason=None):
+        """
+        Zet alle outputs direct in de veilige toestand
+        
+        Niet-blokkerend (geen thread joins of sleeps), zodat de methode
+        vanuit de ADC acquisitie thread (protection regels) en de watchdog
+        aangeroepen kan worden. De waarden komen uit configure_safe_state()
+        (default: spanning 0V, stroom 4mA en relay open).
+        
+        Een DAC write die niet lukt (bijv. bij een open I2C breaker) blijft
+        pending in de DACController en wordt herhaald tot hij bevestigd is;
+        tot dan toont de status "NIET BEVESTIGD".
+        
+        Args:
+            reason: Omschrijving van de oorzaak (voor de status)
+            
+        Returns:
+            True als de outputs bevestigd in de safe state staan
+        """
+        # Begrensde wachttijd: een vastgelopen loop kan de lock vasthouden
+        locked = self._output_lock.acquire(timeout=0.05)
+        try:
+            self.voltage_running = False
+            self.current_running = False
+            self.relay_running = False
+            self.relay.force_state(self.safe_relay)
+            confirmed = self.dac.apply_safe_state(self.safe_voltage, self.safe_current)
+        finally:
+            if locked:
+                self._output_lock.release()
+        self.safe_state_reason = reason or "handmatig"
+        if not confirmed:
+            print(f"✗ Safe state niet bevestigd ({self.safe_state_reason}): DAC write "
+                  f"mislukt, wordt herhaald tot de bus weer werkt")
+        return confirmed
+    
+    def configure_safe_state(self, voltage=None, current=None, relay=None):
+        """
+        Stel de waarden van de safe state in (None = ongewijzigd)
+        
+        Args:
+            voltage: Spanning in V (0-3.3)
+            current: Stroom in mA (4-20)
+            relay: False = open, True = gesloten
+            
+        Returns:
+            dict met de actuele safe state
+        """
+        if voltage is not None:
+            if not 0 <= voltage <= self.dac.VREF:
+                raise ValueError(f"Safe spanning moet tussen 0 en {self.dac.VREF}V zijn")
+            self.safe_voltage = float(voltage)
+        if current is not None:
+            if not self.dac.CURRENT_MIN <= current <= self.dac.CURRENT_MAX:
+                raise ValueError(f"Safe stroom moet tussen {self.dac.CURRENT_MIN} en "
+                                 f"{self.dac.CURRENT_MAX}mA zijn")
+            self.safe_current = float(current)
+        if relay is not None:
+            self.safe_relay = bool(relay)
+        return {"voltage": self.safe_voltage, "current": self.safe_current,
+                "relay": self.safe_relay}
+    
+    @property
+    def safe_state_pending(self):
+        """True als de safe state nog niet bevestigd naar de DAC geschreven is"""
+        return self.dac.safe_state_pending is not None
+    
     def stop_all(self):
         """Stop alle outputs"""
         print("Alle outputs stoppen...")
@@ -338,13 +761,30 @@ class BeagleBoneController:
         self.relay.stop()
         self.relay_running = False
         print("✓ Alles gestopt")
-        time.sleep(1)
+        self._pause(1)
     
     def cleanup(self):
         """Cleanup voor afsluiten"""
+        if self.protection.armed:
+            self.protection.stop()
+        self.watchdog.stop()
+        self.stop_metrics()
         self.stop_all()
         print("Opruimen en afsluiten...")
-        time.sleep(0.5)
+        self._pause(0.5)
+    
+    def run_headless(self):
+        """Draai zonder menu tot SIGTERM of Ctrl+C"""
+        import signal
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        print("Headless modus actief (Ctrl+C om te stoppen)")
+        try:
+            while not stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.cleanup()
     
     def run(self):
         """Hoofdloop van de applicatie"""
@@ -369,6 +809,8 @@ class BeagleBoneController:
                     self.cleanup()
                     print("Tot ziens!")
                     break
+                elif choice == "8":
+                    self.latency_menu()
                 else:
                     print("Ongeldige keuze, probeer opnieuw...")
                     time.sleep(1)
@@ -383,5 +825,45 @@ class BeagleBoneController:
 
 
 if __name__ == "__main__":
-    controller = BeagleBoneController()
-    controller.run()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="BeagleBone DAC/ADC/Relay controller")
+    parser.add_argument("--headless", action="store_true",
+                        help="Zonder menu draaien (bijv. als systemd service)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Headless met commando socket voor automatisering")
+    parser.add_argument("--socket", default=DAEMON_SOCKET,
+                        help="Pad van de commando socket (met --daemon)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help=f"Start de Prometheus metrics op deze poort "
+                             f"(default: uit, gebruikelijk {METRICS_PORT})")
+    parser.add_argument("--metrics-host", default=METRICS_HOST,
+                        help="Adres van de metrics server (\"\" = alle interfaces)")
+    parser.add_argument("--safe-voltage", type=float, default=0.0,
+                        help="Spanning in de safe state (V, default 0)")
+    parser.add_argument("--safe-current", type=float, default=4.0,
+                        help="Stroom in de safe state (mA, default 4)")
+    parser.add_argument("--safe-relay", choices=("open", "closed"), default="open",
+                        help="Relay in de safe state (default open)")
+    parser.add_argument("--latency", action="store_true",
+                        help="Latency metingen direct aanzetten")
+    args = parser.parse_args()
+    
+    controller = BeagleBoneController(metrics_port=args.metrics_port or None,
+                                      metrics_host=args.metrics_host,
+                                      safe_voltage=args.safe_voltage,
+                                      safe_current=args.safe_current,
+                                      safe_relay=args.safe_relay == "closed")
+    if args.latency:
+        controller.latency.enable()
+    if args.daemon:
+        daemon = ControllerDaemon(controller, args.socket)
+        if daemon.start():
+            controller.run_headless()
+            daemon.stop()
+        else:
+            controller.cleanup()
+    elif args.headless:
+        controller.run_headless()
+    else:
+        controller.run()
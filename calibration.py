@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+DAC Kalibratie
+Automatische kalibratie sweep van de MCP4728 outputs met de ADS1115
+
+De MCP4728 interne reference en de opamp/MOSFET trappen wijken af van de
+ideale 0-3.3V / 4-20mA mapping. De sweep zet een reeks DAC codes, meet de
+output met de ADC op maximale data rate en fit gain, offset en niet-
+lineariteit. Het resultaat wordt per board opgeslagen als JSON tabel.
+
+Meet aansluitingen (standaard):
+- Voltage output -> ADC CH0
+- Current output -> shunt weerstand (150 Ohm) -> ADC CH1
+"""
+
+import os
+import json
+import time
+import socket
+import numpy as np
+
+
+# Standaard locatie voor kalibratie tabellen (naast de applicatie)
+CALIBRATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "calibration")
+
+# BeagleBone board EEPROM (bevat het serienummer op offset 16-28)
+BOARD_EEPROM = "/sys/bus/i2c/devices/0-0050/eeprom"
+
+
+def get_board_id():
+    """
+    Bepaal een unieke identificatie voor dit board
+
+    Returns:
+        Serienummer uit de board EEPROM, of de hostname als fallback
+    """
+    try:
+        with open(BOARD_EEPROM, "rb") as f:
+            header = f.read(28)
+        serial = header[16:28].decode("ascii", errors="ignore").strip("\x00 \xff")
+        if serial:
+            return serial
+    except OSError:
+        pass
+    return socket.gethostname()
+
+
+def measurement_setup(dac, output):
+    """
+    Bepaal setter, ADC kanaal en schaalfactor voor een output meting
+
+    Args:
+        dac: DACController instantie
+        output: 'voltage' of 'current'
+
+    Returns:
+        Tuple (setter, adc_channel, scale) waarbij scale ADC volts
+        omrekent naar de eenheid van de output (V of mA)
+    """
+    if output == "voltage":
+        return dac.set_voltage_output, Calibrator.VOLTAGE_ADC_CHANNEL, 1.0
+    elif output == "current":
+        return (dac.set_current_output, Calibrator.CURRENT_ADC_CHANNEL,
+                1000.0 / Calibrator.SHUNT_OHM)
+    raise ValueError(f"Onbekende output: {output}")
+
+
+class CalibrationTable:
+    """Per-board kalibratie tabel met meetpunten en fit resultaten"""
+
+    VERSION = 1
+
+    def __init__(self, board_id=None):
+        """
+        Initialiseer een lege kalibratie tabel
+
+        Args:
+            board_id: Board identificatie (default: get_board_id())
+        """
+        self.board_id = board_id or get_board_id()
+        self.created = None
+        self.outputs = {}
+
+    def set_output(self, name, codes, measured, adc_channel, unit):
+        """
+        Sla meetpunten op en fit gain, offset en niet-lineariteit
+
+        Args:
+            name: Output naam ('voltage' of 'current')
+            codes: DAC codes van de sweep
+            measured: Gemeten waarde per code (V of mA)
+            adc_channel: Gebruikte ADC kanaal
+            unit: Eenheid van de gemeten waarden
+        """
+        codes = np.asarray(codes, dtype=np.float64)
+        measured = np.asarray(measured, dtype=np.float64)
+
+        # Lineaire fit: measured = gain * code + offset
+        gain, offset = np.polyfit(codes, measured, 1)
+
+        # Niet-lineariteit (INL) = afwijking t.o.v. de lineaire fit
+        inl = measured - (gain * codes + offset)
+
+        self.outputs[name] = {
+            "adc_channel": adc_channel,
+            "unit": unit,
+            "codes": codes.astype(int).tolist(),
+            "measured": measured.tolist(),
+            "gain": float(gain),
+            "offset": float(offset),
+            "inl": inl.tolist(),
+            "inl_max": float(np.max(np.abs(inl))),
+        }
+        self.created = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    # Grenzen voor een bruikbare kalibratie (fractie van het output bereik)
+    MIN_SPAN_FRACTION = 0.5      # Gemeten bereik minstens de helft van het nominale
+    MONOTONIC_TOLERANCE = 0.01   # Toegestane daling tussen opeenvolgende codes (ruis)
+    MAX_INL_FRACTION = 0.05      # Maximale afwijking van de lineaire fit
+
+    def validate(self, spans):
+        """
+        Controleer of de fits bruikbaar zijn
+
+        Een sweep zonder hardware (of met een losse meetdraad) levert een
+        vlakke of omgekeerde curve; een LUT daarvan stuurt de output naar
+        verkeerde waarden. Zo'n tabel mag niet opgeslagen of gebruikt worden.
+
+        Args:
+            spans: Dict output naam -> nominaal bereik (V of mA)
+
+        Returns:
+            List met problemen (leeg = bruikbaar)
+        """
+        problems = []
+        for name, output in self.outputs.items():
+            span = spans.get(name)
+            if span is None:
+                problems.append(f"{name}: onbekende output")
+                continue
+            measured = np.asarray(output["measured"], dtype=np.float64)
+            if not np.all(np.isfinite(measured)) or len(measured) < 2:
+                problems.append(f"{name}: ongeldige meetpunten")
+                continue
+            if not output["gain"] > 0:
+                problems.append(f"{name}: gain {output['gain']:.3g} is niet positief")
+            measured_span = measured.max() - measured.min()
+            if measured_span < self.MIN_SPAN_FRACTION * span:
+                problems.append(f"{name}: gemeten bereik {measured_span:.3f} {output['unit']} "
+                                f"te klein (nominaal {span} {output['unit']})")
+            if np.min(np.diff(measured)) < -self.MONOTONIC_TOLERANCE * span:
+                problems.append(f"{name}: gemeten curve is niet monotoon")
+            if output["inl_max"] > self.MAX_INL_FRACTION * span:
+                problems.append(f"{name}: INL {output['inl_max']:.3f} {output['unit']} te groot")
+        return problems
+
+    def has_output(self, name):
+        """Controleer of er kalibratie data is voor een output"""
+        return name in self.outputs
+
+    def build_lut(self, name, value_min, value_max, step, dac_max=4095):
+        """
+        Bereken een code lookup table voor een output
+
+        Elke index i in de tabel hoort bij de waarde value_min + i * step.
+        De codes volgen de gemeten (niet-lineaire) curve; buiten het
+        gemeten bereik wordt de lineaire fit gebruikt.
+
+        Args:
+            name: Output naam ('voltage' of 'current')
+            value_min: Laagste waarde in de tabel
+            value_max: Hoogste waarde in de tabel
+            step: Resolutie van de tabel
+            dac_max: Maximale DAC code
+
+        Returns:
+            List met DAC codes (int)
+        """
+        output = self.outputs[name]
+        codes = np.asarray(output["codes"], dtype=np.float64)
+        # Interpolatie vereist een monotoon stijgende curve
+        measured = np.maximum.accumulate(np.asarray(output["measured"]))
+
+        n_entries = int(round((value_max - value_min) / step)) + 1
+        targets = value_min + np.arange(n_entries) * step
+
+        lut = np.interp(targets, measured, codes)
+
+        # Extrapoleer lineair buiten het gemeten bereik
+        outside = (targets < measured[0]) | (targets > measured[-1])
+        lut[outside] = (targets[outside] - output["offset"]) / output["gain"]
+
+        lut = np.clip(np.rint(lut), 0, dac_max).astype(int)
+        return lut.tolist()
+
+    def code_to_value(self, name, code):
+        """
+        Bereken de werkelijke output waarde voor een DAC code
+
+        Args:
+            name: Output naam ('voltage' of 'current')
+            code: DAC code
+
+        Returns:
+            Gemeten waarde volgens de kalibratie curve
+        """
+        output = self.outputs[name]
+        return float(np.interp(code, output["codes"], output["measured"]))
+
+    def to_dict(self):
+        """Converteer tabel naar dict (JSON serialiseerbaar)"""
+        return {
+            "version": self.VERSION,
+            "board_id": self.board_id,
+            "created": self.created,
+            "outputs": self.outputs,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Maak tabel aan vanuit een dict"""
+        if data.get("version") != cls.VERSION:
+            raise ValueError(f"Onbekende kalibratie versie: {data.get('version')}")
+        table = cls(board_id=data["board_id"])
+        table.created = data.get("created")
+        table.outputs = data["outputs"]
+        return table
+
+    @staticmethod
+    def default_path(board_id=None):
+        """Standaard bestandspad voor de tabel van een board"""
+        return os.path.join(CALIBRATION_DIR, f"{board_id or get_board_id()}.json")
+
+    def save(self, path=None):
+        """
+        Sla tabel op als JSON
+
+        Args:
+            path: Bestandspad (default: calibration/<board_id>.json)
+
+        Returns:
+            Gebruikte bestandspad
+        """
+        path = path or self.default_path(self.board_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Schrijf atomair zodat een onderbreking geen halve tabel achterlaat
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        """
+        Laad tabel uit JSON
+
+        Args:
+            path: Bestandspad (default: calibration/<board_id>.json)
+
+        Returns:
+            CalibrationTable, of None als er geen tabel bestaat
+        """
+        path = path or cls.default_path()
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class Calibrator:
+    """Voert de kalibratie sweep uit met DAC en ADC"""
+
+    VOLTAGE_ADC_CHANNEL = 0
+    CURRENT_ADC_CHANNEL = 1
+    SHUNT_OHM = 150.0  # Shunt weerstand voor de stroommeting
+
+    def __init__(self, dac, adc, code_step=32, samples_per_code=16,
+                 settle_time=0.005):
+        """
+        Initialiseer calibrator
+
+        Args:
+            dac: DACController instantie
+            adc: ADCController instantie
+            code_step: Stapgrootte tussen DAC codes in de sweep
+            samples_per_code: ADC samples per code (gemiddeld)
+            settle_time: Wachttijd na elke DAC write in seconden
+        """
+        self.dac = dac
+        self.adc = adc
+        self.code_step = code_step
+        self.samples_per_code = samples_per_code
+        self.settle_time = settle_time
+
+    def _sweep_codes(self):
+        """DAC codes voor de sweep (inclusief de maximale code)"""
+        codes = np.arange(0, self.dac.DAC_MAX_VALUE + 1, self.code_step)
+        if codes[-1] != self.dac.DAC_MAX_VALUE:
+            codes = np.append(codes, self.dac.DAC_MAX_VALUE)
+        return codes
+
+    def _sweep(self, dac_channel, adc_channel):
+        """
+        Sweep een DAC kanaal en meet elke code met de ADC
+
+        De ADC loopt tijdens de hele sweep als één continue stream; de DAC
+        stapt door de codes en de samples worden op tijdstempel aan een
+        code toegewezen (vanaf settle_time na de write tot de volgende
+        write). Codes zonder samples (bijv. na een I2C fout) worden
+        daarna los gemeten.
+
+        Args:
+            dac_channel: DAC kanaal letter
+            adc_channel: ADC kanaal nummer
+
+        Returns:
+            Tuple (codes, volts): numpy arrays
+        """
+        codes = self._sweep_codes()
+        rate = self.adc.MAX_DATA_RATE
+        block_time = self.samples_per_code * self.adc.CONVERSION_MARGIN / rate
+        dwell = self.settle_time + block_time
+
+        # Spanning per blok direct omrekenen: auto-ranging wisselt de gain
+        # pas na de block listeners
+        blocks = []
+
+        def collect(channel, timestamps, raw):
+            if channel == adc_channel:
+                blocks.append((timestamps, self.adc.raw_to_voltage(raw.astype(np.float64),
+                                                                   channel)))
+
+        # Begin en einde van elke DAC write
+        write_start = np.empty(len(codes) + 1)
+        write_end = np.empty(len(codes))
+        self.adc.add_block_listener(collect)
+        self.adc.start_stream(adc_channel, block_size=self.samples_per_code, data_rate=rate)
+        try:
+            next_time = time.monotonic()
+            for i, code in enumerate(codes):
+                write_start[i] = time.monotonic()
+                self.dac.set_raw_channel(dac_channel, int(code))
+                write_end[i] = time.monotonic()
+                next_time += dwell
+                time.sleep(max(0.0, next_time - time.monotonic()))
+            write_start[-1] = time.monotonic()
+            # Laatste blok (met de samples van de laatste code) laten binnenkomen
+            time.sleep(2 * block_time)
+        finally:
+            self.adc.stop_stream()
+            self.adc.remove_block_listener(collect)
+
+        if blocks:
+            timestamps = np.concatenate([block[0] for block in blocks])
+            samples = np.concatenate([block[1] for block in blocks])
+        else:
+            timestamps = samples = np.empty(0)
+
+        # Een sample is geldig als de hele conversie na het settlen ligt
+        lo = np.searchsorted(timestamps, write_end + self.settle_time + 1.0 / rate)
+        hi = np.searchsorted(timestamps, write_start[1:])
+        cumulative = np.concatenate(([0.0], np.cumsum(samples)))
+        counts = hi - lo
+        volts = np.full(len(codes), np.nan)
+        valid = counts > 0
+        volts[valid] = (cumulative[hi[valid]] - cumulative[lo[valid]]) / counts[valid]
+
+        for i in np.flatnonzero(~valid):
+            self.dac.set_raw_channel(dac_channel, int(codes[i]))
+            time.sleep(self.settle_time)
+            _, raw = self.adc.capture_block(adc_channel, self.samples_per_code,
+                                            data_rate=rate)
+            volts[i] = self.adc.raw_to_voltage(raw.mean(), adc_channel)
+
+        return codes, volts
+
+    def calibrate_voltage(self, table):
+        """Kalibreer de voltage output (channel A)"""
+        print("Kalibratie voltage output (channel A)...")
+        codes, volts = self._sweep('A', self.VOLTAGE_ADC_CHANNEL)
+        self.dac.set_raw_channel('A', 0)
+        table.set_output("voltage", codes, volts, self.VOLTAGE_ADC_CHANNEL, "V")
+
+    def calibrate_current(self, table):
+        """Kalibreer de current output (channel C, D op 0)"""
+        print("Kalibratie current output (channel C)...")
+        self.dac.set_raw_channel('D', 0)
+        codes, volts = self._sweep('C', self.CURRENT_ADC_CHANNEL)
+        self.dac.set_raw_channel('C', 0)
+        current_ma = volts / self.SHUNT_OHM * 1000.0
+        table.set_output("current", codes, current_ma, self.CURRENT_ADC_CHANNEL, "mA")
+
+    def run(self, save=True):
+        """
+        Voer de volledige kalibratie uit
+
+        Args:
+            save: Sla de tabel op en activeer hem in de DAC controller
+
+        Returns:
+            CalibrationTable met de resultaten, of None als de kalibratie
+            niet uitgevoerd kon worden of de fit onbruikbaar is
+        """
+        if not self.dac.dac or not self.adc.adc:
+            print("✗ Kalibratie vereist DAC en ADC hardware (test modus)")
+            return None
+
+        # Verwijder eventuele oude kalibratie zodat de sweep ruwe codes gebruikt
+        previous = self.dac.calibration
+        self.dac.clear_calibration()
+        applied = False
+
+        try:
+            table = CalibrationTable()
+            self.calibrate_voltage(table)
+            self.calibrate_current(table)
+
+            problems = table.validate(self.dac.output_spans())
+            if problems:
+                for problem in problems:
+                    print(f"✗ Kalibratie afgekeurd: {problem}")
+                return None
+
+            if save:
+                path = table.save()
+                print(f"✓ Kalibratie opgeslagen in {path}")
+                self.dac.apply_calibration(table)
+                applied = True
+            return table
+        finally:
+            # Zonder nieuwe tabel de vorige kalibratie weer activeren
+            if not applied and previous is not None:
+                self.dac.apply_calibration(previous)
+            self.dac.reset_all()
+
+
+# Kalibratie uitvoeren
+if __name__ == "__main__":
+    import sys
+    from dac_controller import DACController
+    from adc_controller import ADCController
+
+    print("DAC Kalibratie")
+    print("=" * 50)
+    print(f"Voltage output -> ADC CH{Calibrator.VOLTAGE_ADC_CHANNEL}")
+    print(f"Current output -> {Calibrator.SHUNT_OHM:.0f} Ohm shunt -> "
+          f"ADC CH{Calibrator.CURRENT_ADC_CHANNEL}")
+    print()
+
+    dac = DACController()
+    adc = ADCController()
+
+    start = time.time()
+    table = Calibrator(dac, adc).run()
+    print(f"\nSweep duur: {time.time() - start:.1f}s")
+    if table is None:
+        sys.exit(1)
+
+    for name, output in table.outputs.items():
+        print(f"\n{name}:")
+        print(f"  Gain:    {output['gain']:.6f} {output['unit']}/code")
+        print(f"  Offset:  {output['offset']:.4f} {output['unit']}")
+        print(f"  INL max: {output['inl_max']:.4f} {output['unit']}")
+
+    print("\n✓ Kalibratie voltooid")
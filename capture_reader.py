@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Capture Reader
+Memory-mapped toegang tot (lange) capture bestanden
+
+Een capture bestand wordt niet ingelezen maar gemapt (np.memmap); het
+OS laadt alleen de pagina's die gebruikt worden. Een sparse tijdindex
+(de tijdstempel van elk INDEX_STEP-de record) vindt het begin en einde
+van een tijdvenster met een binary search, waarna het venster een numpy
+view op de mapping is: kosten O(venster), niet O(bestand).
+
+Bestanden van format 1 (scans als losse kanaalblokken geschreven) hebben
+geen oplopende t over het hele bestand. Hun index bewaart daarom per
+indexblok de kleinste en grootste tijdstempel; de randen van een venster
+worden dan op t gefilterd (een kopie in plaats van een view).
+
+Voor overzichten over grote stukken wordt per indexblok het min/max per
+kanaal bewaard. Deze samenvatting wordt één keer opgebouwd (één pass
+over het bestand) en net als de index naast het bestand opgeslagen
+(<bestand>.idx.npz), zodat een overzicht van een 48-uurs run daarna
+O(punten) kost.
+
+Gebruik:
+    capture = CaptureFile("capture_20240101_120000_0000.imc")
+    records = capture.window(t0, t0 + 60)       # view, geen kopie
+    volts = capture.to_voltage(records)
+    t, lo, hi = capture.overview(points=2000, channel=0)
+"""
+
+import os
+import glob
+import json
+import numpy as np
+from capture_writer import MAGIC, HEADER_SIZE, EXTENSION, RECORD
+
+
+INDEX_STEP = 4096     # Records per indexblok
+SUMMARY_CHUNK = 64    # Indexblokken per verwerkingsstap bij het opbouwen
+CHANNELS = 4
+
+
+def read_header(path):
+    """
+    Lees de metadata van een capture bestand
+
+    Args:
+        path: Pad van het bestand
+
+    Returns:
+        Dict met metadata
+    """
+    with open(path, "rb") as f:
+        head = f.read(HEADER_SIZE)
+    if head[:8] != MAGIC:
+        raise ValueError(f"Geen capture bestand: {path}")
+    size = int(np.frombuffer(head[8:12], dtype="<u4")[0])
+    if size != HEADER_SIZE:
+        raise ValueError(f"Onbekende header grootte {size} in {path}")
+    return json.loads(head[12:].decode().rstrip())
+
+
+class CaptureFile:
+    """Eén capture bestand, gemapt met een sparse tijdindex"""
+
+    def __init__(self, path, index_step=INDEX_STEP, cache_index=True):
+        """
+        Open een capture bestand
+
+        Args:
+            path: Pad van het .imc bestand
+            index_step: Records per indexblok
+            cache_index: Index en samenvatting naast het bestand bewaren
+        """
+        self.path = path
+        self.metadata = read_header(path)
+        self.index_step = index_step
+        self.cache_index = cache_index
+
+        # Een bestand dat nog geschreven wordt (of niet netjes gesloten is)
+        # heeft geen telling in de header; gebruik dan de bestandsgrootte
+        count = (os.path.getsize(path) - HEADER_SIZE) // RECORD.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=RECORD, mode="r",
+                                     offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=RECORD)
+        self._pga = np.asarray(self.metadata["pga_range"]) / 32768.0
+        self._index = None
+        self._index_max = None
+        self._summary = None
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def ordered(self):
+        """True als t binnen het bestand oplopend is (format 2 en later)"""
+        return self.metadata.get("format", 1) >= 2
+
+    @property
+    def t_first(self):
+        return float(self.records["t"][0]) if len(self) else None
+
+    @property
+    def t_last(self):
+        return float(self.records["t"][-1]) if len(self) else None
+
+    def wall_time(self, t):
+        """Converteer monotonic tijd(en) naar wandkloktijd (epoch seconden)"""
+        return t - self.metadata["monotonic_start"] + self.metadata["wall_start"]
+
+    def to_voltage(self, records):
+        """
+        Converteer records naar spanning (met de gain per sample)
+
+        Args:
+            records: Records (view of kopie) uit dit bestand
+
+        Returns:
+            numpy array met spanningen
+        """
+        return records["raw"] * self._pga[records["gain"]]
+
+    # Index
+
+    def _cache_path(self):
+        return self.path + ".idx.npz"
+
+    def _load_cache(self):
+        """Lees index en samenvatting uit de cache als die bij het bestand past"""
+        path = self._cache_path()
+        if not self.cache_index or not os.path.exists(path):
+            return
+        try:
+            with np.load(path) as cache:
+                if int(cache["count"]) != len(self) or int(cache["step"]) != self.index_step:
+                    return
+                if not self.ordered:
+                    if "index_max" not in cache:
+                        return
+                    self._index_max = cache["index_max"]
+                self._index = cache["index"]
+                if "summary_min" in cache:
+                    self._summary = (cache["summary_min"], cache["summary_max"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _save_cache(self):
+        """Bewaar index en samenvatting (alleen voor gesloten bestanden)"""
+        if not self.cache_index or not self.metadata.get("complete"):
+            return
+        arrays = {"count": len(self), "step": self.index_step, "index": self._index}
+        if self._index_max is not None:
+            arrays["index_max"] = self._index_max
+        if self._summary is not None:
+            arrays["summary_min"], arrays["summary_max"] = self._summary
+        try:
+            with open(self._cache_path(), "wb") as f:
+                np.savez(f, **arrays)
+        except OSError:
+            pass  # Alleen-lezen medium: index wordt elke keer opnieuw gebouwd
+
+    @property
+    def index(self):
+        """
+        Tijdstempel van het eerste record van elk indexblok
+
+        Bij een bestand zonder oplopende t de kleinste tijdstempel per blok.
+        """
+        if self._index is None:
+            self._load_cache()
+        if self._index is None:
+            self._build_index()
+            self._save_cache()
+        return self._index
+
+    def _build_index(self):
+        """Bouw de index; min/max per blok als t niet oplopend is"""
+        step = self.index_step
+        if self.ordered:
+            # Strided view: leest alleen de pagina's met een indexrecord
+            self._index = np.array(self.records["t"][::step])
+            return
+        blocks = -(-len(self) // step)
+        lows = np.empty(blocks)
+        highs = np.empty(blocks)
+        for first in range(0, blocks, SUMMARY_CHUNK):
+            last = min(first + SUMMARY_CHUNK, blocks)
+            t = self.records["t"][first * step:last * step]
+            starts = np.arange(0, len(t), step)
+            lows[first:last] = np.minimum.reduceat(t, starts)
+            highs[first:last] = np.maximum.reduceat(t, starts)
+        self._index, self._index_max = lows, highs
+
+    def locate(self, t):
+        """
+        Index van het eerste record met tijdstempel >= t
+
+        Binary search in de index, daarna binnen één indexblok. Bij een
+        bestand zonder oplopende t is het resultaat het begin van het
+        eerste indexblok dat zo'n record kan bevatten (een ondergrens).
+
+        Args:
+            t: Monotonic tijd (s)
+
+        Returns:
+            Record index (0 .. len)
+        """
+        if not self.ordered:
+            self.index  # Laadt of bouwt ook _index_max
+            block = int(np.searchsorted(np.maximum.accumulate(self._index_max), t))
+            return min(block * self.index_step, len(self))
+        block = int(np.searchsorted(self.index, t, side="right")) - 1
+        if block < 0:
+            return 0
+        start = block * self.index_step
+        stop = min(start + self.index_step, len(self))
+        return start + int(np.searchsorted(self.records["t"][start:stop], t))
+
+    def _locate_end(self, t):
+        """Record index waarvoor alle records met tijdstempel < t ervoor liggen"""
+        if self.ordered:
+            return self.locate(t)
+        lows = np.minimum.accumulate(self.index[::-1])[::-1]
+        block = int(np.searchsorted(lows, t))
+        return min(block * self.index_step, len(self))
+
+    def _select(self, records, t_start, t_end):
+        """Filter records op [t_start, t_end) (alleen nodig zonder oplopende t)"""
+        if self.ordered:
+            return records
+        mask = np.ones(len(records), dtype=bool)
+        if t_start is not None:
+            mask &= records["t"] >= t_start
+        if t_end is not None:
+            mask &= records["t"] < t_end
+        return records if mask.all() else records[mask]
+
+    def window(self, t_start=None, t_end=None):
+        """
+        Records in een tijdvenster [t_start, t_end)
+
+        Args:
+            t_start: Begin (monotonic tijd, None = begin bestand)
+            t_end: Einde (None = einde bestand)
+
+        Returns:
+            Structured array view op de mapping (geen kopie); een kopie
+            als de randen van een format 1 bestand gefilterd moeten worden
+        """
+        lo = 0 if t_start is None else self.locate(t_start)
+        hi = len(self) if t_end is None else self._locate_end(t_end)
+        return self._select(self.records[lo:max(lo, hi)], t_start, t_end)
+
+    def channel_window(self, channel, t_start=None, t_end=None):
+        """
+        Tijdstempels en spanningen van één kanaal in een tijdvenster
+
+        Bij scan captures (meerdere kanalen) is dit een kopie van de
+        samples van het kanaal.
+
+        Returns:
+            Tuple (timestamps, volts)
+        """
+        records = self.window(t_start, t_end)
+        records = records[records["channel"] == channel]
+        return records["t"], self.to_voltage(records)
+
+    # Overzicht
+
+    def _build_summary(self):
+        """Min/max spanning per indexblok en kanaal (één pass over het bestand)"""
+        blocks = len(self.index)
+        lows = np.full((blocks, CHANNELS), np.nan)
+        highs = np.full((blocks, CHANNELS), np.nan)
+        for first in range(0, blocks, SUMMARY_CHUNK):
+            last = min(first + SUMMARY_CHUNK, blocks)
+            chunk = self.records[first * self.index_step:last * self.index_step]
+            volts = self.to_voltage(chunk)
+            starts = np.arange(0, len(chunk), self.index_step)
+            for channel in range(CHANNELS):
+                mask = chunk["channel"] == channel
+                if not mask.any():
+                    continue
+                lows[first:last, channel] = np.fmin.reduceat(np.where(mask, volts, np.nan), starts)
+                highs[first:last, channel] = np.fmax.reduceat(np.where(mask, volts, np.nan), starts)
+        self._summary = (lows, highs)
+        self._save_cache()
+
+    def overview(self, t_start=None, t_end=None, points=2000, channel=0):
+        """
+        Gedecimeerd min/max overzicht van een kanaal
+
+        Kleine vensters worden direct uit de records berekend (O(venster));
+        vensters met meer dan een indexblok per punt gebruiken de
+        samenvatting per indexblok (O(punten)). De twee randblokken worden
+        uit de records van het venster zelf berekend, zodat samples buiten
+        [t_start, t_end) niet meetellen.
+
+        Args:
+            t_start: Begin (None = begin bestand)
+            t_end: Einde (None = einde bestand)
+            points: Maximaal aantal punten
+            channel: Kanaal nummer (0-3)
+
+        Returns:
+            Tuple (t, min, max) met numpy arrays; t is het begin van elk punt
+        """
+        lo = 0 if t_start is None else self.locate(t_start)
+        hi = len(self) if t_end is None else self._locate_end(t_end)
+        if hi <= lo:
+            empty = np.empty(0)
+            return empty, empty, empty
+
+        if (hi - lo) // points >= self.index_step:
+            if self._summary is None:
+                self._load_cache()
+            if self._summary is None:
+                self._build_summary()
+            step = self.index_step
+            first, last = lo // step, -(-hi // step)
+            lows, highs = self._summary
+            lows, highs = lows[first:last, channel].copy(), highs[first:last, channel].copy()
+            t = self.index[first:last].copy()
+            for block in (first, last - 1):
+                part = self.records[max(block * step, lo):min((block + 1) * step, hi)]
+                part = self._select(part, t_start, t_end)
+                part = part[part["channel"] == channel]
+                i = block - first
+                if len(part):
+                    volts = self.to_voltage(part)
+                    lows[i], highs[i] = volts.min(), volts.max()
+                    t[i] = part["t"].min()
+                else:
+                    lows[i] = highs[i] = np.nan
+            starts = np.linspace(0, len(t), points, endpoint=False).astype(np.int64)
+            starts = np.unique(starts)
+            keep = ~np.isnan(np.fmin.reduceat(lows, starts))
+            return (t[starts][keep], np.fmin.reduceat(lows, starts)[keep],
+                    np.fmax.reduceat(highs, starts)[keep])
+
+        records = self._select(self.records[lo:hi], t_start, t_end)
+        records = records[records["channel"] == channel]
+        if not len(records):
+            empty = np.empty(0)
+            return empty, empty, empty
+        volts = self.to_voltage(records)
+        starts = np.unique(np.linspace(0, len(records), min(points, len(records)),
+                                       endpoint=False).astype(np.int64))
+        return (records["t"][starts], np.minimum.reduceat(volts, starts),
+                np.maximum.reduceat(volts, starts))
+
+    def close(self):
+        """Geef de mapping vrij (zodra er geen views meer naar verwijzen)"""
+        self.records = np.empty(0, dtype=RECORD)
+
+
+class CaptureSet:
+    """Een rotatie reeks capture bestanden als één tijdlijn"""
+
+    def __init__(self, paths, **kwargs):
+        """
+        Open een reeks bestanden
+
+        Args:
+            paths: Lijst met paden, of een map (alle .imc bestanden) of
+                   glob patroon
+            **kwargs: Doorgegeven aan CaptureFile
+        """
+        if isinstance(paths, str):
+            pattern = os.path.join(paths, "*" + EXTENSION) if os.path.isdir(paths) else paths
+            paths = glob.glob(pattern)
+        self.files = [CaptureFile(path, **kwargs) for path in paths]
+        self.files = [f for f in self.files if len(f)]
+        self.files.sort(key=lambda f: f.t_first)
+
+    def __len__(self):
+        return sum(len(f) for f in self.files)
+
+    def _overlapping(self, t_start, t_end):
+        for f in self.files:
+            if t_end is not None and f.t_first >= t_end:
+                break
+            if t_start is not None and f.t_last < t_start:
+                continue
+            yield f
+
+    def window(self, t_start=None, t_end=None):
+        """
+        Records in een tijdvenster over alle bestanden
+
+        Returns:
+            View als het venster in één bestand ligt, anders een kopie
+        """
+        parts = [f.window(t_start, t_end) for f in self._overlapping(t_start, t_end)]
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return np.empty(0, dtype=RECORD)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def to_voltage(self, records):
+        """Converteer records naar spanning (alle bestanden delen de PGA tabel)"""
+        return self.files[0].to_voltage(records)
+
+    def overview(self, t_start=None, t_end=None, points=2000, channel=0):
+        """
+        Min/max overzicht over alle bestanden
+
+        Returns:
+            Tuple (t, min, max)
+        """
+        files = list(self._overlapping(t_start, t_end))
+        total = sum(len(f) for f in files) or 1
+        parts = [f.overview(t_start, t_end, max(1, points * len(f) // total), channel)
+                 for f in files]
+        if not parts:
+            empty = np.empty(0)
+            return empty, empty, empty
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+
+# Test functie
+if __name__ == "__main__":
+    import time
+    import tempfile
+    from capture_writer import encode_header, FORMAT_VERSION
+
+    print("Capture Reader Test")
+    print("=" * 50)
+
+    # Synthetisch bestand: 2M samples (ruim 40 minuten op 860 SPS)
+    n = 2_000_000
+    path = os.path.join(tempfile.mkdtemp(prefix="imc_capture_"), "test" + EXTENSION)
+    records = np.empty(n, dtype=RECORD)
+    records["t"] = 1000.0 + np.arange(n) / 860.0
+    records["raw"] = (np.sin(records["t"] * 0.1) * 16000).astype(np.int16)
+    records["channel"] = 0
+    records["gain"] = 1
+    metadata = {"format": FORMAT_VERSION, "pga_range": [6.144, 4.096, 2.048, 1.024, 0.512, 0.256],
+                "wall_start": time.time(), "monotonic_start": 1000.0, "complete": True}
+    with open(path, "wb") as f:
+        f.write(encode_header(metadata))
+        f.write(records.tobytes())
+
+    capture = CaptureFile(path)
+    start = time.perf_counter()
+    window = capture.window(1600.0, 1660.0)
+    elapsed = time.perf_counter() - start
+    print(f"  Venster van 60s: {len(window)} samples in {elapsed * 1000:.2f} ms, "
+          f"view: {np.shares_memory(window, capture.records)}")
+
+    start = time.perf_counter()
+    t, lo, hi = capture.overview(points=250)
+    print(f"  Overzicht (eerste keer): {len(t)} punten in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+    t, lo, hi = capture.overview(1600.0, 1660.0, points=250)
+    print(f"  Overzicht van 60s venster: {len(t)} punten")
+    capture.close()
+
+    capture = CaptureFile(path)
+    start = time.perf_counter()
+    t, lo, hi = capture.overview(points=250)
+    print(f"  Overzicht (met cache):   {len(t)} punten in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms, "
+          f"bereik {lo.min():.3f}V .. {hi.max():.3f}V")
+    capture.close()
+
+    print("\n✓ Test voltooid")
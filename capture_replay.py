@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Capture Replay
+Een opgenomen (veld)signaal omzetten naar een DAC programma en naspelen
+
+Pijplijn:
+1. Laden: een ADC capture (capture_writer.py) of een geïmporteerd
+   bestand (CSV met tijd- en waardekolom, of een .npy profiel).
+2. Omrekenen: gemeten ADC volts naar de eenheid van de output (V of
+   mA), bijv. via de shunt weerstand: mA = V * 1000 / R.
+3. Resamplen naar de DAC update rate: eerst een moving average over één
+   update periode (anti-aliasing bij decimatie), daarna lineaire
+   interpolatie op een uniform raster (np.interp, gevectoriseerd).
+4. Compileren: alle setpoints in één keer naar DAC codes met de
+   kalibratie van dit board (DACController.values_to_codes). Tijdens het
+   afspelen is elke update alleen nog een array lookup en een I2C write.
+5. Verifiëren: het programma afspelen, de output terugmeten met de ADC en
+   de fout (offset, RMS, maximum) bepalen bij de best passende vertraging.
+
+Gebruik:
+    t, volts = load_capture("/media/sd/captures", channel=1)
+    program = compile_replay(t, volts * 1000 / 150, "current", controller.dac)
+    program.save("veldmeting.npz")
+    report = verify_replay(controller, program)
+"""
+
+import os
+import time
+import numpy as np
+from capture_reader import CaptureFile, CaptureSet
+from calibration import measurement_setup
+
+
+DEFAULT_RATE = 100.0  # Update rate van de output loops (Hz)
+
+
+def load_capture(path, channel, t_start=None, t_end=None):
+    """
+    Laad één kanaal uit een capture bestand of rotatie reeks
+
+    Args:
+        path: .imc bestand, map of glob patroon
+        channel: ADC kanaal (0-3)
+        t_start: Begin (monotonic tijd van de capture, None = begin)
+        t_end: Einde (None = einde)
+
+    Returns:
+        Tuple (t, volts) numpy arrays
+    """
+    if os.path.isfile(path):
+        capture = CaptureFile(path)
+        t, volts = capture.channel_window(channel, t_start, t_end)
+    else:
+        capture = CaptureSet(path)
+        records = capture.window(t_start, t_end)
+        records = records[records["channel"] == channel]
+        t, volts = records["t"], capture.to_voltage(records)
+    t, volts = np.array(t), np.array(volts)
+    capture.close()
+    if len(t) < 2:
+        raise ValueError(f"Te weinig samples van kanaal {channel} in {path}")
+    return t, volts
+
+
+def load_trace(path, column=1, time_column=0, sample_rate=None, delimiter=","):
+    """
+    Laad een geïmporteerd signaal
+
+    Args:
+        path: CSV bestand, of .npy profiel (zie arb_waveform.py)
+        column: Kolom met de waarden (CSV)
+        time_column: Kolom met de tijd in seconden (CSV, None = geen)
+        sample_rate: Sample rate als er geen tijd is
+
+    Returns:
+        Tuple (t, values) numpy arrays
+    """
+    if path.endswith(".npy"):
+        from arb_waveform import ArbWaveform
+        profile = ArbWaveform(path, sample_rate)
+        values = np.array(profile.samples, dtype=np.float64)
+        return np.arange(len(values)) / profile.sample_rate, values
+
+    columns = [column] if time_column is None else [time_column, column]
+    data = np.genfromtxt(path, delimiter=delimiter, usecols=columns,
+                         invalid_raise=False, ndmin=2)
+    data = data[~np.isnan(data).any(axis=1)]  # Header en lege regels
+    if time_column is None:
+        if not sample_rate:
+            raise ValueError("Geef een tijdkolom of een sample rate op")
+        return np.arange(len(data)) / sample_rate, data[:, 0]
+    return data[:, 0], data[:, 1]
+
+
+def resample(t, values, rate):
+    """
+    Resample een signaal naar een uniform raster
+
+    Args:
+        t: Tijdstempels (oplopend, niet noodzakelijk uniform)
+        values: Waarden
+        rate: Doel sample rate (Hz)
+
+    Returns:
+        numpy array met waarden op t[0] + k / rate
+    """
+    order = np.argsort(t, kind="stable")
+    t, values = t[order], values[order]
+
+    # Anti-aliasing: gemiddelde over één doel periode (cumsum, O(n))
+    source_rate = (len(t) - 1) / (t[-1] - t[0])
+    window = int(source_rate / rate)
+    if window > 1:
+        cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+        smoothed = (cumulative[window:] - cumulative[:-window]) / window
+        # Gemiddelde hoort bij het midden van het venster
+        centers = (t[window - 1:] + t[:len(t) - window + 1]) / 2.0
+        t, values = centers, smoothed
+
+    grid = t[0] + np.arange(int((t[-1] - t[0]) * rate) + 1) / rate
+    return np.interp(grid, t, values)
+
+
+class ReplayProgram:
+    """Gecompileerde code stroom voor de spannings- of stroomuitgang"""
+
+    def __init__(self, output, rate, setpoints, codes, clipped=0):
+        """
+        Args:
+            output: 'voltage' of 'current'
+            rate: Updates per seconde
+            setpoints: Waarden in V of mA (na begrenzing)
+            codes: DAC code per update
+            clipped: Aantal setpoints dat buiten het output bereik viel
+        """
+        self.output = output
+        self.rate = float(rate)
+        self.setpoints = np.asarray(setpoints, dtype=np.float32)
+        self.codes = np.asarray(codes, dtype=np.uint16)
+        self.clipped = int(clipped)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def duration(self):
+        return len(self) / self.rate
+
+    def save(self, path):
+        """Sla het programma op (.npz)"""
+        with open(path, "wb") as f:
+            np.savez(f, output=self.output, rate=self.rate, setpoints=self.setpoints,
+                     codes=self.codes, clipped=self.clipped)
+
+    @classmethod
+    def load(cls, path):
+        """Laad een opgeslagen programma"""
+        with np.load(path) as data:
+            return cls(str(data["output"]), float(data["rate"]), data["setpoints"],
+                       data["codes"], int(data["clipped"]))
+
+
+def compile_replay(t, values, output, dac, rate=DEFAULT_RATE):
+    """
+    Compileer een signaal tot een ReplayProgram
+
+    Args:
+        t: Tijdstempels in seconden
+        values: Waarden in de eenheid van de output (V of mA)
+        output: 'voltage' of 'current'
+        dac: DACController (voor bereik en kalibratie)
+        rate: DAC update rate
+
+    Returns:
+        ReplayProgram
+    """
+    if output == "voltage":
+        low, high = 0.0, dac.VREF
+    elif output == "current":
+        low, high = dac.CURRENT_MIN, dac.CURRENT_MAX
+    else:
+        raise ValueError(f"Onbekende output: {output}")
+
+    t = np.asarray(t, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(t) & np.isfinite(values)
+    setpoints = resample(t[valid], values[valid], rate)
+
+    clipped = int(np.count_nonzero((setpoints < low) | (setpoints > high)))
+    if clipped:
+        print(f"⚠ {clipped} van {len(setpoints)} setpoints buiten {low}-{high} begrensd")
+    setpoints = np.clip(setpoints, low, high)
+    return ReplayProgram(output, rate, setpoints, dac.values_to_codes(output, setpoints),
+                         clipped)
+
+
+def compare(program, start, t_measured, measured, max_lag=0.2):
+    """
+    Vergelijk een teruggemeten signaal met het programma
+
+    Het gemeten signaal wordt op het raster van het programma gezet; de
+    vertraging (output trap, ADC) wordt gezocht als de verschuiving met de
+    kleinste RMS fout.
+
+    Args:
+        program: ReplayProgram
+        start: time.monotonic() van de eerste update
+        t_measured: Tijdstempels van de meting (monotonic)
+        measured: Gemeten waarden in V of mA
+        max_lag: Maximale vertraging om te zoeken (s)
+
+    Returns:
+        Dict met lag (s), mean, rms en max_abs fout en het aantal punten
+    """
+    lags = int(max_lag * program.rate)
+    grid = start + np.arange(len(program) + lags) / program.rate
+    inside = (grid >= t_measured[0]) & (grid <= t_measured[-1])
+    on_grid = np.where(inside, np.interp(grid, t_measured, measured), np.nan)
+
+    best = None
+    for lag in range(lags + 1):
+        error = on_grid[lag:lag + len(program)] - program.setpoints
+        error = error[~np.isnan(error)]
+        if len(error) < len(program) // 2:
+            continue
+        rms = float(np.sqrt(np.mean(error ** 2)))
+        if best is None or rms < best["rms"]:
+            best = {"lag": lag / program.rate, "mean": float(error.mean()), "rms": rms,
+                    "max_abs": float(np.abs(error).max()), "points": len(error)}
+    return best
+
+
+def verify_replay(controller, program, data_rate=860, max_lag=0.2):
+    """
+    Speel een programma af en meet de output terug
+
+    Gebruikt de meet aansluitingen van de kalibratie (voltage -> CH0,
+    current -> shunt -> CH1).
+
+    Args:
+        controller: BeagleBoneController
+        program: ReplayProgram
+        data_rate: ADS1115 data rate voor de meting
+        max_lag: Maximale vertraging om te zoeken (s)
+
+    Returns:
+        Dict met de fout (zie compare) of None als er niet gemeten is
+    """
+    adc = controller.adc
+    _, adc_channel, scale = measurement_setup(controller.dac, program.output)
+    blocks = []
+
+    def listener(channel, timestamps, raw):
+        if channel == adc_channel:
+            # Omrekenen per blok: de gain kan tussen blokken wisselen
+            blocks.append((timestamps, adc.raw_to_voltage(raw, channel) * scale))
+
+    adc.add_block_listener(listener)
+    adc.start_stream(adc_channel, 64, data_rate)
+    try:
+        if not controller.start_replay(program):
+            return None
+        running = f"{program.output}_running"
+        while getattr(controller, running):
+            time.sleep(0.05)
+        time.sleep(max_lag)  # Laatste respons ook meten
+    finally:
+        adc.stop_stream()
+        adc.remove_block_listener(listener)
+
+    if not blocks:
+        return None
+    t_measured = np.concatenate([b[0] for b in blocks])
+    measured = np.concatenate([b[1] for b in blocks])
+    return compare(program, controller.replay_start, t_measured, measured, max_lag)
+
+
+# Test functie
+if __name__ == "__main__":
+    from dac_controller import DACController
+
+    print("Capture Replay Test")
+    print("=" * 50)
+
+    dac = DACController()
+
+    # "Veldmeting": 4-20mA signaal over 150 Ohm, 860 SPS met ruis
+    t = 5000.0 + np.arange(8600) / 860.0
+    ma = 12 + 6 * np.sin(2 * np.pi * 0.2 * t) + np.random.normal(0, 0.2, len(t))
+    volts = ma * 150 / 1000.0
+
+    program = compile_replay(t, volts * 1000.0 / 150.0, "current", dac)
+    print(f"  Programma: {len(program)} updates ({program.duration:.1f}s), "
+          f"codes {program.codes.min()}-{program.codes.max()}")
+
+    # Simulatie van de terugmeting: output met 20 ms vertraging
+    start = 100.0
+    t_back = start + np.arange(int(program.duration * 860)) / 860.0
+    back = np.interp(t_back - 0.02, start + np.arange(len(program)) / program.rate,
+                     program.setpoints)
+    report = compare(program, start, t_back, back)
+    print(f"  Verificatie: lag {report['lag'] * 1000:.0f} ms, "
+          f"RMS {report['rms']:.4f} mA, max {report['max_abs']:.4f} mA")
+
+    print("\n✓ Test voltooid")
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Capture Writer
+ADC samples in een compact binair formaat naar disk
+
+Een achtergrond thread neemt de sample blokken van de ADCController over
+en schrijft ze in grote batches weg. De block listener in de acquisitie
+thread zet alleen een verwijzing naar het blok in een begrensde queue;
+als de disk niet bijhoudt worden blokken weggegooid (geteld) in plaats
+van de acquisitie op te houden.
+
+Een scan wordt als frame opgenomen (frame listener, kanaal per record),
+niet als losse blokken per kanaal; zo blijft t binnen een bestand
+oplopend en klopt de tijd index van capture_reader.py.
+
+Bestandsformaat (.imc):
+    0   8 bytes   MAGIC
+    8   uint32    Lengte van de header (HEADER_SIZE)
+    12  JSON      Metadata, aangevuld met spaties tot HEADER_SIZE
+    ... records   RECORD (12 bytes, little-endian): t (float64,
+                  time.monotonic), raw (int16), channel (uint8) en
+                  gain (uint8, index in GAINS)
+
+De gain staat per sample omdat auto-ranging de gain tussen blokken kan
+wijzigen; spanning = raw * pga_range[gain] / 32768. De metadata bevat
+de koppeling tussen monotonic tijd en wandkloktijd, het volgnummer in
+de rotatie reeks en bij een netjes gesloten bestand het aantal samples.
+
+Gebruik:
+    writer = CaptureWriter(controller.adc, "/media/sd/captures",
+                           max_bytes=64 * 2**20, max_seconds=3600)
+    writer.start()
+    controller.adc.start_stream(0)
+    ...
+    writer.stop()
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+import numpy as np
+
+
+MAGIC = b"IMCCAP1\0"
+HEADER_SIZE = 4096
+FORMAT_VERSION = 2    # 2: t oplopend binnen een bestand (scans als frame)
+EXTENSION = ".imc"
+
+RECORD = np.dtype([("t", "<f8"), ("raw", "<i2"), ("channel", "u1"), ("gain", "u1")])
+
+# fsync beleid
+FSYNC_NEVER = None       # Alleen de page cache van het OS
+FSYNC_ROTATE = "rotate"  # Bij sluiten van een bestand
+FSYNC_BATCH = "batch"    # Na elke weggeschreven batch
+
+
+def encode_header(metadata):
+    """
+    Bouw de header van een capture bestand
+
+    Args:
+        metadata: Dict met JSON-serialiseerbare metadata
+
+    Returns:
+        bytes van precies HEADER_SIZE lang
+    """
+    body = json.dumps(metadata, sort_keys=True).encode()
+    if len(body) > HEADER_SIZE - 12:
+        raise ValueError("Metadata past niet in de capture header")
+    header = MAGIC + np.uint32(HEADER_SIZE).tobytes() + body
+    return header.ljust(HEADER_SIZE, b" ")
+
+
+class CaptureWriter:
+    """Schrijft ADC blokken in batches naar roterende capture bestanden"""
+
+    def __init__(self, adc, directory, prefix="capture", max_bytes=256 * 2**20,
+                 max_seconds=None, batch_records=65536, flush_interval=2.0,
+                 fsync=FSYNC_ROTATE, max_queue_blocks=1024, metadata=None):
+        """
+        Initialiseer writer
+
+        Args:
+            adc: ADCController instantie
+            directory: Map voor de capture bestanden
+            prefix: Begin van de bestandsnamen
+            max_bytes: Roteer als een bestand deze grootte bereikt (None = nooit)
+            max_seconds: Roteer na deze tijd in seconden (None = nooit)
+            batch_records: Records per write (grootte van de batch buffer)
+            flush_interval: Schrijf een halfvolle batch na deze tijd (s)
+            fsync: FSYNC_NEVER, FSYNC_ROTATE of FSYNC_BATCH
+            max_queue_blocks: Maximaal aantal wachtende blokken
+            metadata: Extra metadata voor de header (bijv. DUT, kanaal namen)
+        """
+        if fsync not in (FSYNC_NEVER, FSYNC_ROTATE, FSYNC_BATCH):
+            raise ValueError(f"Onbekend fsync beleid: {fsync}")
+        self.adc = adc
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.metadata = dict(metadata or {})
+
+        self._queue = queue.Queue(maxsize=max_queue_blocks)
+        self._batch = np.empty(batch_records, dtype=RECORD)
+        self._fill = 0
+        self._gain_index = {gain: index for index, gain in enumerate(adc.GAINS)}
+
+        self.running = False
+        self.thread = None
+        self.files = []          # Alle geschreven bestanden (in volgorde)
+        self._file = None
+        self._file_meta = None
+        self._file_opened = 0.0
+        self._file_bytes = 0
+
+        # Tellers
+        self.samples_written = 0
+        self.blocks_dropped = 0
+        self.samples_dropped = 0
+        self.batches_written = 0
+        self.max_write_time = 0.0
+
+    # Acquisitie thread
+
+    def _on_block(self, channel, timestamps, raw):
+        """Block listener: alleen in de queue zetten (O(1))"""
+        if threading.current_thread() is self.adc.scan_thread:
+            return  # Scan blokken komen als frame binnen (_on_frame)
+        gain = self._gain_index[self.adc.channel_gains[channel]]
+        self._enqueue((channel, gain, timestamps, raw))
+
+    def _on_frame(self, channels, timestamps, raw):
+        """Frame listener: scan samples in tijdvolgorde, kanaal per sample"""
+        gains = np.array([self._gain_index[self.adc.channel_gains[ch]] for ch in range(4)],
+                         dtype=np.uint8)
+        self._enqueue((channels, gains[channels], timestamps, raw))
+
+    def _enqueue(self, block):
+        try:
+            self._queue.put_nowait(block)
+        except queue.Full:
+            self.blocks_dropped += 1
+            self.samples_dropped += len(block[3])
+
+    # Writer thread
+
+    def _open_file(self):
+        """Open het volgende bestand van de rotatie reeks"""
+        sequence = len(self.files)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{sequence:04d}{EXTENSION}")
+
+        self._file_meta = dict(self.metadata)
+        self._file_meta.update({
+            "format": FORMAT_VERSION,
+            "device": "ADS1115",
+            "address": self.adc.address,
+            "pga_range": [self.adc.PGA_RANGE[gain] for gain in self.adc.GAINS],
+            "wall_start": time.time(),
+            "monotonic_start": time.monotonic(),
+            "sequence": sequence,
+            "previous": os.path.basename(self.files[-1]) if self.files else None,
+            "complete": False,
+        })
+        # Ongebufferd: de batch buffer is al groot, geen extra kopie
+        self._file = open(path, "wb", buffering=0)
+        self._file.write(encode_header(self._file_meta))
+        self._file_opened = time.monotonic()
+        self._file_bytes = HEADER_SIZE
+        self._first_t = None
+        self._last_t = None
+        self._file_samples = 0
+        self.files.append(path)
+
+    def _close_file(self):
+        """Sluit het huidige bestand en werk de header bij"""
+        if self._file is None:
+            return
+        self._file_meta.update({
+            "complete": True,
+            "samples": self._file_samples,
+            "t_first": self._first_t,
+            "t_last": self._last_t,
+        })
+        self._file.seek(0)
+        self._file.write(encode_header(self._file_meta))
+        if self.fsync is not FSYNC_NEVER:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+    def _rotate_due(self):
+        if self.max_bytes is not None and self._file_bytes >= self.max_bytes:
+            return True
+        return (self.max_seconds is not None and
+                time.monotonic() - self._file_opened >= self.max_seconds)
+
+    def _flush(self):
+        """Schrijf de batch buffer weg (één write)"""
+        if self._fill == 0:
+            return
+        if self._file is None:
+            self._open_file()
+
+        batch = self._batch[:self._fill]
+        start = time.monotonic()
+        self._file.write(memoryview(batch).cast("B"))
+        if self.fsync == FSYNC_BATCH:
+            os.fsync(self._file.fileno())
+        self.max_write_time = max(self.max_write_time, time.monotonic() - start)
+
+        if self._first_t is None:
+            self._first_t = float(batch["t"][0])
+        self._last_t = float(batch["t"][-1])
+        self._file_samples += self._fill
+        self._file_bytes += batch.nbytes
+        self.samples_written += self._fill
+        self.batches_written += 1
+        self._fill = 0
+
+        if self._rotate_due():
+            self._close_file()
+
+    def _append(self, channel, gain, timestamps, raw):
+        """
+        Kopieer een blok in de batch buffer; schrijf als die vol is
+
+        channel en gain zijn een getal (blok van één kanaal) of een array
+        per sample (scan frame).
+        """
+        offset = 0
+        n = len(raw)
+        while offset < n:
+            count = min(n - offset, len(self._batch) - self._fill)
+            dest = self._batch[self._fill:self._fill + count]
+            dest["t"] = timestamps[offset:offset + count]
+            dest["raw"] = raw[offset:offset + count]
+            dest["channel"] = channel if np.isscalar(channel) else channel[offset:offset + count]
+            dest["gain"] = gain if np.isscalar(gain) else gain[offset:offset + count]
+            self._fill += count
+            offset += count
+            if self._fill == len(self._batch):
+                self._flush()
+
+    def _writer_loop(self):
+        """Thread functie: blokken verzamelen en in batches wegschrijven"""
+        last_flush = time.monotonic()
+        try:
+            while self.running or not self._queue.empty():
+                try:
+                    block = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    block = None
+                if block is not None:
+                    self._append(*block)
+
+                now = time.monotonic()
+                if now - last_flush >= self.flush_interval:
+                    self._flush()
+                    last_flush = now
+                    # Tijd rotatie ook zonder nieuwe samples
+                    if self._file is not None and self._rotate_due():
+                        self._close_file()
+            self._flush()
+        except OSError as e:
+            print(f"✗ Fout bij schrijven capture: {e}")
+            self.running = False
+            self.adc.remove_block_listener(self._on_block)
+            self.adc.remove_frame_listener(self._on_frame)
+        finally:
+            try:
+                self._close_file()
+            except OSError as e:
+                print(f"✗ Fout bij sluiten capture: {e}")
+
+    # Besturing
+
+    def start(self):
+        """
+        Start de capture (de acquisitie zelf start via de ADCController)
+
+        Returns:
+            True als de writer draait
+        """
+        if self.running:
+            return True
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError as e:
+            print(f"✗ Fout bij aanmaken capture map: {e}")
+            return False
+
+        self.running = True
+        self.thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.thread.start()
+        self.adc.add_block_listener(self._on_block)
+        self.adc.add_frame_listener(self._on_frame)
+        print(f"✓ Capture gestart in {self.directory}")
+        return True
+
+    def stop(self):
+        """Stop de capture; wachtende blokken worden nog weggeschreven"""
+        if not self.running and not (self.thread and self.thread.is_alive()):
+            return
+        self.adc.remove_block_listener(self._on_block)
+        self.adc.remove_frame_listener(self._on_frame)
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=10.0)
+        print(f"✓ Capture gestopt: {self.samples_written} samples in "
+              f"{len(self.files)} bestand(en)")
+
+    def stats(self):
+        """Tellers van de writer"""
+        return {
+            "running": self.running,
+            "files": len(self.files),
+            "current_file": self.files[-1] if self._file is not None else None,
+            "samples_written": self.samples_written,
+            "samples_dropped": self.samples_dropped,
+            "blocks_dropped": self.blocks_dropped,
+            "batches_written": self.batches_written,
+            "queued_blocks": self._queue.qsize(),
+            "max_write_time": self.max_write_time,
+        }
+
+
+# Test functie
+if __name__ == "__main__":
+    import tempfile
+    from adc_controller import ADCController
+
+    print("Capture Writer Test")
+    print("=" * 50)
+
+    adc = ADCController()
+    directory = tempfile.mkdtemp(prefix="imc_capture_")
+    writer = CaptureWriter(adc, directory, max_bytes=HEADER_SIZE + 2000 * RECORD.itemsize,
+                           batch_records=1000, flush_interval=0.2)
+    writer.start()
+
+    # Gesimuleerde acquisitie op volle ADS1115 snelheid
+    t0 = time.monotonic()
+    for block in range(100):
+        timestamps = t0 + (block * 64 + np.arange(64)) / 860.0
+        raw = (np.sin(timestamps) * 8000).astype(np.int16)
+        adc._dispatch_block(block % 2, timestamps, raw, autorange=False)
+
+    writer.stop()
+    print(f"  {writer.stats()}")
+    for path in writer.files:
+        print(f"  {os.path.basename(path)}: {os.path.getsize(path)} bytes")
+
+    print("\n✓ Test voltooid")
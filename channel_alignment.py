@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Channel Alignment
+Skew correctie voor sequentieel gesamplede ADC kanalen
+
+De ADS1115 heeft één converter: in een scan worden de kanalen na elkaar
+gemeten, milliseconden uit elkaar. De aligner interpoleert alle kanalen
+(gevectoriseerd) op een gemeenschappelijk tijdraster, zodat berekeningen
+tussen kanalen (bijv. vermogen V x I, stimulus/responsie verschil) ook bij
+hogere signaalfrequenties kloppen.
+"""
+
+import numpy as np
+
+
+def align_samples(channels, timestamps, values, channel_list, grid):
+    """
+    Interpoleer interleaved samples op een tijdraster (stateless)
+
+    Args:
+        channels: Kanaal nummer per sample (numpy array)
+        timestamps: Tijdstempel per sample (numpy array)
+        values: Waarde per sample (numpy array)
+        channel_list: Kanalen in de output kolom volgorde
+        grid: Gemeenschappelijke tijdstippen (numpy array)
+
+    Returns:
+        numpy array met shape (len(grid), len(channel_list))
+    """
+    aligned = np.empty((len(grid), len(channel_list)))
+    for col, channel in enumerate(channel_list):
+        mask = channels == channel
+        aligned[:, col] = np.interp(grid, timestamps[mask], values[mask])
+    return aligned
+
+
+class ChannelAligner:
+    """Stateful aligner voor een stroom van scan frames"""
+
+    def __init__(self, channels, grid_rate, scale=None, callback=None):
+        """
+        Initialiseer aligner
+
+        Args:
+            channels: Kanalen in de output kolom volgorde
+            grid_rate: Sample rate van het gemeenschappelijke raster in Hz
+            scale: Optionele schaalfactor per kanaal (dict kanaal -> factor,
+                   bijv. Volt per LSB) toegepast voor de interpolatie
+            callback: Optionele functie callback(grid_times, aligned)
+        """
+        self.channels = tuple(channels)
+        self.interval = 1.0 / grid_rate
+        self.scale = scale or {}
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        """Wis de opgebouwde historie"""
+        # Laatste twee samples per kanaal overbruggen de frame grenzen
+        self._history = {ch: (np.empty(0), np.empty(0)) for ch in self.channels}
+        self._next_time = None
+
+    def process(self, channels, timestamps, values):
+        """
+        Verwerk een frame interleaved samples
+
+        Er worden alleen rasterpunten geleverd waarvoor elk kanaal een
+        sample ervoor en erna heeft (interpolatie, nooit extrapolatie).
+
+        Args:
+            channels: Kanaal nummer per sample
+            timestamps: Tijdstempel per sample
+            values: Waarde per sample (ruw of geschaald)
+
+        Returns:
+            Tuple (grid_times, aligned) met aligned shape (n, len(channels))
+        """
+        series = {}
+        for channel in self.channels:
+            mask = channels == channel
+            scale = self.scale.get(channel, 1.0)
+            old_t, old_x = self._history[channel]
+            series[channel] = (np.concatenate((old_t, timestamps[mask])),
+                               np.concatenate((old_x, values[mask] * scale)))
+
+        # Geldig venster: binnen het bereik van elk kanaal
+        if any(len(t) < 2 for t, _ in series.values()):
+            self._store_history(series)
+            return np.empty(0), np.empty((0, len(self.channels)))
+
+        first = max(t[0] for t, _ in series.values())
+        last = min(t[-1] for t, _ in series.values())
+
+        if self._next_time is None:
+            self._next_time = first
+        n_points = int(np.floor((last - self._next_time) / self.interval)) + 1
+        if n_points <= 0:
+            self._store_history(series)
+            return np.empty(0), np.empty((0, len(self.channels)))
+
+        grid = self._next_time + np.arange(n_points) * self.interval
+        self._next_time = grid[-1] + self.interval
+
+        aligned = np.empty((n_points, len(self.channels)))
+        for col, channel in enumerate(self.channels):
+            t, x = series[channel]
+            aligned[:, col] = np.interp(grid, t, x)
+
+        self._store_history(series)
+        if self.callback:
+            self.callback(grid, aligned)
+        return grid, aligned
+
+    def _store_history(self, series):
+        """Bewaar de samples die nog nodig zijn voor het volgende raster punt"""
+        for channel, (t, x) in series.items():
+            if self._next_time is not None:
+                # Alles vanaf het laatste sample voor het volgende raster punt
+                keep = max(np.searchsorted(t, self._next_time, side="right") - 1, 0)
+            else:
+                keep = max(len(t) - 2, 0)
+            self._history[channel] = (t[keep:], x[keep:])
+
+    def __call__(self, channels, timestamps, values):
+        """Zodat de aligner direct als ADC frame listener kan dienen"""
+        self.process(channels, timestamps, values)
+
+
+# Test functie
+if __name__ == "__main__":
+    print("Channel Alignment Test")
+    print("=" * 50)
+
+    # Scan van 4 kanalen op 860 SPS, elk kanaal een 20Hz sinus met
+    # dezelfde fase: na alignment moeten alle kolommen gelijk zijn
+    rate = 860.0
+    n = 4000
+    channels = np.tile(np.arange(4), n // 4)
+    timestamps = np.arange(n) / rate
+    values = np.sin(2 * np.pi * 20.0 * timestamps)
+
+    naive = values.reshape(-1, 4)
+    print(f"  Zonder alignment: max verschil CH0-CH3 = "
+          f"{np.max(np.abs(naive[:, 0] - naive[:, 3])):.3f}")
+
+    aligner = ChannelAligner(range(4), grid_rate=200)
+    results = [aligner.process(c, t, v) for c, t, v in
+               zip(np.array_split(channels, 25), np.array_split(timestamps, 25),
+                   np.array_split(values, 25))]
+    aligned = np.concatenate([r[1] for r in results])
+    print(f"  Met alignment:    max verschil CH0-CH3 = "
+          f"{np.max(np.abs(aligned[:, 0] - aligned[:, 3])):.3f} "
+          f"({len(aligned)} raster punten)")
+
+    print("\n✓ Test voltooid")
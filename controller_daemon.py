@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""
+Controller Daemon
+Headless bediening van de cape via een Unix domain socket
+
+De daemon is eigenaar van de hardware (één BeagleBoneController) en
+accepteert commando's van automatisering scripts. Het protocol is één
+JSON object per regel:
+
+    -> {"id": 1, "cmd": "set_voltage", "args": {"voltage": 1.5}}
+    <- {"id": 1, "ok": true, "result": true}
+    <- {"id": 2, "ok": false, "error": "Onbekend commando: foo"}
+
+Met "subscribe" ontvangt een client events zonder verzoek:
+
+    -> {"id": 3, "cmd": "subscribe", "args": {"topic": "adc"}}
+    <- {"event": "adc", "channel": 0, "t": [...], "v": [...]}
+
+Topics: "adc" (blokken van stream/scan), "filtered" (filter output) en
+"alert" (ADS1115 comparator). Events worden per client gebufferd; een
+client die niet bijhoudt verliest events (teller "dropped" in status),
+de acquisitie thread wacht nooit op een client. Een client die ook zijn
+antwoorden niet binnen REPLY_TIMEOUT afneemt wordt verbroken.
+
+Gebruik:
+    python3 beaglebone_controller.py --daemon
+    python3 controller_daemon.py status            # los commando vanaf de shell
+"""
+
+import os
+import json
+import queue
+import socket
+import threading
+import socketserver
+from fractions import Fraction
+from sample_bus import SampleBusWriter, DEFAULT_NAME as SAMPLE_BUS_NAME
+from capture_writer import CaptureWriter
+from event_journal import EventJournal
+from arb_waveform import ArbWaveform, ArbPlayer
+from capture_replay import ReplayProgram, verify_replay
+from protection_rules import ProtectionRule
+from calibration import Calibrator
+from metrics_exporter import DEFAULT_PORT as METRICS_PORT, DEFAULT_HOST as METRICS_HOST
+
+
+DEFAULT_SOCKET = "/tmp/imc_autotester.sock"
+TOPICS = ("adc", "filtered", "alert")
+
+
+class _Client:
+    """Verbinding met één client: schrijf thread en event buffer"""
+
+    REPLY_TIMEOUT = 2.0  # Maximale wachttijd op ruimte in de buffer (s)
+
+    def __init__(self, sock, max_pending=256):
+        self.sock = sock
+        self.topics = set()
+        self.dropped = 0
+        self.closed = False
+        self._outbox = queue.Queue(maxsize=max_pending)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        """Schrijf regels naar de socket (één writer, dus nooit door elkaar)"""
+        while True:
+            line = self._outbox.get()
+            if line is None:
+                return
+            try:
+                self.sock.sendall(line)
+            except OSError:
+                return
+
+    def reply(self, message):
+        """
+        Verstuur een antwoord
+
+        Een antwoord wordt niet weggegooid; blijft de buffer langer dan
+        REPLY_TIMEOUT vol, dan leest de client niet meer en wordt de
+        verbinding verbroken.
+        """
+        if self.closed:
+            return
+        try:
+            self._outbox.put(json.dumps(message).encode() + b"\n",
+                             timeout=self.REPLY_TIMEOUT)
+        except queue.Full:
+            print("⚠ Daemon: client neemt geen antwoorden af, verbinding verbroken")
+            self._drop()
+
+    def event(self, message):
+        """Verstuur een event; bij een volle buffer wordt het event weggegooid"""
+        if self.closed:
+            return
+        try:
+            self._outbox.put_nowait(json.dumps(message).encode() + b"\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def _drop(self):
+        """Verbreek de verbinding; de handler en de schrijf thread stoppen dan"""
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        try:
+            self._outbox.put(None, timeout=self.REPLY_TIMEOUT)
+        except queue.Full:
+            self._drop()
+
+
+class ControllerDaemon:
+    """Unix socket server rond een BeagleBoneController"""
+
+    def __init__(self, controller, path=DEFAULT_SOCKET):
+        """
+        Initialiseer daemon
+
+        Args:
+            controller: BeagleBoneController instantie
+            path: Pad van de Unix domain socket
+        """
+        self.controller = controller
+        self.path = path
+        self.server = None
+        self.clients = []
+        self._clients_lock = threading.Lock()
+        self.sample_bus = None
+        self.capture = None
+        self.journal = None
+
+        # Menu pauzes zijn in de daemon niet nodig
+        controller.interactive = False
+
+        self.commands = {
+            "ping": lambda: "pong",
+            "commands": lambda: sorted(self.commands),
+            "status": self.status,
+            "set_voltage": lambda voltage: controller.set_constant_voltage(voltage),
+            "set_current": lambda current: controller.set_constant_current(current),
+            "voltage_waveform": self._voltage_waveform,
+            "current_waveform": self._current_waveform,
+            "voltage_ramp": lambda start, end, duration:
+                controller.start_voltage_ramp(start, end, duration),
+            "current_ramp": lambda start, end, duration:
+                controller.start_current_ramp(start, end, duration),
+            "voltage_arb": lambda path, **options:
+                controller.start_voltage_arb(self._arb_player(path, **options)),
+            "current_arb": lambda path, **options:
+                controller.start_current_arb(self._arb_player(path, **options)),
+            "replay_start": lambda path, loop=False:
+                controller.start_replay(ReplayProgram.load(path), bool(loop)),
+            "replay_verify": lambda path: verify_replay(controller, ReplayProgram.load(path)),
+            "stop_voltage": self._stop_voltage,
+            "stop_current": self._stop_current,
+            "stop_all": self._stop_all,
+            "relay_start": lambda frequency: controller.start_relay(frequency),
+            "relay_set": lambda state: controller.set_relay(bool(state)),
+            "read_adc": self._read_adc,
+            "adc_stream_start": self._adc_stream_start,
+            "adc_stream_stop": lambda: controller.adc.stop_stream() or True,
+            "adc_scan_start": self._adc_scan_start,
+            "adc_scan_stop": lambda: controller.adc.stop_scan() or True,
+            "adc_set_gain": self._adc_set_gain,
+            "adc_autorange": self._adc_autorange,
+            "adc_filter": lambda channel, kind="cic", decimation=16, **options:
+                controller.adc.configure_filter(channel, kind, decimation, **options) or True,
+            "adc_filter_remove": lambda channel: controller.adc.remove_filter(channel) or True,
+            "adc_comparator": lambda name, low, high, window=False, latch=True, queue=1:
+                controller.adc.set_comparator(name, low, high, window, latch, queue) or True,
+            "adc_comparator_clear": lambda: controller.adc.clear_comparator() or True,
+            "protection_add": self._protection_add,
+            "protection_remove": lambda name: controller.protection.remove_rule(name) or True,
+            "protection_start": lambda frame_size=16, data_rate=None:
+                controller.protection.start(frame_size, data_rate),
+            "protection_stop": lambda: controller.protection.stop() or True,
+            "protection_reset": lambda name=None: controller.protection.reset(name) or True,
+            "protection_status": self._protection_status,
+            "latency_enable": lambda: controller.latency.enable() or True,
+            "latency_disable": lambda: controller.latency.disable() or True,
+            "latency_reset": lambda: controller.latency.reset() or True,
+            "latency_report": lambda: controller.latency.report(),
+            "metrics_start": lambda port=None, host=None:
+                controller.start_metrics(port or METRICS_PORT, METRICS_HOST if host is None else host),
+            "metrics_stop": lambda: controller.stop_metrics() or True,
+            "calibrate": self._calibrate,
+            "calibration": self._calibration,
+            "calibration_load": lambda path=None: controller.dac.load_calibration(path),
+            "sample_bus_start": self._sample_bus_start,
+            "sample_bus_stop": self._sample_bus_stop,
+            "capture_start": self._capture_start,
+            "capture_stop": self._capture_stop,
+            "journal_start": self._journal_start,
+            "journal_stop": self._journal_stop,
+            "journal_export": self._journal_export,
+            "safe_state": self._safe_state,
+            "safe_state_config": lambda voltage=None, current=None, relay=None:
+                controller.configure_safe_state(voltage, current, relay),
+        }
+
+    # Commando's
+
+    def _check_wave(self, wave):
+        if wave not in ("sine", "triangle", "square", "sawtooth"):
+            raise ValueError(f"Onbekende golfvorm: {wave}")
+
+    def _voltage_waveform(self, wave, min, max, frequency):
+        self._check_wave(wave)
+        if not 0 <= min <= max <= 3.3:
+            raise ValueError("Spanning moet tussen 0 en 3.3V zijn")
+        return self.controller.start_voltage_waveform(wave, min, max, frequency)
+
+    def _current_waveform(self, wave, min, max, frequency):
+        self._check_wave(wave)
+        if not 4 <= min <= max <= 20:
+            raise ValueError("Stroom moet tussen 4 en 20mA zijn")
+        return self.controller.start_current_waveform(wave, min, max, frequency)
+
+    def _arb_player(self, path, loop=True, speed=1.0, scale=1.0, offset=0.0,
+                    sample_rate=None):
+        if speed <= 0:
+            raise ValueError("Snelheid moet groter dan 0 zijn")
+        return ArbPlayer(ArbWaveform(path, sample_rate), loop=bool(loop),
+                         speed=speed, scale=scale, offset=offset)
+
+    def _stop_voltage(self):
+        self.controller.stop_voltage()
+        return True
+
+    def _stop_current(self):
+        self.controller.stop_current()
+        return True
+
+    def _stop_all(self):
+        self.controller.stop_all()
+        return True
+
+    def _read_adc(self, channel=None):
+        adc = self.controller.adc
+        if channel is None:
+            return adc.read_all_channels()
+        return adc.read_channel(channel)
+
+    def _adc_stream_start(self, channel, block_size=64, data_rate=None):
+        adc = self.controller.adc
+        adc.start_stream(channel, block_size, data_rate or adc.MAX_DATA_RATE)
+        return True
+
+    def _adc_scan_start(self, channels=(0, 1, 2, 3), frame_size=64, data_rate=None):
+        adc = self.controller.adc
+        adc.start_scan(channels=tuple(channels), frame_size=frame_size,
+                       data_rate=data_rate or adc.MAX_DATA_RATE)
+        return True
+
+    def _adc_set_gain(self, channel, gain):
+        adc = self.controller.adc
+        # JSON kent geen 2/3: accepteer "2/3" of een afgeronde waarde
+        value = Fraction(str(gain))
+        matches = [g for g in adc.GAINS if abs(g - value) < 1e-3]
+        adc.set_channel_gain(channel, matches[0] if matches else gain)
+        return True
+
+    def _adc_autorange(self, channel, enabled=True, min_gain=1, max_gain=16):
+        self.controller.adc.set_autorange(channel, bool(enabled), min_gain, max_gain)
+        return True
+
+    def _protection_add(self, name, channel, threshold, above=True, hysteresis=0.0,
+                        duration=0.0, debounce=1, latch=True, action="safe_state"):
+        actions = {"safe_state": self.controller.enter_safe_state, None: None}
+        if action not in actions:
+            raise ValueError(f"Onbekende actie: {action} (safe_state of null)")
+        self.controller.protection.add_rule(ProtectionRule(
+            name, channel, threshold, above=bool(above), hysteresis=hysteresis,
+            duration=duration, debounce=debounce, action=actions[action],
+            latch=bool(latch)))
+        return True
+
+    def _protection_status(self):
+        engine = self.controller.protection
+        return {
+            "running": engine.running,
+            "armed": engine.armed,
+            "rules": [{"name": rule.name, "rule": rule.describe(),
+                       "tripped": rule.tripped, "trips": rule.trip_count}
+                      for rule in engine.rules.values()],
+            "events": list(engine.events),
+            "max_latency": engine.max_latency,
+        }
+
+    def _calibrate(self, save=True):
+        c = self.controller
+        c.stop_all()  # De sweep stuurt de DAC kanalen zelf aan
+        table = Calibrator(c.dac, c.adc).run(save=bool(save))
+        if table is None:
+            raise RuntimeError("Kalibratie niet uitgevoerd of afgekeurd (zie log)")
+        return table.to_dict()
+
+    def _calibration(self):
+        table = self.controller.dac.calibration
+        return table.to_dict() if table is not None else None
+
+    def _sample_bus_start(self, name=SAMPLE_BUS_NAME, capacity=2**18):
+        if self.sample_bus is None:
+            self.sample_bus = SampleBusWriter(name=name, capacity=capacity)
+            self.sample_bus.attach(self.controller.adc)
+        return self.sample_bus.name
+
+    def _sample_bus_stop(self):
+        if self.sample_bus is not None:
+            self.sample_bus.close()
+            self.sample_bus = None
+        return True
+
+    def _capture_start(self, directory, prefix="capture", max_bytes=256 * 2**20,
+                       max_seconds=None, fsync="rotate", metadata=None):
+        if self.capture is not None and self.capture.running:
+            raise ValueError("Er loopt al een capture")
+        self.capture = CaptureWriter(self.controller.adc, directory, prefix=prefix,
+                                     max_bytes=max_bytes, max_seconds=max_seconds,
+                                     fsync=fsync, metadata=metadata)
+        return self.capture.start()
+
+    def _capture_stop(self):
+        if self.capture is None:
+            return None
+        self.capture.stop()
+        return self.capture.files
+
+    def _journal_start(self):
+        c = self.controller
+        if self.journal is None:
+            self.journal = EventJournal()
+        self.journal.clear()
+        self.journal.attach(dac=c.dac, relay=c.relay, adc=c.adc)
+        return True
+
+    def _journal_stop(self):
+        if self.journal is not None:
+            self.journal.detach()
+        return True
+
+    def _journal_export(self, path, t_start=None, t_end=None):
+        if self.journal is None:
+            raise ValueError("Geen journal opgenomen")
+        return self.journal.export(path, t_start, t_end)
+
+    def _safe_state(self, reason="daemon"):
+        return self.controller.enter_safe_state(reason)
+
+    def status(self):
+        """Toestand van outputs, ADC en bewaking"""
+        c = self.controller
+        requested, emitted = c.relay.edge_counts()
+        return {
+            "voltage": {"running": c.voltage_running,
+                        "setpoint": c.dac.voltage_setpoint},
+            "current": {"running": c.current_running,
+                        "setpoint": c.dac.current_setpoint},
+            "relay": dict(c.relay.get_state(), edges_requested=requested,
+                          edges_emitted=emitted),
+            "adc": {"streaming": c.adc.streaming, "scanning": c.adc.scanning,
+                    "samples": c.adc.sample_counts,
+                    "gains": [float(c.adc.get_channel_gain(ch)) for ch in range(4)],
+                    "filters": sorted(c.adc.filters)},
+            "i2c": c.dac.transport.stats(),
+            "loop_overruns": c.loop_overruns,
+            "protection": {"running": c.protection.running,
+                           "rules": len(c.protection.rules),
+                           "tripped": c.protection.tripped()},
+            "latency": {"enabled": c.latency.enabled,
+                        "report": {name: stats for name, stats in c.latency.report().items()
+                                   if stats["count"]}},
+            "calibration": c.dac.calibration.created if c.dac.calibration else None,
+            "safe_state": c.safe_state_reason,
+            "safe_state_pending": c.safe_state_pending,
+            "sample_bus": self.sample_bus.consumers() if self.sample_bus else None,
+            "capture": self.capture.stats() if self.capture else None,
+            "journal": self.journal.counts() if self.journal else None,
+            "clients": len(self.clients),
+            "dropped": sum(client.dropped for client in self.clients),
+        }
+
+    # Events
+
+    def _publish(self, topic, message):
+        """Stuur een event naar alle clients met dit topic"""
+        for client in self.clients:
+            if topic in client.topics:
+                client.event(message)
+
+    def _has_subscribers(self, topic):
+        return any(topic in client.topics for client in self.clients)
+
+    def _on_block(self, channel, timestamps, raw):
+        if not self._has_subscribers("adc"):
+            return
+        volts = self.controller.adc.raw_to_voltage(raw, channel)
+        self._publish("adc", {"event": "adc", "channel": channel,
+                              "t": timestamps.tolist(), "v": volts.tolist()})
+
+    def _on_filtered(self, channel, timestamps, volts):
+        if not self._has_subscribers("filtered"):
+            return
+        self._publish("filtered", {"event": "filtered", "channel": channel,
+                                   "t": timestamps.tolist(), "v": volts.tolist()})
+
+    def _on_alert(self, name, timestamp, voltage):
+        self._publish("alert", {"event": "alert", "name": name,
+                                "time": timestamp, "voltage": voltage})
+
+    # Verbindingen
+
+    def handle(self, client, line):
+        """
+        Verwerk één verzoek
+
+        Args:
+            client: _Client van de aanvrager
+            line: JSON regel
+        """
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            cmd = request["cmd"]
+            args = request.get("args") or {}
+
+            if cmd in ("subscribe", "unsubscribe"):
+                topic = args.get("topic")
+                if topic not in TOPICS:
+                    raise ValueError(f"Onbekend topic: {topic}")
+                if cmd == "subscribe":
+                    client.topics.add(topic)
+                else:
+                    client.topics.discard(topic)
+                result = sorted(client.topics)
+            elif cmd in self.commands:
+                result = self.commands[cmd](**args)
+            else:
+                raise ValueError(f"Onbekend commando: {cmd}")
+
+            client.reply({"id": request_id, "ok": True, "result": result})
+        except Exception as e:
+            client.reply({"id": request_id, "ok": False,
+                          "error": f"{type(e).__name__}: {e}"})
+
+    def _handler(self):
+        """Request handler klasse met toegang tot de daemon"""
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                client = _Client(self.connection)
+                with daemon._clients_lock:
+                    daemon.clients = daemon.clients + [client]
+                try:
+                    for line in self.rfile:
+                        if line.strip():
+                            daemon.handle(client, line)
+                finally:
+                    with daemon._clients_lock:
+                        daemon.clients = [c for c in daemon.clients if c is not client]
+                    client.close()
+
+        return Handler
+
+    def start(self):
+        """
+        Start de socket server in een achtergrond thread
+
+        Returns:
+            True als de server luistert
+        """
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Socket van een vorige run
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(self.path, self._handler())
+        except OSError as e:
+            print(f"✗ Fout bij starten daemon op {self.path}: {e}")
+            self.server = None
+            return False
+        self.server.daemon_threads = True
+
+        adc = self.controller.adc
+        adc.add_block_listener(self._on_block)
+        adc.add_filtered_listener(self._on_filtered)
+        adc.add_alert_listener(self._on_alert)
+
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"✓ Daemon luistert op {self.path}")
+        return True
+
+    def stop(self):
+        """Stop de server en verwijder de socket"""
+        if not self.server:
+            return
+        adc = self.controller.adc
+        adc.remove_block_listener(self._on_block)
+        adc.remove_filtered_listener(self._on_filtered)
+        adc.remove_alert_listener(self._on_alert)
+        self._sample_bus_stop()
+        self._capture_stop()
+        self._journal_stop()
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class DaemonClient:
+    """Eenvoudige client voor automatisering scripts"""
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=5.0):
+        """
+        Args:
+            path: Pad van de Unix domain socket
+            timeout: Maximale wachttijd op een antwoord
+        """
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self._file = self.sock.makefile("rb")
+        self._next_id = 0
+        self.events = []  # Events ontvangen tijdens het wachten op een antwoord
+
+    def call(self, cmd, **args):
+        """
+        Voer een commando uit
+
+        Returns:
+            Resultaat van het commando
+
+        Raises:
+            RuntimeError: Als de daemon een fout meldt
+        """
+        self._next_id += 1
+        request = {"id": self._next_id, "cmd": cmd, "args": args}
+        self.sock.sendall(json.dumps(request).encode() + b"\n")
+        while True:
+            message = self.read()
+            if "event" in message:
+                self.events.append(message)
+                continue
+            if message.get("id") != self._next_id:
+                continue
+            if not message["ok"]:
+                raise RuntimeError(message["error"])
+            return message["result"]
+
+    def read(self):
+        """Lees het volgende bericht (antwoord of event)"""
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Verbinding met daemon verbroken")
+        return json.loads(line)
+
+    def close(self):
+        self._file.close()
+        self.sock.close()
+
+
+# Los commando vanaf de shell: python3 controller_daemon.py <cmd> [naam=waarde ...]
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Gebruik: python3 controller_daemon.py <commando> [naam=waarde ...]")
+        print("Bijv:    python3 controller_daemon.py set_voltage voltage=1.5")
+        sys.exit(1)
+
+    args = {}
+    for item in sys.argv[2:]:
+        name, _, value = item.partition("=")
+        try:
+            args[name] = json.loads(value)
+        except json.JSONDecodeError:
+            args[name] = value
+
+    client = DaemonClient()
+    try:
+        print(json.dumps(client.call(sys.argv[1], **args), indent=2))
+    except RuntimeError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    finally:
+        client.close()
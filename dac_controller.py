@@ -9,6 +9,11 @@ Hardware configuratie:
 """
 
 import time
+import threading
+import numpy as np
+from calibration import CalibrationTable
+from i2c_transport import get_transport, I2CError
+from i2c_trace import WRITE
 try:
     import board
     import busio
@@ -29,6 +34,16 @@ class DACController:
     CURRENT_MIN = 4.0   # mA
     CURRENT_MAX = 20.0  # mA
     
+    # Resolutie van de kalibratie lookup tables
+    LUT_VOLTAGE_STEP = 0.001  # V
+    LUT_CURRENT_STEP = 0.001  # mA
+    
+    # Tijdsbudget per write inclusief retries (helft van een 100Hz tick)
+    WRITE_BUDGET = 0.005
+    
+    # Interval tussen pogingen om een niet bevestigde safe state te schrijven
+    SAFE_RETRY_INTERVAL = 0.1
+    
     def __init__(self, i2c_bus=2, address=0x60):
         """
         Initialiseer MCP4728 DAC
@@ -40,13 +55,39 @@ class DACController:
         self.i2c_bus = i2c_bus
         self.address = address
         
+        # Kalibratie lookup tables (None = ideale lineaire mapping)
+        self.calibration = None
+        self._voltage_lut = None
+        self._current_lut = None
+        self.load_calibration()
+        
+        # Gedeelde I2C transactie laag (retries, breaker, bus recovery)
+        self.transport = get_transport(i2c_bus)
+        self._trace_write = (address, WRITE, 3)  # Multi-write: 3 bytes per kanaal
+        
+        # Laatst geschreven code per kanaal: een ongewijzigde code wordt
+        # niet opnieuw over de bus gestuurd
+        self._codes = {}
+        self.writes = 0             # Uitgevoerde kanaal writes
+        self.writes_suppressed = 0  # Overgeslagen (code ongewijzigd)
+        self.write_failures = 0
+        
+        # Optioneel EventJournal voor de stimulus tijdlijn (zie event_journal.py)
+        self.journal = None
+        
+        # Laatst ingestelde setpoints
+        self.voltage_setpoint = 0.0
+        self.current_setpoint = 4.0
+        
+        # Safe state (spanning, stroom) die nog niet bevestigd geschreven is;
+        # wordt na een bus recovery als eerste geschreven
+        self.safe_state_pending = None
+        self._safe_retry_thread = None
+        
         try:
             if board:
-                # Initialiseer I2C direct met bus 2 (P9_19 = SCL, P9_20 = SDA)
-                # BeagleBone Black I2C-2 bus (/dev/i2c-2)
-                from board import SCL, SDA
-                i2c = busio.I2C(SCL, SDA)
-                self.dac = adafruit_mcp4728.MCP4728(i2c, address=address)
+                self._connect()
+                self.transport.add_reinit(self._reinit)
                 
                 # Configureer voor interne reference (2.048V met gain=2 -> 4.096V)
                 # MCP4728 gebruikt internal vref van 2.048V
@@ -54,7 +95,7 @@ class DACController:
                 self.dac.channel_a.value = 0  # Voltage output low
                 self.dac.channel_b.value = 0
                 self.dac.channel_c.value = self._current_to_dac(4.0)  # Min current
-                self.dac.channel_d.value = self._current_to_dac(4.0)
+                self.dac.channel_d.value = 0  # Single-ended: D altijd op 0
                 
                 print(f"✓ MCP4728 DAC geïnitialiseerd op adres 0x{address:02X}")
             else:
@@ -65,10 +106,139 @@ class DACController:
             print(f"✗ Fout bij initialiseren DAC: {e}")
             self.dac = None
     
+    def _connect(self):
+        """Maak (opnieuw) verbinding met de MCP4728, ook na een bus recovery"""
+        # Initialiseer I2C direct met bus 2 (P9_19 = SCL, P9_20 = SDA)
+        # BeagleBone Black I2C-2 bus (/dev/i2c-2)
+        from board import SCL, SDA
+        i2c = busio.I2C(SCL, SDA)
+        self.dac = adafruit_mcp4728.MCP4728(i2c, address=self.address)
+        self._codes = {}  # Toestand na (her)initialisatie onbekend
+    
+    def _reinit(self):
+        """
+        Herinitialiseer na een bus recovery en zet de outputs terug
+        
+        Een pending safe state gaat voor; anders worden de laatste
+        setpoints opnieuw geschreven. De breaker is op dit moment nog open,
+        dus de writes gaan via het geforceerde pad.
+        """
+        self._connect()
+        if self.safe_state_pending is not None:
+            if self._write_safe_state():
+                print("✓ Safe state na bus recovery alsnog geschreven")
+            return
+        try:
+            self._write_code('a', self._voltage_to_dac(self.voltage_setpoint), force=True)
+            self._write_code('c', self._current_to_dac(self.current_setpoint), force=True)
+            self._write_code('d', 0, force=True)
+        except I2CError as e:
+            self.transport.log_error("herstellen setpoints na recovery", e)
+    
+    @staticmethod
+    def _write_channel(channel, value):
+        """Schrijf een DAC kanaal (één I2C transactie)"""
+        channel.value = value
+    
+    def _write_code(self, name, value, budget=None, force=False):
+        """
+        Schrijf een code naar een kanaal, tenzij het kanaal die al heeft
+        
+        Args:
+            name: Kanaal letter ('a'-'d')
+            value: DAC code (0-4095)
+            budget: Tijdsbudget inclusief retries
+            force: Ook bij een open breaker proberen (zie I2CTransport.execute)
+            
+        Raises:
+            I2CError: Als de write mislukt
+        """
+        if self._codes.get(name) == value:
+            self.writes_suppressed += 1
+            return
+        try:
+            self.transport.execute(self._write_channel,
+                                   getattr(self.dac, f"channel_{name}"), value,
+                                   budget=budget, trace=self._trace_write, force=force)
+        except I2CError:
+            self._codes.pop(name, None)
+            self.write_failures += 1
+            raise
+        self._codes[name] = value
+        self.writes += 1
+        journal = self.journal
+        if journal is not None:
+            journal.dac_write(name, value, time.monotonic())
+    
+    def load_calibration(self, path=None):
+        """
+        Laad de kalibratie tabel van dit board (indien aanwezig)
+        
+        Args:
+            path: Bestandspad (default: calibration/<board_id>.json)
+            
+        Returns:
+            True als een kalibratie geladen is
+        """
+        try:
+            table = CalibrationTable.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"✗ Fout bij laden kalibratie: {e}")
+            return False
+        
+        if table is None:
+            return False
+        
+        problems = table.validate(self.output_spans())
+        if problems:
+            for problem in problems:
+                print(f"✗ Kalibratie {table.board_id} genegeerd: {problem}")
+            return False
+        
+        self.apply_calibration(table)
+        print(f"✓ Kalibratie geladen voor board {table.board_id} ({table.created})")
+        return True
+    
+    def output_spans(self):
+        """Nominaal bereik per output (voor de kalibratie controle)"""
+        return {"voltage": self.VREF, "current": self.CURRENT_MAX - self.CURRENT_MIN}
+    
+    def apply_calibration(self, table):
+        """
+        Activeer een kalibratie tabel en bereken de code lookup tables
+        
+        Args:
+            table: CalibrationTable instantie
+        """
+        self.calibration = table
+        
+        if table.has_output("voltage"):
+            self._voltage_lut = table.build_lut("voltage", 0.0, self.VREF,
+                                                self.LUT_VOLTAGE_STEP,
+                                                self.DAC_MAX_VALUE)
+        else:
+            self._voltage_lut = None
+        
+        if table.has_output("current"):
+            self._current_lut = table.build_lut("current", self.CURRENT_MIN,
+                                                self.CURRENT_MAX,
+                                                self.LUT_CURRENT_STEP,
+                                                self.DAC_MAX_VALUE)
+        else:
+            self._current_lut = None
+    
+    def clear_calibration(self):
+        """Schakel terug naar de ideale lineaire mapping"""
+        self.calibration = None
+        self._voltage_lut = None
+        self._current_lut = None
+    
     def _voltage_to_dac(self, voltage):
         """
         Converteer voltage (0-3.3V) naar DAC waarde (0-4095)
         
+        Met kalibratie is dit een enkele index lookup in de LUT.
+        
         Args:
             voltage: Gewenste voltage (0-3.3V)
             
@@ -80,6 +250,9 @@ class DACController:
         elif voltage > self.VREF:
             voltage = self.VREF
         
+        if self._voltage_lut is not None:
+            return self._voltage_lut[int(voltage / self.LUT_VOLTAGE_STEP + 0.5)]
+        
         dac_value = int((voltage / self.VREF) * self.DAC_MAX_VALUE)
         return min(max(dac_value, 0), self.DAC_MAX_VALUE)
     
@@ -89,6 +262,7 @@ class DACController:
         
         De opamp + MOSFET schakeling converteert de DAC spanning naar stroom.
         Lineaire mapping: 4mA = 0V, 20mA = 3.3V
+        Met kalibratie is dit een enkele index lookup in de LUT.
         
         Args:
             current_ma: Gewenste stroom in mA (4-20)
@@ -101,6 +275,10 @@ class DACController:
         elif current_ma > self.CURRENT_MAX:
             current_ma = self.CURRENT_MAX
         
+        if self._current_lut is not None:
+            return self._current_lut[int((current_ma - self.CURRENT_MIN)
+                                         / self.LUT_CURRENT_STEP + 0.5)]
+        
         # Lineair schalen van 4-20mA naar 0-3.3V
         voltage_ratio = (current_ma - self.CURRENT_MIN) / (self.CURRENT_MAX - self.CURRENT_MIN)
         voltage = voltage_ratio * self.VREF
@@ -108,6 +286,72 @@ class DACController:
         dac_value = int((voltage / self.VREF) * self.DAC_MAX_VALUE)
         return min(max(dac_value, 0), self.DAC_MAX_VALUE)
     
+    def values_to_codes(self, output, values):
+        """
+        Converteer een reeks setpoints naar DAC codes (gevectoriseerd)
+        
+        Geeft per waarde dezelfde code als _voltage_to_dac/_current_to_dac,
+        inclusief kalibratie LUT en begrenzing.
+        
+        Args:
+            output: 'voltage' (V) of 'current' (mA)
+            values: numpy array met setpoints
+            
+        Returns:
+            numpy uint16 array met DAC codes
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if output == "voltage":
+            values = np.clip(values, 0.0, self.VREF)
+            lut, base, step = self._voltage_lut, 0.0, self.LUT_VOLTAGE_STEP
+            ratio = values / self.VREF
+        elif output == "current":
+            values = np.clip(values, self.CURRENT_MIN, self.CURRENT_MAX)
+            lut, base, step = self._current_lut, self.CURRENT_MIN, self.LUT_CURRENT_STEP
+            ratio = (values - self.CURRENT_MIN) / (self.CURRENT_MAX - self.CURRENT_MIN)
+        else:
+            raise ValueError(f"Onbekende output: {output}")
+        
+        if lut is not None:
+            index = ((values - base) / step + 0.5).astype(np.int64)
+            return np.asarray(lut)[index].astype(np.uint16)
+        codes = (ratio * self.DAC_MAX_VALUE).astype(np.int64)
+        return np.clip(codes, 0, self.DAC_MAX_VALUE).astype(np.uint16)
+    
+    def set_output_code(self, output, code, setpoint=None):
+        """
+        Schrijf een vooraf berekende code naar de spannings- of stroomuitgang
+        
+        Args:
+            output: 'voltage' (channel A) of 'current' (channel C, D op 0)
+            code: DAC code (0-4095), bijv. uit values_to_codes()
+            setpoint: Bijbehorende waarde in V of mA (voor de status)
+            
+        Returns:
+            True als de write gelukt is
+        """
+        if output not in ("voltage", "current"):
+            raise ValueError(f"Onbekende output: {output}")
+        if not self.dac:
+            print(f"[TEST] {output} code zou ingesteld worden op: {int(code)}")
+        else:
+            try:
+                if output == "voltage":
+                    self._write_code('a', int(code), budget=self.WRITE_BUDGET)
+                else:
+                    self._write_code('c', int(code), budget=self.WRITE_BUDGET)
+                    self._write_code('d', 0, budget=self.WRITE_BUDGET)
+            except I2CError as e:
+                self.transport.log_error(f"instellen {output} code", e)
+                return False
+        
+        if setpoint is not None:
+            if output == "voltage":
+                self.voltage_setpoint = float(setpoint)
+            else:
+                self.current_setpoint = float(setpoint)
+        return True
+    
     def set_voltage_output(self, voltage):
         """
         Stel spanningsuitgang in (0-3.3V)
@@ -116,23 +360,33 @@ class DACController:
         
         Args:
             voltage: Gewenste output voltage (0-3.3V)
+            
+        Returns:
+            True als de write gelukt is
         """
         if not self.dac:
             print(f"[TEST] Voltage zou ingesteld worden op: {voltage:.3f}V")
-            return
+            self.voltage_setpoint = voltage
+            return True
         
         try:
             dac_value = self._voltage_to_dac(voltage)
             
             # VOUTA op + van opamp (channel A)
             # Opamp uitgang is via hardware feedback verbonden met - input
-            self.dac.channel_a.value = dac_value
+            self._write_code('a', dac_value, budget=self.WRITE_BUDGET)
+            self.voltage_setpoint = voltage
             
             # VOUTB NIET aansturen - laat dit open of via hardware feedback
             # self.dac.channel_b.value blijft zoals het was bij init (0)
+            return True
             
+        except I2CError as e:
+            self.transport.log_error("instellen voltage", e)
+            return False
         except Exception as e:
             print(f"✗ Fout bij instellen voltage: {e}")
+            return False
     
     def set_current_output(self, current_ma):
         """
@@ -141,23 +395,89 @@ class DACController:
         
         Args:
             current_ma: Gewenste output stroom in mA (4-20)
+            
+        Returns:
+            True als de write gelukt is
         """
         if not self.dac:
             print(f"[TEST] Stroom zou ingesteld worden op: {current_ma:.3f}mA")
-            return
+            self.current_setpoint = current_ma
+            return True
         
         try:
             dac_value = self._current_to_dac(current_ma)
             
             # VOUTC op + van opamp (channel C)
-            self.dac.channel_c.value = dac_value
+            self._write_code('c', dac_value, budget=self.WRITE_BUDGET)
             
             # VOUTD op - van opamp (channel D)
             # Voor single-ended: zet D op 0
-            self.dac.channel_d.value = 0
+            self._write_code('d', 0, budget=self.WRITE_BUDGET)
+            self.current_setpoint = current_ma
+            return True
             
+        except I2CError as e:
+            self.transport.log_error("instellen stroom", e)
+            return False
         except Exception as e:
             print(f"✗ Fout bij instellen stroom: {e}")
+            return False
+    
+    def apply_safe_state(self, voltage, current_ma):
+        """
+        Schrijf de veilige toestand van beide outputs
+        
+        De writes gaan ook bij een open breaker door. Lukt het niet, dan
+        blijft de safe state pending: een achtergrond thread probeert het
+        elke SAFE_RETRY_INTERVAL opnieuw en na een bus recovery wordt hij
+        als eerste geschreven (zie _reinit).
+        
+        Args:
+            voltage: Veilige spanning (V)
+            current_ma: Veilige stroom (mA)
+            
+        Returns:
+            True als beide outputs bevestigd geschreven zijn
+        """
+        self.safe_state_pending = (voltage, current_ma)
+        if self._write_safe_state():
+            return True
+        if self._safe_retry_thread is None or not self._safe_retry_thread.is_alive():
+            self._safe_retry_thread = threading.Thread(target=self._safe_retry_loop,
+                                                       daemon=True)
+            self._safe_retry_thread.start()
+        return False
+    
+    def _safe_retry_loop(self):
+        """Thread functie: herhaal de safe state writes tot ze bevestigd zijn"""
+        while self.safe_state_pending is not None:
+            time.sleep(self.SAFE_RETRY_INTERVAL)
+            if self._write_safe_state():
+                print("✓ Safe state alsnog geschreven")
+    
+    def _write_safe_state(self):
+        """Schrijf de pending safe state (stroom eerst); True als dat gelukt is"""
+        pending = self.safe_state_pending
+        if pending is None:
+            return True
+        voltage, current_ma = pending
+        if not self.dac:
+            print(f"[TEST] Safe state zou ingesteld worden: {voltage:.3f}V, {current_ma:.3f}mA")
+        else:
+            try:
+                self._write_code('c', self._current_to_dac(current_ma),
+                                 budget=self.WRITE_BUDGET, force=True)
+                self._write_code('d', 0, budget=self.WRITE_BUDGET, force=True)
+                self._write_code('a', self._voltage_to_dac(voltage),
+                                 budget=self.WRITE_BUDGET, force=True)
+            except I2CError as e:
+                self.transport.log_error("instellen safe state", e)
+                return False
+        self.voltage_setpoint = voltage
+        self.current_setpoint = current_ma
+        if self.safe_state_pending is pending:
+            self.safe_state_pending = None
+        return True
     
     def set_raw_channel(self, channel, value):
         """
@@ -174,17 +494,13 @@ class DACController:
         try:
             value = min(max(int(value), 0), self.DAC_MAX_VALUE)
             
-            if channel.upper() == 'A':
-                self.dac.channel_a.value = value
-            elif channel.upper() == 'B':
-                self.dac.channel_b.value = value
-            elif channel.upper() == 'C':
-                self.dac.channel_c.value = value
-            elif channel.upper() == 'D':
-                self.dac.channel_d.value = value
+            if channel.upper() in ('A', 'B', 'C', 'D'):
+                self._write_code(channel.lower(), value)
             else:
                 print(f"✗ Ongeldig kanaal: {channel}")
                 
+        except I2CError as e:
+            self.transport.log_error(f"instellen channel {channel}", e)
         except Exception as e:
             print(f"✗ Fout bij instellen channel {channel}: {e}")
     
@@ -200,6 +516,8 @@ class DACController:
         
         try:
             dac_value = self.dac.channel_a.value
+            if self._voltage_lut is not None:
+                return self.calibration.code_to_value("voltage", dac_value)
             voltage = (dac_value / self.DAC_MAX_VALUE) * self.VREF
             return voltage
         except Exception as e:
@@ -218,6 +536,8 @@ class DACController:
         
         try:
             dac_value = self.dac.channel_c.value
+            if self._current_lut is not None:
+                return self.calibration.code_to_value("current", dac_value)
             voltage = (dac_value / self.DAC_MAX_VALUE) * self.VREF
             voltage_ratio = voltage / self.VREF
             current_ma = self.CURRENT_MIN + voltage_ratio * (self.CURRENT_MAX - self.CURRENT_MIN)
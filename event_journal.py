@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Event Journal
+Stimulus/respons tijdlijn van DAC writes, relay flanken en ADC samples
+
+Alle gebeurtenissen krijgen een tijdstempel op dezelfde klok
+(time.monotonic, ook de klok van de ADC tijdstempels) en worden per bron
+opgeslagen in een ringbuffer van voorgealloceerde numpy arrays:
+
+- DAC: elke write die over de bus gaat (kanaal 0-3 = A-D, code), met de
+  tijd waarop de transactie klaar is (de MCP4728 neemt de code over bij
+  de laatste ACK). Overgeslagen writes (code ongewijzigd) zijn geen
+  stimulus en worden niet opgenomen.
+- Relay: elke flank (waarde 1 = AAN, 0 = UIT).
+- ADC: elk sample (kanaal, ruwe code) met de tijdstempel van de
+  acquisitie.
+
+De bronnen worden pas bij het exporteren samengevoegd tot één op tijd
+gesorteerde tijdlijn, zodat de hot paths alleen een paar array writes
+kosten. response_latencies() berekent daaruit direct de tijd tussen een
+stimulus en de eerste drempel passage op een ADC kanaal.
+
+Gebruik:
+    journal = EventJournal()
+    journal.attach(dac=controller.dac, relay=controller.relay, adc=controller.adc)
+    ... (stimulus geven, ADC laten streamen)
+    timeline = journal.timeline()
+    latency = response_latencies(timeline, RELAY, adc_channel=0, threshold=8000)
+    journal.export("timeline.csv")
+"""
+
+import threading
+import numpy as np
+
+
+# Bron van een gebeurtenis
+DAC = 0
+RELAY = 1
+ADC = 2
+
+SOURCE_NAMES = {DAC: "dac", RELAY: "relay", ADC: "adc"}
+
+TIMELINE = np.dtype([("t", np.float64), ("source", np.uint8),
+                     ("channel", np.uint8), ("value", np.int32)])
+
+_DAC_CHANNELS = {"a": 0, "b": 1, "c": 2, "d": 3}
+
+
+class _EventRing:
+    """Ringbuffer van één bron (tijd, kanaal, waarde)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.t = np.zeros(capacity)
+        self.channel = np.zeros(capacity, dtype=np.uint8)
+        self.value = np.zeros(capacity, dtype=np.int32)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.count = 0
+
+    def record(self, t, channel, value):
+        """Eén gebeurtenis"""
+        with self._lock:
+            slot = self.count % self.capacity
+            self.t[slot] = t
+            self.channel[slot] = channel
+            self.value[slot] = value
+            self.count += 1
+
+    def record_block(self, timestamps, channel, values):
+        """Een blok gebeurtenissen (gevectoriseerd)"""
+        n = len(timestamps)
+        if n > self.capacity:
+            timestamps, values = timestamps[-self.capacity:], values[-self.capacity:]
+            skipped, n = n - self.capacity, self.capacity
+        else:
+            skipped = 0
+        with self._lock:
+            start = self.count + skipped
+            slots = (start + np.arange(n)) % self.capacity
+            self.t[slots] = timestamps
+            self.channel[slots] = channel
+            self.value[slots] = values
+            self.count = start + n
+
+    def snapshot(self, source):
+        """Gebeurtenissen in opnamevolgorde als TIMELINE records"""
+        with self._lock:
+            count = self.count
+            n = min(count, self.capacity)
+            order = np.arange(count - n, count) % self.capacity
+            events = np.empty(n, dtype=TIMELINE)
+            events["t"] = self.t[order]
+            events["channel"] = self.channel[order]
+            events["value"] = self.value[order]
+        events["source"] = source
+        return events
+
+    @property
+    def dropped(self):
+        return max(self.count - self.capacity, 0)
+
+
+class EventJournal:
+    """Tijdlijn van stimulus en respons op één monotonic klok"""
+
+    def __init__(self, dac_capacity=65536, relay_capacity=16384, adc_capacity=2**20):
+        """
+        Args:
+            dac_capacity: Aantal DAC writes in de ringbuffer
+            relay_capacity: Aantal relay flanken
+            adc_capacity: Aantal ADC samples (2**20 = 20 minuten op 860 SPS)
+        """
+        self.rings = {DAC: _EventRing(dac_capacity),
+                      RELAY: _EventRing(relay_capacity),
+                      ADC: _EventRing(adc_capacity)}
+        self._dac = self.rings[DAC]
+        self._relay = self.rings[RELAY]
+        self._adc_ring = self.rings[ADC]
+        self.dac = None
+        self.relay = None
+        self.adc = None
+
+    # Opname (aangeroepen vanuit de controllers)
+
+    def dac_write(self, name, code, t):
+        """
+        Registreer een DAC write
+
+        Args:
+            name: Kanaal letter ('a'-'d')
+            code: Geschreven code (0-4095)
+            t: time.monotonic() na de transactie
+        """
+        self._dac.record(t, _DAC_CHANNELS[name], code)
+
+    def relay_edge(self, state, t):
+        """
+        Registreer een relay flank
+
+        Args:
+            state: Nieuwe toestand (True = AAN)
+            t: time.monotonic() direct na de GPIO write
+        """
+        self._relay.record(t, 0, 1 if state else 0)
+
+    def _on_block(self, channel, timestamps, raw):
+        """Block listener van de ADCController"""
+        self._adc_ring.record_block(timestamps, channel, raw)
+
+    # Koppelen
+
+    def attach(self, dac=None, relay=None, adc=None):
+        """
+        Begin met opnemen van de opgegeven controllers
+
+        Args:
+            dac: DACController (writes)
+            relay: RelayController (flanken)
+            adc: ADCController (samples van stream, scan en capture_block)
+        """
+        if dac is not None:
+            self.dac = dac
+            dac.journal = self
+        if relay is not None:
+            self.relay = relay
+            relay.journal = self
+        if adc is not None:
+            self.adc = adc
+            adc.add_block_listener(self._on_block)
+
+    def detach(self):
+        """Stop met opnemen (de opgenomen gebeurtenissen blijven bewaard)"""
+        if self.dac is not None and self.dac.journal is self:
+            self.dac.journal = None
+        if self.relay is not None and self.relay.journal is self:
+            self.relay.journal = None
+        if self.adc is not None:
+            self.adc.remove_block_listener(self._on_block)
+        self.dac = self.relay = self.adc = None
+
+    def clear(self):
+        """Wis alle opgenomen gebeurtenissen"""
+        for ring in self.rings.values():
+            ring.clear()
+
+    # Export
+
+    def counts(self):
+        """
+        Aantal opgenomen en overschreven gebeurtenissen per bron
+
+        Returns:
+            Dict bron naam -> (opgenomen, overschreven)
+        """
+        return {SOURCE_NAMES[source]: (ring.count, ring.dropped)
+                for source, ring in self.rings.items()}
+
+    def timeline(self, t_start=None, t_end=None, sources=(DAC, RELAY, ADC)):
+        """
+        Samengevoegde tijdlijn
+
+        Args:
+            t_start: Begin (monotonic tijd, None = alles)
+            t_end: Einde (None = alles)
+            sources: Bronnen om op te nemen
+
+        Returns:
+            TIMELINE structured array, gesorteerd op tijd
+        """
+        events = np.concatenate([self.rings[source].snapshot(source) for source in sources])
+        events = events[np.argsort(events["t"], kind="stable")]
+        if t_start is not None:
+            events = events[np.searchsorted(events["t"], t_start):]
+        if t_end is not None:
+            events = events[:np.searchsorted(events["t"], t_end)]
+        return events
+
+    def export(self, path, t_start=None, t_end=None):
+        """
+        Schrijf de tijdlijn naar een bestand
+
+        Args:
+            path: .npy (structured array) of anders CSV
+            t_start: Begin (None = alles)
+            t_end: Einde (None = alles)
+
+        Returns:
+            Aantal geschreven gebeurtenissen
+        """
+        events = self.timeline(t_start, t_end)
+        if path.endswith(".npy"):
+            np.save(path, events)
+        else:
+            names = np.array([SOURCE_NAMES[s] for s in sorted(SOURCE_NAMES)])
+            with open(path, "w") as f:
+                f.write("t,source,channel,value\n")
+                for t, source, channel, value in zip(events["t"], names[events["source"]],
+                                                     events["channel"], events["value"]):
+                    f.write(f"{t:.6f},{source},{channel},{value}\n")
+        return len(events)
+
+
+def response_latencies(timeline, stimulus, adc_channel, threshold, rising=True,
+                       stimulus_channel=None, stimulus_value=None, timeout=1.0):
+    """
+    Tijd van elke stimulus tot de eerste drempel passage op een ADC kanaal
+
+    Args:
+        timeline: TIMELINE array (EventJournal.timeline)
+        stimulus: Bron van de stimulus (DAC of RELAY)
+        adc_channel: ADC kanaal waarop de respons gemeten wordt
+        threshold: Drempel in ruwe ADC codes
+        rising: True = passage van onder naar boven, False = omgekeerd
+        stimulus_channel: Alleen stimuli op dit kanaal (None = alle)
+        stimulus_value: Alleen stimuli met deze waarde (bijv. 1 = relay AAN)
+        timeout: Maximale latency; stimuli zonder respons krijgen NaN
+
+    Returns:
+        Tuple (stimulus tijden, latencies in seconden)
+    """
+    stim = timeline[timeline["source"] == stimulus]
+    if stimulus_channel is not None:
+        stim = stim[stim["channel"] == stimulus_channel]
+    if stimulus_value is not None:
+        stim = stim[stim["value"] == stimulus_value]
+
+    samples = timeline[(timeline["source"] == ADC) & (timeline["channel"] == adc_channel)]
+    above = samples["value"] >= threshold
+    if rising:
+        crossing = ~above[:-1] & above[1:]
+    else:
+        crossing = above[:-1] & ~above[1:]
+    crossing_t = samples["t"][1:][crossing]
+
+    latencies = np.full(len(stim), np.nan)
+    if len(crossing_t):
+        after = np.searchsorted(crossing_t, stim["t"])
+        found = after < len(crossing_t)
+        latencies[found] = crossing_t[after[found]] - stim["t"][found]
+        latencies[latencies > timeout] = np.nan
+    return stim["t"], latencies
+
+
+# Test functie
+if __name__ == "__main__":
+    import time
+    import os
+    import tempfile
+
+    print("Event Journal Test")
+    print("=" * 50)
+
+    journal = EventJournal()
+
+    # Gesimuleerd: relay flank, respons 3 ms later op ADC kanaal 0
+    start = time.monotonic()
+    for pulse in range(5):
+        edge = start + pulse * 0.1
+        journal.relay_edge(True, edge)
+        journal.dac_write("a", 1000 + pulse, edge + 0.001)
+        timestamps = edge + np.arange(64) / 860.0
+        raw = np.where(timestamps >= edge + 0.003, 20000, 100).astype(np.int16)
+        journal._on_block(0, timestamps, raw)
+
+    timeline = journal.timeline()
+    t, latency = response_latencies(timeline, RELAY, adc_channel=0, threshold=10000)
+    print(f"  Tijdlijn: {len(timeline)} gebeurtenissen, {journal.counts()}")
+    print(f"  Latency relay -> CH0: {np.round(latency * 1000, 2)} ms")
+
+    path = os.path.join(tempfile.mkdtemp(), "timeline.csv")
+    print(f"  Export: {journal.export(path)} regels naar {path}")
+
+    print("\n✓ Test voltooid")
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Frequency Response (Bode) Sweep
+Meet gain en fase van het signaalpad via de DAC stimulus en ADC opname
+
+Een sinus stimulus loopt continu in een aparte thread op de voltage of
+current output; bij elke frequentie wordt alleen de frequentie gewijzigd
+(fase-continu), zodat er geen dode tijd tussen meetpunten ontstaat. De ADC
+neemt per frequentie een geheel aantal periodes op. Stimulus (gelogde DAC
+setpoints) en responsie (ADC samples) worden per blok van hele periodes
+omgezet naar een fasor met een single-bin DFT (Goertzel), gevectoriseerd
+over alle blokken.
+
+De DAC houdt elk setpoint vast tot de volgende write (zero-order hold).
+De fasor van de gelogde setpoints wordt daarom vermenigvuldigd met de
+ZOH respons sinc(f/fs) * exp(-j*pi*f/fs); anders zit bij f = fs/4 een
+fout van -45 graden en -0.9 dB in het resultaat.
+"""
+
+import math
+import time
+import threading
+import numpy as np
+from calibration import measurement_setup
+
+
+def tone_phasors(t, x, frequency, n_blocks):
+    """
+    Bereken de fasor van een toon per blok (single-bin DFT / Goertzel)
+
+    De tijdstempels mogen niet-uniform zijn; de DFT gebruikt de werkelijke
+    sample tijden. Elk blok wordt eerst van zijn gemiddelde ontdaan.
+
+    Args:
+        t: Sample tijden (s), numpy array
+        x: Sample waarden, numpy array
+        frequency: Toon frequentie in Hz
+        n_blocks: Aantal gelijke blokken waarin de data verdeeld wordt
+
+    Returns:
+        Complexe numpy array met n_blocks fasoren (amplitude en fase
+        van de toon op de absolute tijdbasis)
+    """
+    n = (len(x) // n_blocks) * n_blocks
+    t = t[:n].reshape(n_blocks, -1)
+    x = x[:n].reshape(n_blocks, -1)
+    x = x - x.mean(axis=1, keepdims=True)
+
+    # Trapezium gewichten compenseren voor ongelijke sample afstanden
+    dt = np.diff(t, axis=1)
+    weights = np.zeros_like(t)
+    weights[:, :-1] += dt / 2.0
+    weights[:, 1:] += dt / 2.0
+
+    kernel = np.exp(-2j * np.pi * frequency * t)
+    return 2.0 * np.sum(x * kernel * weights, axis=1) / np.sum(weights, axis=1)
+
+
+def zoh_response(frequency, update_rate):
+    """
+    Frequentie respons van een zero-order hold
+
+    Args:
+        frequency: Frequentie in Hz
+        update_rate: Update rate van de hold in Hz
+
+    Returns:
+        Complexe gain: sinc(f/fs) * exp(-j*pi*f/fs)
+    """
+    ratio = frequency / update_rate
+    return np.sinc(ratio) * np.exp(-1j * np.pi * ratio)
+
+
+class _SineStimulus(threading.Thread):
+    """Fase-continue sinus stimulus met log van alle DAC writes"""
+
+    def __init__(self, setter, offset, amplitude, update_rate, max_writes):
+        """
+        Args:
+            setter: DAC setter (set_voltage_output of set_current_output)
+            offset: DC niveau (V of mA)
+            amplitude: Piek amplitude (V of mA)
+            update_rate: DAC update rate in Hz
+            max_writes: Grootte van de write log
+        """
+        super().__init__(daemon=True)
+        self.setter = setter
+        self.offset = offset
+        self.amplitude = amplitude
+        self.interval = 1.0 / update_rate
+        self.frequency = 0.0
+        self.running = False
+
+        # Voorgealloceerde log van (tijdstip, setpoint) per write
+        self.times = np.zeros(max_writes)
+        self.values = np.zeros(max_writes)
+        self.count = 0
+
+    def run(self):
+        phase = 0.0
+        last_time = time.monotonic()
+        next_time = last_time
+        self.running = True
+
+        while self.running and self.count < len(self.times):
+            now = time.monotonic()
+            phase = (phase + 2 * math.pi * self.frequency * (now - last_time)) % (2 * math.pi)
+            last_time = now
+
+            value = self.offset + self.amplitude * math.sin(phase)
+            before = time.monotonic()
+            self.setter(value)
+            self.times[self.count] = (before + time.monotonic()) / 2.0
+            self.values[self.count] = value
+            self.count += 1
+
+            next_time += self.interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.monotonic()
+
+    def stop(self):
+        self.running = False
+        self.join(timeout=1.0)
+
+
+class FrequencyResponseAnalyzer:
+    """Bode sweep via DAC stimulus en ADC opname"""
+
+    def __init__(self, dac, adc, data_rate=None, update_rate=200,
+                 settle_cycles=2, measure_cycles=4, min_measure_time=0.25):
+        """
+        Initialiseer frequency response analyzer
+
+        Args:
+            dac: DACController instantie
+            adc: ADCController instantie
+            data_rate: ADC data rate (default: maximale data rate)
+            update_rate: DAC update rate van de stimulus in Hz
+            settle_cycles: Periodes wachten na een frequentiewissel
+            measure_cycles: Minimaal aantal gemeten periodes per frequentie
+            min_measure_time: Minimale meettijd per frequentie in seconden
+        """
+        self.dac = dac
+        self.adc = adc
+        self.data_rate = data_rate or adc.MAX_DATA_RATE
+        self.update_rate = update_rate
+        self.settle_cycles = settle_cycles
+        self.measure_cycles = measure_cycles
+        self.min_measure_time = min_measure_time
+
+    def max_frequency(self):
+        """Hoogste meetbare frequentie (4 punten per periode voor DAC en ADC)"""
+        return min(self.update_rate, self.data_rate) / 4.0
+
+    def _cycles(self, frequency):
+        """Aantal gemeten periodes voor een frequentie"""
+        return max(self.measure_cycles,
+                   int(math.ceil(self.min_measure_time * frequency)))
+
+    def sweep(self, output, frequencies, offset, amplitude):
+        """
+        Voer een frequentie sweep uit
+
+        Args:
+            output: 'voltage' of 'current'
+            frequencies: Lijst met frequenties in Hz
+            offset: DC niveau van de stimulus (V of mA)
+            amplitude: Piek amplitude van de stimulus (V of mA)
+
+        Returns:
+            dict met numpy arrays: 'frequency', 'gain', 'gain_db',
+            'phase' (graden) en 'gain_spread' (relatieve spreiding
+            tussen blokken, maat voor de meetkwaliteit)
+        """
+        frequencies = np.asarray(frequencies, dtype=np.float64)
+        if np.any(frequencies <= 0) or np.any(frequencies > self.max_frequency()):
+            raise ValueError(f"Frequenties moeten tussen 0 en "
+                             f"{self.max_frequency():.1f}Hz liggen")
+
+        setter, adc_channel, scale = measurement_setup(self.dac, output)
+
+        # Totale sweep duur bepaalt de grootte van de write log
+        total_time = sum((self.settle_cycles + self._cycles(f) + 1) / f
+                         for f in frequencies)
+        stimulus = _SineStimulus(setter, offset, amplitude, self.update_rate,
+                                 int(total_time * self.update_rate * 1.5) + 100)
+
+        gain = np.empty(len(frequencies))
+        phase = np.empty(len(frequencies))
+        spread = np.empty(len(frequencies))
+
+        stimulus.start()
+        try:
+            for i, frequency in enumerate(frequencies):
+                stimulus.frequency = frequency
+                time.sleep(self.settle_cycles / frequency)
+
+                cycles = self._cycles(frequency)
+                duration = cycles / frequency
+                n_samples = int(math.ceil(duration * self.data_rate))
+                timestamps, raw = self.adc.capture_block(adc_channel, n_samples,
+                                                         data_rate=self.data_rate)
+                response = self.adc.raw_to_voltage(raw.astype(np.float64), adc_channel) * scale
+
+                # Maximaal 8 blokken van elk een geheel aantal periodes
+                per_block = int(math.ceil(cycles / 8.0))
+                n_blocks = cycles // per_block
+                end_time = timestamps[0] + n_blocks * per_block / frequency
+                used = timestamps < end_time
+
+                # Stimulus writes binnen hetzelfde tijdvenster
+                count = stimulus.count
+                window = ((stimulus.times[:count] >= timestamps[0]) &
+                          (stimulus.times[:count] < end_time))
+
+                write_times = stimulus.times[:count][window]
+                x = tone_phasors(write_times, stimulus.values[:count][window],
+                                 frequency, n_blocks)
+                # Werkelijke update rate (writes kunnen achterlopen op update_rate)
+                if len(write_times) > 1:
+                    update_rate = (len(write_times) - 1) / (write_times[-1] - write_times[0])
+                else:
+                    update_rate = self.update_rate
+                x = x * zoh_response(frequency, update_rate)
+                y = tone_phasors(timestamps[used], response[used], frequency, n_blocks)
+
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    h = y / x
+                h_mean = np.mean(h)
+                gain[i] = np.abs(h_mean)
+                phase[i] = np.degrees(np.angle(h_mean))
+                spread[i] = np.std(np.abs(h)) / gain[i] if gain[i] else np.nan
+        finally:
+            stimulus.stop()
+            setter(offset)
+
+        with np.errstate(divide="ignore"):
+            gain_db = 20.0 * np.log10(gain)
+
+        return {
+            "frequency": frequencies,
+            "gain": gain,
+            "gain_db": gain_db,
+            "phase": phase,
+            "gain_spread": spread,
+        }
+
+
+# Test functie
+if __name__ == "__main__":
+    from dac_controller import DACController
+    from adc_controller import ADCController
+
+    print("Frequency Response Sweep")
+    print("=" * 50)
+
+    dac = DACController()
+    adc = ADCController()
+    analyzer = FrequencyResponseAnalyzer(dac, adc)
+
+    frequencies = np.geomspace(0.5, analyzer.max_frequency(), 12)
+    print(f"\nVoltage output, 1.65V +/- 1.0V, {len(frequencies)} punten")
+    print("-" * 50)
+
+    start = time.time()
+    result = analyzer.sweep("voltage", frequencies, 1.65, 1.0)
+    for f, g, p in zip(result["frequency"], result["gain_db"], result["phase"]):
+        print(f"  {f:7.2f}Hz  {g:7.2f}dB  {p:7.1f}°")
+    print(f"\nSweep duur: {time.time() - start:.1f}s")
+
+    dac.reset_all()
+    print("\n✓ Test voltooid")
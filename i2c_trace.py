@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+I2C Trace
+Opname van alle I2C transacties en analyse van de bus bezetting
+
+De tracer is opt-in: de I2CTransport registreert elke transactie poging
+alleen als er een tracer actief is. Een transactie wordt opgeslagen in een
+ringbuffer van voorgealloceerde numpy arrays (device adres, richting,
+aantal bytes, start/eind tijd, aanroepende thread en resultaat).
+
+De analyse berekent per device en per thread het aantal transacties,
+de doorvoer, de bezetting van de bus en de wachttijd (gemeten duur minus
+de theoretische tijd op de draad), en voorspelt de maximale DAC update
+rate die de bus met het huidige verkeer nog aankan.
+
+Gebruik:
+    tracer = dac.transport.start_trace()
+    ... (outputs en ADC laten lopen)
+    report = analyze(tracer.snapshot())
+    print_report(report)
+"""
+
+import itertools
+import threading
+import numpy as np
+
+
+# Richting van een transactie
+WRITE = 0
+READ = 1
+WRITE_READ = 2  # Register pointer schrijven + lezen (repeated start)
+
+DIRECTION_NAMES = {WRITE: "write", READ: "read", WRITE_READ: "write+read"}
+
+
+class I2CTracer:
+    """Ringbuffer met I2C transacties"""
+
+    def __init__(self, capacity=65536):
+        """
+        Args:
+            capacity: Aantal transacties in de ringbuffer
+        """
+        self.capacity = capacity
+        self.start = np.zeros(capacity)
+        self.end = np.zeros(capacity)
+        self.device = np.zeros(capacity, dtype=np.uint8)
+        self.direction = np.zeros(capacity, dtype=np.uint8)
+        self.nbytes = np.zeros(capacity, dtype=np.uint16)
+        self.caller = np.zeros(capacity, dtype=np.uint16)
+        self.ok = np.zeros(capacity, dtype=bool)
+
+        self.callers = []       # Thread naam per caller id
+        self._caller_ids = {}
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Wis de opgenomen transacties"""
+        self._counter = itertools.count()  # Atomair in CPython
+        self.count = 0
+
+    def _caller_id(self):
+        """Compact id van de aanroepende thread"""
+        name = threading.current_thread().name
+        caller = self._caller_ids.get(name)
+        if caller is None:
+            with self._lock:
+                caller = self._caller_ids.setdefault(name, len(self.callers))
+                if caller == len(self.callers):
+                    self.callers.append(name)
+        return caller
+
+    def record(self, info, start, end, ok):
+        """
+        Registreer een transactie poging
+
+        Args:
+            info: Tuple (device adres, richting, bytes) of None
+            start: time.monotonic() voor de transactie
+            end: time.monotonic() na de transactie
+            ok: True als de transactie gelukt is
+        """
+        i = next(self._counter)
+        slot = i % self.capacity
+        if info is not None:
+            self.device[slot], self.direction[slot], self.nbytes[slot] = info
+        else:
+            self.device[slot] = 0
+            self.direction[slot] = WRITE
+            self.nbytes[slot] = 0
+        self.start[slot] = start
+        self.end[slot] = end
+        self.caller[slot] = self._caller_id()
+        self.ok[slot] = ok
+        self.count = i + 1
+
+    def snapshot(self):
+        """
+        Kopie van de opgenomen transacties in chronologische volgorde
+
+        Returns:
+            dict met numpy arrays (start, end, device, direction, nbytes,
+            caller, ok) en de lijst met thread namen
+        """
+        count = self.count
+        n = min(count, self.capacity)
+        order = (np.arange(count - n, count) % self.capacity)
+        data = {name: getattr(self, name)[order].copy() for name in
+                ("start", "end", "device", "direction", "nbytes", "caller", "ok")}
+        sort = np.argsort(data["start"], kind="stable")
+        data = {name: values[sort] for name, values in data.items()}
+        data["callers"] = list(self.callers)
+        data["dropped"] = count - n
+        return data
+
+
+def wire_time(direction, nbytes, bus_clock=100000):
+    """
+    Theoretische tijd van een transactie op de bus
+
+    Per byte 9 klokken (8 data + ACK), plus het adres byte en start/stop.
+    Bij write+read komen een repeated start en een tweede adres byte erbij.
+
+    Args:
+        direction: numpy array met richtingen
+        nbytes: numpy array met payload bytes
+        bus_clock: SCL frequentie in Hz
+
+    Returns:
+        numpy array met tijden in seconden
+    """
+    bits = (nbytes.astype(np.float64) + 1) * 9 + 2
+    bits = np.where(direction == WRITE_READ, bits + 9 + 1, bits)
+    return bits / bus_clock
+
+
+def _union_length(start, end):
+    """Totale lengte van de vereniging van (gesorteerde) intervallen"""
+    if len(start) == 0:
+        return 0.0
+    running_end = np.maximum.accumulate(end)
+    # Een nieuw interval begint na het einde van alle voorgaande
+    gaps = np.maximum(start[1:] - running_end[:-1], 0.0)
+    return float(running_end[-1] - start[0] - gaps.sum())
+
+
+def analyze(trace, bus_clock=100000, dac_address=0x60, writes_per_update=3):
+    """
+    Analyseer een trace
+
+    Args:
+        trace: Resultaat van I2CTracer.snapshot()
+        bus_clock: SCL frequentie in Hz
+        dac_address: I2C adres van de DAC
+        writes_per_update: DAC writes per update cyclus van alle output
+                           loops samen (spanning 1 + stroom 2)
+
+    Returns:
+        dict met window, bus bezetting, headroom, per device en per thread
+        statistiek en de voorspelde maximale DAC update rate
+    """
+    start = trace["start"]
+    end = trace["end"]
+    if len(start) == 0:
+        return {"window": 0.0, "transactions": 0}
+
+    window = float(end.max() - start[0])
+    duration = end - start
+    wire = wire_time(trace["direction"], trace["nbytes"], bus_clock)
+    queueing = np.maximum(duration - wire, 0.0)
+
+    busy = _union_length(start, end)
+    report = {
+        "window": window,
+        "transactions": len(start),
+        "dropped": trace["dropped"],
+        "errors": int(np.count_nonzero(~trace["ok"])),
+        "occupancy": busy / window if window else 0.0,
+        "wire_occupancy": float(wire.sum()) / window if window else 0.0,
+        "headroom": 1.0 - busy / window if window else 1.0,
+        "queueing_mean": float(queueing.mean()),
+        "queueing_p99": float(np.percentile(queueing, 99)),
+        "devices": {},
+        "callers": {},
+    }
+
+    for address in np.unique(trace["device"]):
+        mask = trace["device"] == address
+        report["devices"][int(address)] = {
+            "transactions": int(mask.sum()),
+            "rate": mask.sum() / window if window else 0.0,
+            "throughput": float(trace["nbytes"][mask].sum()) / window if window else 0.0,
+            "occupancy": _union_length(start[mask], end[mask]) / window if window else 0.0,
+            "duration_mean": float(duration[mask].mean()),
+            "queueing_mean": float(queueing[mask].mean()),
+        }
+
+    for caller in np.unique(trace["caller"]):
+        mask = trace["caller"] == caller
+        report["callers"][trace["callers"][caller]] = {
+            "transactions": int(mask.sum()),
+            "rate": mask.sum() / window if window else 0.0,
+            "occupancy": _union_length(start[mask], end[mask]) / window if window else 0.0,
+            "duration_max": float(duration[mask].max()),
+        }
+
+    # Maximale DAC rate: de bus tijd die het overige verkeer vrijlaat,
+    # gedeeld door de gemeten duur van een DAC write
+    dac = report["devices"].get(dac_address)
+    if dac:
+        other = trace["device"] != dac_address
+        other_occupancy = _union_length(start[other], end[other]) / window if window else 0.0
+        max_write_rate = (1.0 - other_occupancy) / dac["duration_mean"]
+        report["max_dac_write_rate"] = max_write_rate
+        report["max_dac_update_rate"] = max_write_rate / writes_per_update
+
+    return report
+
+
+def print_report(report):
+    """Print een analyse rapport"""
+    if not report.get("transactions"):
+        print("Geen I2C transacties opgenomen")
+        return
+
+    print(f"Venster:    {report['window']:.2f}s, {report['transactions']} transacties "
+          f"({report['errors']} fouten, {report['dropped']} overschreven)")
+    print(f"Bezetting:  {report['occupancy'] * 100:.1f}% (op de draad "
+          f"{report['wire_occupancy'] * 100:.1f}%), headroom "
+          f"{report['headroom'] * 100:.1f}%")
+    print(f"Wachttijd:  gemiddeld {report['queueing_mean'] * 1e3:.3f}ms, "
+          f"p99 {report['queueing_p99'] * 1e3:.3f}ms")
+
+    print("\nPer device:")
+    for address, stats in report["devices"].items():
+        print(f"  0x{address:02X}: {stats['rate']:7.1f} tr/s  {stats['throughput']:8.1f} B/s  "
+              f"bezetting {stats['occupancy'] * 100:5.1f}%  "
+              f"duur {stats['duration_mean'] * 1e3:.3f}ms")
+
+    print("\nPer thread:")
+    for name, stats in report["callers"].items():
+        print(f"  {name:30s} {stats['rate']:7.1f} tr/s  "
+              f"bezetting {stats['occupancy'] * 100:5.1f}%  "
+              f"max {stats['duration_max'] * 1e3:.3f}ms")
+
+    if "max_dac_update_rate" in report:
+        print(f"\nMax DAC write rate:  {report['max_dac_write_rate']:.0f}/s")
+        print(f"Max DAC update rate: {report['max_dac_update_rate']:.0f}Hz")
+
+
+# Test functie
+if __name__ == "__main__":
+    import time
+    from i2c_transport import I2CTransport
+
+    print("I2C Trace Test")
+    print("=" * 50)
+
+    transport = I2CTransport(bus=2)
+    tracer = transport.start_trace()
+
+    # Gesimuleerd verkeer: DAC writes op 100Hz en ADC reads op 200Hz
+    def transfer(seconds):
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            pass
+
+    def dac_loop():
+        for _ in range(50):
+            transport.execute(transfer, 0.0004, trace=(0x60, WRITE, 3))
+            time.sleep(0.01)
+
+    def adc_loop():
+        for _ in range(100):
+            transport.execute(transfer, 0.0006, trace=(0x48, WRITE_READ, 3))
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=dac_loop, name="voltage_loop"),
+               threading.Thread(target=adc_loop, name="adc_scan")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    transport.stop_trace()
+
+    print_report(analyze(tracer.snapshot(), writes_per_update=1))
+    print("\n✓ Test voltooid")
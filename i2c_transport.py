@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+I2C Transport
+Fouttolerante transactie laag voor de I2C bus (retries, circuit breaker, bus recovery)
+
+Alle DAC en ADC transacties op een bus lopen via één gedeelde transport
+instantie. Een mislukte transactie wordt een beperkt aantal keer herhaald
+met exponentiële backoff, binnen het tijdsbudget van de aanroeper (een
+output loop mag nooit langer blokkeren dan zijn tick). Na een reeks
+definitief mislukte transacties opent de circuit breaker: aanroepen falen
+dan direct terwijl een achtergrond thread de bus herstelt (SCL klokken tot
+SDA vrij is, STOP conditie, devices opnieuw initialiseren).
+
+Fouten worden geteld en hooguit één keer per report_interval geprint,
+zodat een storing tijdens een 100Hz golfvorm geen stroom aan meldingen geeft.
+
+Met start_trace() wordt elke transactie poging opgenomen in een I2CTracer
+(zie i2c_trace.py) voor analyse van de bus bezetting.
+"""
+
+import time
+import threading
+import subprocess
+from i2c_trace import I2CTracer
+try:
+    import Adafruit_BBIO.GPIO as GPIO
+except ImportError:
+    GPIO = None
+
+
+class I2CError(Exception):
+    """I2C transactie definitief mislukt (na retries of met open breaker)"""
+
+
+class I2CTransport:
+    """Transactie laag met retries, backoff en circuit breaker voor één bus"""
+
+    # Circuit breaker toestanden
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    # SCL/SDA pinnen per bus (BeagleBone Black)
+    BUS_PINS = {1: ("P9_17", "P9_18"), 2: ("P9_19", "P9_20")}
+
+    def __init__(self, bus=2, retries=3, backoff=0.0005, max_backoff=0.004,
+                 breaker_threshold=8, breaker_timeout=1.0, report_interval=1.0):
+        """
+        Initialiseer transport
+
+        Args:
+            bus: I2C bus nummer
+            retries: Maximaal aantal herhalingen per transactie
+            backoff: Eerste wachttijd voor een herhaling in seconden
+            max_backoff: Maximale wachttijd tussen herhalingen
+            breaker_threshold: Aantal opeenvolgende mislukte transacties
+                               waarna de breaker opent
+            breaker_timeout: Minimale tijd dat de breaker open blijft
+            report_interval: Minimale tijd tussen twee foutmeldingen
+        """
+        self.bus = bus
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_timeout = breaker_timeout
+        self.report_interval = report_interval
+
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._recovering = False
+        self._pins_released = True  # False zolang SCL/SDA als GPIO geklokt worden
+        self._reinit_callbacks = []
+
+        self._last_report = 0.0
+        self._suppressed = 0
+        self.tracer = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zet de fout tellers op nul"""
+        self.transactions = 0   # Geslaagde transacties
+        self.errors = 0         # Mislukte pogingen (inclusief herhalingen)
+        self.retries_used = 0   # Uitgevoerde herhalingen
+        self.failures = 0       # Definitief mislukte transacties
+        self.fast_fails = 0     # Geweigerd door de open breaker
+        self.breaker_trips = 0
+        self.recoveries = 0
+
+    def add_reinit(self, callback):
+        """
+        Registreer een functie die na een bus recovery de devices opnieuw
+        initialiseert
+
+        Args:
+            callback: Functie zonder argumenten
+        """
+        if callback not in self._reinit_callbacks:
+            self._reinit_callbacks.append(callback)
+
+    def start_trace(self, capacity=65536):
+        """
+        Start het opnemen van transacties
+
+        Args:
+            capacity: Aantal transacties in de ringbuffer
+
+        Returns:
+            I2CTracer
+        """
+        self.tracer = I2CTracer(capacity)
+        return self.tracer
+
+    def stop_trace(self):
+        """
+        Stop het opnemen van transacties
+
+        Returns:
+            De I2CTracer met de opgenomen transacties (of None)
+        """
+        tracer, self.tracer = self.tracer, None
+        return tracer
+
+    def execute(self, function, *args, budget=None, trace=None, force=False):
+        """
+        Voer een I2C transactie uit met retries
+
+        Args:
+            function: Functie die de transactie uitvoert
+            *args: Argumenten voor de functie
+            budget: Maximale totale duur in seconden (None = alleen het
+                    aantal retries begrenst de duur)
+            trace: Tuple (device adres, richting, bytes) voor de tracer
+            force: Ook proberen als de breaker open is (safe-state writes
+                   en de herinitialisatie na een recovery); alleen niet
+                   terwijl de pinnen voor de recovery als GPIO draaien
+
+        Returns:
+            Resultaat van de functie
+
+        Raises:
+            I2CError: Als de transactie niet gelukt is
+        """
+        if force and not self._pins_released:
+            self.fast_fails += 1
+            raise I2CError(f"I2C bus {self.bus} niet beschikbaar (recovery bezig)")
+        if self.state != self.CLOSED and not force and not self._allow_attempt():
+            self.fast_fails += 1
+            raise I2CError(f"I2C bus {self.bus} niet beschikbaar (breaker open)")
+
+        start = time.monotonic()
+        delay = self.backoff
+        attempt = 0
+        while True:
+            tracer = self.tracer
+            if tracer is not None:
+                t0 = time.monotonic()
+            try:
+                result = function(*args)
+            except OSError as e:
+                if tracer is not None:
+                    tracer.record(trace, t0, time.monotonic(), False)
+                self.errors += 1
+                attempt += 1
+                out_of_budget = (budget is not None and
+                                 time.monotonic() + delay - start > budget)
+                if attempt > self.retries or out_of_budget or self.state != self.CLOSED:
+                    self._failure()
+                    raise I2CError(f"I2C bus {self.bus}: {e}") from e
+                self.retries_used += 1
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+                continue
+
+            if tracer is not None:
+                tracer.record(trace, t0, time.monotonic(), True)
+            self.transactions += 1
+            if self._consecutive_failures or self.state != self.CLOSED:
+                self._success()
+            return result
+
+    def _allow_attempt(self):
+        """Breaker is niet gesloten: laat één proef transactie toe na de timeout"""
+        with self._lock:
+            if self.state == self.OPEN and not self._recovering and \
+                    time.monotonic() - self._opened_at >= self.breaker_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def _success(self):
+        """Transactie gelukt: sluit de breaker"""
+        with self._lock:
+            self._consecutive_failures = 0
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                print(f"✓ I2C bus {self.bus} hersteld")
+
+    def _failure(self):
+        """Transactie definitief mislukt: open de breaker bij te veel fouten"""
+        self.failures += 1
+        with self._lock:
+            self._consecutive_failures += 1
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and
+                    self._consecutive_failures >= self.breaker_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.breaker_trips += 1
+                start_recovery = not self._recovering
+                self._recovering = True
+            else:
+                return
+
+        print(f"⚠ I2C bus {self.bus}: {self._consecutive_failures} fouten op rij, "
+              f"breaker open - bus recovery gestart")
+        if start_recovery:
+            threading.Thread(target=self._recover_loop, daemon=True).start()
+
+    def _recover_loop(self):
+        """Thread functie: herstel de bus en initialiseer de devices opnieuw"""
+        try:
+            self._pins_released = False
+            try:
+                self.recover_bus()
+            finally:
+                self._pins_released = True
+            for callback in self._reinit_callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"✗ Fout bij herinitialiseren na bus recovery: {e}")
+            self.recoveries += 1
+        finally:
+            with self._lock:
+                self._recovering = False
+
+    def recover_bus(self):
+        """
+        Maak een vastgelopen bus vrij
+
+        Een slave die midden in een byte bleef hangen houdt SDA laag. De
+        pinnen worden tijdelijk als GPIO geconfigureerd; SCL wordt
+        geklokt (maximaal 9 pulsen) tot SDA vrij is, gevolgd door een
+        STOP conditie. Daarna krijgen de pinnen hun I2C functie terug.
+
+        Returns:
+            True als SDA na de recovery vrij is
+        """
+        if not GPIO or self.bus not in self.BUS_PINS:
+            print(f"[TEST] I2C bus {self.bus} recovery zou uitgevoerd worden")
+            return True
+
+        scl, sda = self.BUS_PINS[self.bus]
+        half_period = 0.000005  # 100kHz
+        released = False
+        try:
+            for pin in (scl, sda):
+                subprocess.run(["config-pin", pin, "gpio"], check=True,
+                               capture_output=True, timeout=2)
+            GPIO.setup(sda, GPIO.IN)
+            GPIO.setup(scl, GPIO.OUT)
+            GPIO.output(scl, GPIO.HIGH)
+
+            for _ in range(9):
+                if GPIO.input(sda):
+                    break
+                GPIO.output(scl, GPIO.LOW)
+                time.sleep(half_period)
+                GPIO.output(scl, GPIO.HIGH)
+                time.sleep(half_period)
+
+            # STOP conditie: SDA laag -> hoog terwijl SCL hoog is
+            GPIO.setup(sda, GPIO.OUT)
+            GPIO.output(scl, GPIO.LOW)
+            GPIO.output(sda, GPIO.LOW)
+            time.sleep(half_period)
+            GPIO.output(scl, GPIO.HIGH)
+            time.sleep(half_period)
+            GPIO.output(sda, GPIO.HIGH)
+            time.sleep(half_period)
+            GPIO.setup(sda, GPIO.IN)
+            released = bool(GPIO.input(sda))
+
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"✗ Fout bij I2C bus recovery: {e}")
+        finally:
+            for pin in (scl, sda):
+                try:
+                    subprocess.run(["config-pin", pin, "i2c"], check=True,
+                                   capture_output=True, timeout=2)
+                except (OSError, subprocess.SubprocessError) as e:
+                    print(f"✗ Fout bij herstellen pinmux {pin}: {e}")
+
+        print(f"{'✓' if released else '✗'} I2C bus {self.bus} recovery: "
+              f"SDA {'vrij' if released else 'nog laag'}")
+        return released
+
+    def log_error(self, context, error):
+        """
+        Meld een fout, hooguit één keer per report_interval
+
+        Args:
+            context: Omschrijving van de actie (bijv. 'instellen voltage')
+            error: De opgetreden exception
+        """
+        now = time.monotonic()
+        if now - self._last_report < self.report_interval:
+            self._suppressed += 1
+            return
+        suffix = f" (+{self._suppressed} onderdrukt)" if self._suppressed else ""
+        print(f"✗ Fout bij {context}: {error}{suffix}")
+        self._last_report = now
+        self._suppressed = 0
+
+    def stats(self):
+        """
+        Fout tellers en breaker toestand
+
+        Returns:
+            dict met tellers, error_rate (mislukte pogingen / pogingen) en state
+        """
+        attempts = self.transactions + self.errors
+        return {
+            "state": self.state,
+            "transactions": self.transactions,
+            "errors": self.errors,
+            "retries": self.retries_used,
+            "failures": self.failures,
+            "fast_fails": self.fast_fails,
+            "breaker_trips": self.breaker_trips,
+            "recoveries": self.recoveries,
+            "error_rate": self.errors / attempts if attempts else 0.0,
+        }
+
+
+# Gedeelde transport per bus (DAC en ADC zitten op dezelfde bus)
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(bus=2):
+    """
+    Geef de gedeelde transport instantie van een bus
+
+    Args:
+        bus: I2C bus nummer
+
+    Returns:
+        I2CTransport
+    """
+    with _transports_lock:
+        if bus not in _transports:
+            _transports[bus] = I2CTransport(bus)
+        return _transports[bus]
+
+
+# Test functie
+if __name__ == "__main__":
+    print("I2C Transport Test")
+    print("=" * 50)
+
+    transport = I2CTransport(bus=2, breaker_threshold=3, breaker_timeout=0.1)
+    transport.add_reinit(lambda: print("  devices opnieuw geïnitialiseerd"))
+
+    glitches = [OSError(121, "Remote I/O error")]
+
+    def write():
+        if glitches:
+            raise glitches.pop()
+        return True
+
+    print(f"  Eén glitch: {transport.execute(write)}, "
+          f"retries: {transport.retries_used}")
+
+    def broken():
+        raise OSError(110, "Connection timed out")
+
+    for _ in range(5):
+        try:
+            transport.execute(broken, budget=0.005)
+        except I2CError as e:
+            transport.log_error("test write", e)
+
+    time.sleep(0.2)
+    print(f"  Na herstel: {transport.execute(write)}")
+    print(f"  Stats: {transport.stats()}")
+
+    print("\n✓ Test voltooid")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Latency Histogram
+Latency meting per methode in histogrammen met vaste buckets (HDR stijl)
+
+De buckets zijn log-lineair: per macht van 2 zijn er 16 sub-buckets, dus
+de relatieve fout van een percentiel is maximaal ~6% over het hele bereik
+van 1ns tot ruim 10s. De bucket array wordt één keer gealloceerd; een
+meting is een bit_length, een shift en een increment.
+
+De LatencyMonitor instrumenteert methodes door bij enable() een wrapper
+als instance attribuut te zetten; disable() verwijdert de wrapper weer,
+zodat een uitgeschakelde monitor geen enkele overhead heeft. Code die
+geen losse methode is (bijv. de relay flanken) leest het histogram
+attribuut van het object en meet alleen als dat niet None is.
+
+Gebruik:
+    monitor = LatencyMonitor()
+    monitor.instrument(dac, "set_voltage_output")
+    monitor.enable()
+    ...
+    monitor.print_report()
+"""
+
+import time
+import functools
+
+
+class LatencyHistogram:
+    """Histogram met log-lineaire buckets voor latencies in nanoseconden"""
+
+    SUB_BITS = 4                       # 16 sub-buckets per macht van 2
+    SUB_COUNT = 1 << SUB_BITS
+    BUCKETS = 512                      # Bereik tot 2^35 ns (~34s)
+
+    def __init__(self, name):
+        """
+        Args:
+            name: Naam van de gemeten methode
+        """
+        self.name = name
+        self.counts = [0] * self.BUCKETS
+        self.reset()
+
+    def reset(self):
+        """Wis alle metingen"""
+        for i in range(self.BUCKETS):
+            self.counts[i] = 0
+        self.count = 0
+        self.max = 0
+
+    def record(self, ns):
+        """
+        Registreer een meting
+
+        Args:
+            ns: Latency in nanoseconden (int)
+        """
+        shift = ns.bit_length() - self.SUB_BITS - 1
+        if shift <= 0:
+            index = ns
+        else:
+            index = shift * self.SUB_COUNT + (ns >> shift)
+            if index >= self.BUCKETS:
+                index = self.BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        if ns > self.max:
+            self.max = ns
+
+    def bucket_upper(self, index):
+        """Hoogste waarde (ns) die in een bucket valt"""
+        if index < 2 * self.SUB_COUNT:
+            return index
+        shift = index // self.SUB_COUNT - 1
+        top = index - shift * self.SUB_COUNT
+        return ((top + 1) << shift) - 1
+
+    def percentile(self, q):
+        """
+        Percentiel van de metingen
+
+        Args:
+            q: Percentiel (0-100)
+
+        Returns:
+            Bovengrens van de bucket in nanoseconden (0 zonder metingen)
+        """
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * q // 100))  # Afronden naar boven
+        cumulative = 0
+        for index, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= target:
+                return min(self.bucket_upper(index), self.max)
+        return self.max
+
+    def summary(self):
+        """
+        Samenvatting in microseconden
+
+        Returns:
+            dict met count, p50, p99 en max (us)
+        """
+        return {
+            "count": self.count,
+            "p50": self.percentile(50) / 1000.0,
+            "p99": self.percentile(99) / 1000.0,
+            "max": self.max / 1000.0,
+        }
+
+
+class LatencyMonitor:
+    """Verzameling latency histogrammen, aan/uit te zetten tijdens bedrijf"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.enabled = False
+        self._methods = []     # (object, methode naam, histogram)
+        self._attributes = []  # (object, attribuut naam, histogram)
+
+    def _histogram(self, name):
+        if name not in self.histograms:
+            self.histograms[name] = LatencyHistogram(name)
+        return self.histograms[name]
+
+    def instrument(self, obj, method_name, name=None):
+        """
+        Meet de latency van een methode van een object
+
+        Args:
+            obj: Object (bijv. DACController instantie)
+            method_name: Naam van de methode
+            name: Naam van het histogram (default: klasse.methode)
+        """
+        name = name or f"{type(obj).__name__}.{method_name}"
+        self._methods.append((obj, method_name, self._histogram(name)))
+        if self.enabled:
+            self._wrap(obj, method_name, self.histograms[name])
+
+    def attach(self, obj, attribute, name):
+        """
+        Koppel een histogram aan een attribuut van een object
+
+        Het object meet zelf en gebruikt het attribuut alleen als het niet
+        None is (bijv. RelayController.edge_latency).
+
+        Args:
+            obj: Object
+            attribute: Naam van het histogram attribuut
+            name: Naam van het histogram
+        """
+        self._attributes.append((obj, attribute, self._histogram(name)))
+        if self.enabled:
+            setattr(obj, attribute, self.histograms[name])
+
+    @staticmethod
+    def _wrap(obj, method_name, histogram):
+        """Zet een meet wrapper als instance attribuut"""
+        method = getattr(type(obj), method_name).__get__(obj)
+        clock = time.perf_counter_ns
+        record = histogram.record
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record(clock() - start)
+
+        setattr(obj, method_name, timed)
+
+    def enable(self):
+        """Start met meten"""
+        if self.enabled:
+            return
+        for obj, method_name, histogram in self._methods:
+            self._wrap(obj, method_name, histogram)
+        for obj, attribute, histogram in self._attributes:
+            setattr(obj, attribute, histogram)
+        self.enabled = True
+
+    def disable(self):
+        """Stop met meten (de histogrammen blijven bewaard)"""
+        if not self.enabled:
+            return
+        for obj, method_name, _ in self._methods:
+            obj.__dict__.pop(method_name, None)
+        for obj, attribute, _ in self._attributes:
+            setattr(obj, attribute, None)
+        self.enabled = False
+
+    def reset(self):
+        """Wis alle histogrammen"""
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def report(self):
+        """
+        Samenvatting per histogram
+
+        Returns:
+            dict naam -> dict met count, p50, p99 en max (us)
+        """
+        return {name: histogram.summary()
+                for name, histogram in self.histograms.items()}
+
+    def print_report(self):
+        """Print p50/p99/max per methode"""
+        print(f"{'Methode':38s} {'Aantal':>8s} {'p50':>9s} {'p99':>9s} {'max':>9s}")
+        for name, stats in self.report().items():
+            if not stats["count"]:
+                continue
+            print(f"{name:38s} {stats['count']:8d} {stats['p50']:7.0f}us "
+                  f"{stats['p99']:7.0f}us {stats['max']:7.0f}us")
+
+
+# Test functie
+if __name__ == "__main__":
+    import random
+
+    print("Latency Histogram Test")
+    print("=" * 50)
+
+    histogram = LatencyHistogram("test")
+    for _ in range(10000):
+        histogram.record(int(random.expovariate(1 / 200000)))  # Gemiddeld 200us
+    print(f"  Exponentieel 200us: p50 {histogram.percentile(50) / 1000:.0f}us "
+          f"(verwacht ~139us), p99 {histogram.percentile(99) / 1000:.0f}us "
+          f"(verwacht ~921us)")
+
+    class Device:
+        def work(self, seconds):
+            time.sleep(seconds)
+
+    device = Device()
+    monitor = LatencyMonitor()
+    monitor.instrument(device, "work")
+    monitor.enable()
+    for _ in range(20):
+        device.work(0.001)
+    monitor.disable()
+    device.work(0.001)  # Niet gemeten
+    monitor.print_report()
+
+    print("\n✓ Test voltooid")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Metrics Exporter
+HTTP endpoint met controller tellers in Prometheus tekst formaat
+
+De exporter draait een kleine HTTP server in een daemon thread. De
+metrics worden pas opgebouwd als /metrics opgevraagd wordt; de
+controller loops zelf verhogen alleen hun bestaande tellers, dus zonder
+scrapes kost de exporter niets.
+
+Gebruik:
+    exporter = MetricsExporter(controller, port=9105)
+    exporter.start()
+    # curl http://beaglebone:9105/metrics
+"""
+
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+
+DEFAULT_PORT = 9105
+DEFAULT_HOST = "127.0.0.1"  # Alleen lokaal; het test rack kiest zelf een interface
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labels):
+    """Labels als {naam="waarde",...}"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class _MetricsWriter:
+    """Bouwt de Prometheus tekst op (HELP/TYPE per metric, één keer)"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.lines = []
+        self._declared = set()
+
+    def add(self, name, kind, help_text, value, labels=None):
+        name = f"{self.prefix}_{name}"
+        if name not in self._declared:
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} {kind}")
+            self._declared.add(name)
+        text = repr(value) if isinstance(value, float) else str(int(value))
+        self.lines.append(f"{name}{_format_labels(labels)} {text}")
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def collect(controller, prefix="imc"):
+    """
+    Verzamel de metrics van een BeagleBoneController
+
+    Args:
+        controller: BeagleBoneController instantie
+        prefix: Prefix van de metric namen
+
+    Returns:
+        Metrics in Prometheus tekst formaat
+    """
+    out = _MetricsWriter(prefix)
+    dac = controller.dac
+    adc = controller.adc
+
+    # DAC
+    out.add("dac_writes_total", "counter", "Uitgevoerde DAC kanaal writes", dac.writes)
+    out.add("dac_writes_suppressed_total", "counter",
+            "Overgeslagen DAC writes (code ongewijzigd)", dac.writes_suppressed)
+    out.add("dac_write_failures_total", "counter", "Mislukte DAC writes",
+            dac.write_failures)
+    out.add("output_voltage_setpoint_volts", "gauge", "Spanning setpoint",
+            dac.voltage_setpoint)
+    out.add("output_current_setpoint_milliamps", "gauge", "Stroom setpoint",
+            dac.current_setpoint)
+    for name, running in (("voltage", controller.voltage_running),
+                          ("current", controller.current_running),
+                          ("relay", controller.relay_running)):
+        out.add("output_running", "gauge", "Output loop actief", int(running),
+                {"output": name})
+    for name, count in controller.loop_overruns.items():
+        out.add("loop_overruns_total", "counter",
+                "Output cycli langer dan de loop tick", count, {"loop": name})
+
+    # ADC
+    for channel, count in adc.sample_counts.items():
+        out.add("adc_samples_total", "counter", "Gelezen ADC samples", count,
+                {"channel": channel})
+
+    # I2C (DAC en ADC delen de transport)
+    i2c = dac.transport.stats()
+    labels = {"bus": dac.transport.bus}
+    out.add("i2c_transactions_total", "counter", "Geslaagde I2C transacties",
+            i2c["transactions"], labels)
+    out.add("i2c_errors_total", "counter", "Mislukte I2C pogingen",
+            i2c["errors"], labels)
+    out.add("i2c_retries_total", "counter", "I2C herhalingen", i2c["retries"], labels)
+    out.add("i2c_failures_total", "counter", "Definitief mislukte I2C transacties",
+            i2c["failures"], labels)
+    out.add("i2c_breaker_trips_total", "counter", "Keren dat de breaker opende",
+            i2c["breaker_trips"], labels)
+    out.add("i2c_recoveries_total", "counter", "Uitgevoerde bus recoveries",
+            i2c["recoveries"], labels)
+    out.add("i2c_breaker_open", "gauge", "Breaker niet gesloten",
+            int(i2c["state"] != "closed"), labels)
+
+    # Relay
+    requested, emitted = controller.relay.edge_counts()
+    out.add("relay_edges_requested_total", "counter",
+            "Relay flanken volgens de ingestelde frequentie", requested)
+    out.add("relay_edges_emitted_total", "counter", "Geschakelde relay flanken", emitted)
+
+    # Bewaking
+    out.add("watchdog_stalls_total", "counter", "Vastgelopen output loops",
+            controller.watchdog.stall_count)
+    out.add("protection_trips_total", "counter", "Protection alarmen",
+            sum(rule.trip_count for rule in controller.protection.rules.values()))
+    out.add("safe_state", "gauge", "Safe state geactiveerd",
+            int(controller.safe_state_reason is not None))
+    out.add("safe_state_pending", "gauge", "Safe state nog niet bevestigd geschreven",
+            int(controller.safe_state_pending))
+
+    return out.text()
+
+
+class MetricsExporter:
+    """HTTP server voor /metrics in een achtergrond thread"""
+
+    def __init__(self, controller, port=DEFAULT_PORT, host=DEFAULT_HOST):
+        """
+        Initialiseer exporter
+
+        Args:
+            controller: BeagleBoneController instantie
+            port: TCP poort
+            host: Adres om op te luisteren (default alleen lokaal,
+                  "" of "0.0.0.0" = alle interfaces)
+        """
+        self.controller = controller
+        self.port = port
+        self.host = host
+        self.server = None
+        self.thread = None
+
+    def _handler(self):
+        """Request handler klasse met toegang tot de controller"""
+        controller = self.controller
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = collect(controller).encode()
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Geen output tussen de menu's
+
+        return Handler
+
+    def start(self):
+        """
+        Start de HTTP server
+
+        Returns:
+            True als de server luistert
+        """
+        try:
+            self.server = HTTPServer((self.host, self.port), self._handler())
+        except OSError as e:
+            print(f"✗ Fout bij starten metrics exporter op poort {self.port}: {e}")
+            self.server = None
+            return False
+
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        print(f"✓ Metrics beschikbaar op http://{host}:{port}/metrics")
+        return True
+
+    def stop(self):
+        """Stop de HTTP server"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+# Test functie
+if __name__ == "__main__":
+    import urllib.request
+    from beaglebone_controller import BeagleBoneController
+
+    print("Metrics Exporter Test")
+    print("=" * 50)
+
+    controller = BeagleBoneController(metrics_port=None)
+    exporter = MetricsExporter(controller, port=0, host="127.0.0.1")
+    if exporter.start():
+        port = exporter.server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            print(response.read().decode())
+        exporter.stop()
+    controller.watchdog.stop()
+
+    print("✓ Test voltooid")
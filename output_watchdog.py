@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Output Watchdog
+Bewaakt de output loops via heartbeats en forceert een safe state bij stilstand
+
+Elke output loop (spanning, stroom) registreert een heartbeat met een
+deadline en roept beat() aan na elke geslaagde DAC write. Een aparte,
+lichte thread controleert de deadlines; als een loop te lang geen
+heartbeat geeft (vastgelopen thread, herhaalde I2C fouten) wordt de safe
+state actie aangeroepen. De reactietijd is maximaal deadline +
+check_interval plus de duur van de actie.
+
+Per heartbeat wordt een ringbuffer met loop intervallen bijgehouden; bij
+een stilstand wordt die samen met het event gelogd (JSON per regel) voor
+analyse achteraf.
+"""
+
+import os
+import json
+import time
+import threading
+import numpy as np
+
+
+# Standaard locatie voor de watchdog log (naast de applicatie)
+LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+
+
+class Heartbeat:
+    """Heartbeat van één bewaakte loop"""
+
+    def __init__(self, name, deadline, history=256):
+        """
+        Args:
+            name: Naam van de loop
+            deadline: Maximale tijd tussen twee heartbeats in seconden
+            history: Aantal loop intervallen in de ringbuffer
+        """
+        self.name = name
+        self.deadline = deadline
+        self.last_beat = time.monotonic()
+        self.beats = 0
+        self.stalled = False
+        self._intervals = np.zeros(history)
+
+    def beat(self):
+        """Meld dat de loop een cyclus voltooid heeft"""
+        now = time.monotonic()
+        self._intervals[self.beats % len(self._intervals)] = now - self.last_beat
+        self.last_beat = now
+        self.beats += 1
+        self.stalled = False
+
+    def intervals(self):
+        """Loop intervallen uit de ringbuffer, oudste eerst"""
+        n = len(self._intervals)
+        if self.beats < n:
+            return self._intervals[:self.beats].copy()
+        start = self.beats % n
+        return np.concatenate((self._intervals[start:], self._intervals[:start]))
+
+
+class Watchdog:
+    """Controleert heartbeat deadlines in een aparte thread"""
+
+    def __init__(self, safe_action, check_interval=0.01, log_path=None):
+        """
+        Initialiseer watchdog
+
+        Args:
+            safe_action: Functie safe_action(reason) die de outputs in de
+                         veilige toestand zet (moet begrensd in tijd zijn);
+                         de returnwaarde (bevestigd of niet) komt in de log
+            check_interval: Controle interval in seconden
+            log_path: JSON-lines log voor stilstand events
+                      (default: logs/watchdog.log)
+        """
+        self.safe_action = safe_action
+        self.check_interval = check_interval
+        self.log_path = log_path or os.path.join(LOG_DIR, "watchdog.log")
+        self.heartbeats = {}
+        self.stall_count = 0
+        self.last_stall = None
+        self.running = False
+        self.thread = None
+
+    def register(self, name, deadline):
+        """
+        Registreer een loop (vervangt een heartbeat met dezelfde naam)
+
+        Args:
+            name: Naam van de loop
+            deadline: Maximale tijd tussen twee heartbeats in seconden
+
+        Returns:
+            Heartbeat object; roep beat() aan na elke cyclus
+        """
+        heartbeat = Heartbeat(name, deadline)
+        self.heartbeats[name] = heartbeat
+        return heartbeat
+
+    def unregister(self, name, heartbeat=None):
+        """
+        Stop de bewaking van een loop (bijv. bij een normale stop)
+
+        Args:
+            name: Naam van de loop
+            heartbeat: Alleen verwijderen als dit de geregistreerde
+                       heartbeat is (een nieuwere loop met dezelfde naam
+                       blijft dan bewaakt)
+        """
+        if heartbeat is None or self.heartbeats.get(name) is heartbeat:
+            self.heartbeats.pop(name, None)
+
+    def max_reaction_time(self):
+        """Maximale tijd tussen de laatste heartbeat en de safe state actie"""
+        deadlines = [hb.deadline for hb in self.heartbeats.values()]
+        return max(deadlines, default=0.0) + self.check_interval
+
+    def start(self):
+        """Start de watchdog thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._watch_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop de watchdog thread"""
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+
+    def _watch_loop(self):
+        """Thread functie: controleer alle deadlines"""
+        next_check = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            for heartbeat in list(self.heartbeats.values()):
+                if not heartbeat.stalled and now - heartbeat.last_beat > heartbeat.deadline:
+                    heartbeat.stalled = True
+                    self._stall(heartbeat, now)
+
+            next_check += self.check_interval
+            delay = next_check - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_check = time.monotonic()
+
+    def _stall(self, heartbeat, detected):
+        """Zet de outputs veilig en log het event"""
+        reason = (f"watchdog: {heartbeat.name} stilstand "
+                  f"({detected - heartbeat.last_beat:.3f}s > {heartbeat.deadline:.3f}s)")
+        confirmed = None
+        try:
+            confirmed = self.safe_action(reason)
+        except Exception as e:
+            print(f"✗ Fout in watchdog safe state: {e}")
+        reacted = time.monotonic()
+
+        self.stall_count += 1
+        self.last_stall = reason
+        print(f"⚠ {reason}")
+
+        intervals = heartbeat.intervals()
+        self._log({
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "loop": heartbeat.name,
+            "deadline": heartbeat.deadline,
+            "silence": detected - heartbeat.last_beat,
+            "reaction": reacted - detected,
+            "confirmed": confirmed,  # None = safe_action meldt dit niet
+            "beats": heartbeat.beats,
+            "interval_mean": float(intervals.mean()) if len(intervals) else None,
+            "interval_max": float(intervals.max()) if len(intervals) else None,
+            "intervals": np.round(intervals, 6).tolist(),
+        })
+
+    def _log(self, event):
+        """Voeg een event toe aan de log"""
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(event) + "\n")
+        except OSError as e:
+            print(f"✗ Fout bij schrijven watchdog log: {e}")
+
+    def read_log(self, limit=10):
+        """
+        Lees de laatste stilstand events
+
+        Args:
+            limit: Maximaal aantal events
+
+        Returns:
+            List met event dicts, nieuwste laatst
+        """
+        if not os.path.exists(self.log_path):
+            return []
+        with open(self.log_path) as f:
+            lines = f.readlines()[-limit:]
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+# Test functie
+if __name__ == "__main__":
+    import tempfile
+
+    print("Watchdog Test")
+    print("=" * 50)
+
+    log_path = os.path.join(tempfile.mkdtemp(), "watchdog.log")
+    watchdog = Watchdog(lambda reason: print(f"  SAFE STATE: {reason}"),
+                        log_path=log_path)
+    heartbeat = watchdog.register("test loop", deadline=0.05)
+    watchdog.start()
+
+    # Normale loop op 100Hz, daarna een stilstand
+    for _ in range(50):
+        heartbeat.beat()
+        time.sleep(0.01)
+    time.sleep(0.2)
+    watchdog.stop()
+
+    event = watchdog.read_log()[-1]
+    print(f"  Stilstand na {event['silence'] * 1000:.1f}ms gedetecteerd "
+          f"(deadline {event['deadline'] * 1000:.0f}ms, "
+          f"max {watchdog.max_reaction_time() * 1000:.0f}ms)")
+    print(f"  Loop interval: gemiddeld {event['interval_mean'] * 1000:.2f}ms, "
+          f"max {event['interval_max'] * 1000:.2f}ms")
+
+    print("\n✓ Test voltooid")
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Protection Rules
+Grenswaarde en alarm regels op ADC blokken met directe safe-state acties
+
+Regels worden per ADC blok gevectoriseerd geëvalueerd, direct in de
+acquisitie thread (als block listener van de ADCController). Een regel
+heeft een drempel met hysterese, een debounce (minimaal aantal
+opeenvolgende samples) en een duur conditie. Bij een overschrijding
+worden de acties van de regel meteen aangeroepen, zonder tussenkomst van
+de menu thread.
+
+Voorbeeld: "als CH2 > 3.0V gedurende 5ms, stroom naar 4mA en relay open"
+
+    engine = RuleEngine(adc)
+    engine.add_rule(ProtectionRule("CH2 hoog", 2, 3.0, duration=0.005,
+                                   action=controller.enter_safe_state))
+    engine.start()
+
+De regels draaien op elke acquisitie van de ADCController (stream of
+scan); `running` geeft aan of de lopende acquisitie alle bewaakte
+kanalen meet.
+"""
+
+import time
+import collections
+import numpy as np
+
+
+class ProtectionRule:
+    """Drempel regel op één ADC kanaal"""
+
+    def __init__(self, name, channel, threshold, above=True, hysteresis=0.0,
+                 duration=0.0, debounce=1, action=None, latch=True):
+        """
+        Initialiseer regel
+
+        Args:
+            name: Naam van de regel (voor log en status)
+            channel: ADC kanaal (0-3)
+            threshold: Drempel in Volt
+            above: True = alarm boven de drempel, False = onder de drempel
+            hysteresis: Afstand tot de drempel voor het vrijgeven (Volt)
+            duration: Minimale tijd dat de conditie waar moet zijn (s)
+            debounce: Minimaal aantal opeenvolgende samples boven de drempel
+            action: Functie action(reason) die bij een alarm aangeroepen
+                    wordt vanuit de acquisitie thread (mag niet blokkeren)
+            latch: True = alarm blijft actief tot reset()
+        """
+        if hysteresis < 0:
+            raise ValueError("Hysterese mag niet negatief zijn")
+        if debounce < 1:
+            raise ValueError("Debounce moet minimaal 1 sample zijn")
+
+        self.name = name
+        self.channel = channel
+        self.threshold = threshold
+        self.above = above
+        self.hysteresis = hysteresis
+        self.duration = duration
+        self.debounce = debounce
+        self.action = action
+        self.latch = latch
+        self.reset()
+
+    def reset(self):
+        """Geef de regel vrij en wis de debounce toestand"""
+        self.tripped = False
+        self.trip_count = 0
+        self._run_start = None  # Tijd van het eerste sample van de lopende overschrijding
+        self._run_count = 0
+
+    def _conditions(self, values):
+        """Alarm en vrijgave condities per sample"""
+        if self.above:
+            return (values > self.threshold,
+                    values < self.threshold - self.hysteresis)
+        return (values < self.threshold,
+                values > self.threshold + self.hysteresis)
+
+    def _find_trip(self, timestamps, condition):
+        """
+        Zoek het eerste sample waarop debounce en duur voldaan zijn
+
+        De lopende overschrijding uit het vorige blok telt mee; als er
+        geen alarm volgt wordt de overschrijding aan het eind van het blok
+        bewaard voor het volgende blok.
+
+        Returns:
+            Index van het alarm sample, of None
+        """
+        n = len(condition)
+        index = np.arange(n)
+
+        # Laatste sample zonder overschrijding, voor elke positie
+        last_clear = np.maximum.accumulate(np.where(condition, -1, index))
+        carried = last_clear < 0
+        start_time = timestamps[np.minimum(last_clear + 1, n - 1)]
+        count = index - last_clear
+        if self._run_start is not None:
+            start_time = np.where(carried, self._run_start, start_time)
+            count = np.where(carried, count + self._run_count, count)
+
+        ready = (condition & (count >= self.debounce) &
+                 (timestamps - start_time >= self.duration))
+        hits = np.flatnonzero(ready)
+        if len(hits):
+            return int(hits[0])
+
+        if condition[-1]:
+            self._run_start = float(start_time[-1])
+            self._run_count = int(count[-1])
+        else:
+            self._run_start = None
+            self._run_count = 0
+        return None
+
+    def evaluate(self, timestamps, values):
+        """
+        Evalueer een blok samples
+
+        Args:
+            timestamps: Sample tijden (numpy array)
+            values: Spanningen (numpy array)
+
+        Returns:
+            List met (timestamp, value) per nieuw alarm in dit blok
+        """
+        trip_condition, release_condition = self._conditions(values)
+        trips = []
+        k = 0
+        n = len(values)
+
+        while k < n:
+            if self.tripped:
+                if self.latch:
+                    break
+                released = np.flatnonzero(release_condition[k:])
+                if not len(released):
+                    break
+                k += int(released[0])
+                self.tripped = False
+                self._run_start = None
+                self._run_count = 0
+                continue
+
+            hit = self._find_trip(timestamps[k:], trip_condition[k:])
+            if hit is None:
+                break
+            k += hit
+            self.tripped = True
+            self.trip_count += 1
+            trips.append((float(timestamps[k]), float(values[k])))
+            k += 1
+
+        return trips
+
+    def describe(self):
+        """Korte omschrijving van de regel"""
+        sign = ">" if self.above else "<"
+        text = f"CH{self.channel} {sign} {self.threshold:.3f}V"
+        if self.duration:
+            text += f" gedurende {self.duration * 1000:.1f}ms"
+        return text
+
+
+class RuleEngine:
+    """Evalueert protection rules op elk ADC blok"""
+
+    def __init__(self, adc, max_events=100):
+        """
+        Initialiseer rule engine
+
+        Args:
+            adc: ADCController instantie
+            max_events: Aantal alarm events dat bewaard wordt
+        """
+        self.adc = adc
+        self.rules = {}
+        self._by_channel = {}
+        self.events = collections.deque(maxlen=max_events)
+        self.max_latency = 0.0
+        self.armed = False       # Block listener gekoppeld (start tot stop)
+        self._own_scan = None    # Kanalen van de scan die start() zelf startte
+
+    @property
+    def running(self):
+        """True als de lopende acquisitie alle kanalen met regels meet"""
+        return (self.armed and bool(self._by_channel) and
+                set(self._by_channel) <= self.adc.acquired_channels())
+
+    def add_rule(self, rule):
+        """Voeg een regel toe (vervangt een regel met dezelfde naam)"""
+        self.rules[rule.name] = rule
+        self._rebuild()
+
+    def remove_rule(self, name):
+        """Verwijder een regel"""
+        self.rules.pop(name, None)
+        self._rebuild()
+
+    def _rebuild(self):
+        """Bouw de lookup per kanaal opnieuw (atomaire vervanging)"""
+        by_channel = {}
+        for rule in self.rules.values():
+            by_channel.setdefault(rule.channel, []).append(rule)
+        self._by_channel = {ch: tuple(rules) for ch, rules in by_channel.items()}
+        if self.armed:
+            self.adc.protected_channels = tuple(self.channels())
+
+    def channels(self):
+        """Kanalen waarop regels actief zijn"""
+        return sorted(self._by_channel)
+
+    def reset(self, name=None):
+        """Geef een of alle regels weer vrij"""
+        for rule in self.rules.values():
+            if name is None or rule.name == name:
+                rule.reset()
+
+    def tripped(self):
+        """Namen van de regels die in alarm staan"""
+        return [rule.name for rule in self.rules.values() if rule.tripped]
+
+    def process_block(self, channel, timestamps, raw):
+        """
+        Block listener voor de ADCController
+
+        Args:
+            channel: ADC kanaal
+            timestamps: Sample tijden
+            raw: Ruwe ADC waarden
+        """
+        rules = self._by_channel.get(channel)
+        if not rules or len(raw) == 0:
+            return
+
+        values = self.adc.raw_to_voltage(raw.astype(np.float64), channel)
+        for rule in rules:
+            for trip_time, value in rule.evaluate(timestamps, values):
+                self._trip(rule, trip_time, value)
+
+    def _trip(self, rule, trip_time, value):
+        """Voer de acties van een regel uit en log het event"""
+        reason = f"{rule.name}: {rule.describe()} (gemeten {value:.3f}V)"
+        if rule.action:
+            try:
+                rule.action(reason)
+            except Exception as e:
+                print(f"✗ Fout in protection actie: {e}")
+
+        latency = time.monotonic() - trip_time
+        self.max_latency = max(self.max_latency, latency)
+        self.events.append({
+            "rule": rule.name,
+            "channel": rule.channel,
+            "time": trip_time,
+            "value": value,
+            "latency": latency,
+        })
+        print(f"⚠ Protection: {reason}")
+
+    def worst_case_latency(self, block_size, sample_rate):
+        """
+        Bovengrens van de reactietijd (exclusief de actie zelf)
+
+        Een overschrijding wordt pas gezien als het blok compleet is, dus
+        de reactietijd is maximaal de duur conditie plus de debounce plus
+        één blok plus één sample interval.
+
+        Args:
+            block_size: Samples per kanaal per blok
+            sample_rate: Samples per seconde per kanaal
+
+        Returns:
+            Reactietijd in seconden
+        """
+        interval = 1.0 / sample_rate
+        condition_time = max((rule.duration + (rule.debounce - 1) * interval
+                              for rule in self.rules.values()), default=0.0)
+        return condition_time + (block_size + 1) * interval
+
+    def start(self, frame_size=16, data_rate=None):
+        """
+        Start bewaking: evalueer elk blok van de lopende acquisitie
+
+        De regels draaien mee op elke stream of scan van de ADCController.
+        Als er geen acquisitie loopt die alle kanalen met regels meet,
+        start de engine zelf een scan. Zolang de bewaking actief is
+        weigert de ADCController een stream of scan die een bewaakt kanaal
+        niet meet.
+
+        Args:
+            frame_size: Samples per scan frame; bepaalt de reactietijd
+            data_rate: ADS1115 data rate (default: maximale data rate)
+        """
+        if not self.rules:
+            print("✗ Geen protection regels ingesteld")
+            return False
+        channels = self.channels()
+        self.adc.add_block_listener(self.process_block)
+        self.armed = True
+        self.adc.protected_channels = tuple(channels)
+
+        if set(channels) <= self.adc.acquired_channels():
+            print(f"✓ Protection actief op {len(self.rules)} regel(s), "
+                  f"op de lopende ADC acquisitie")
+            return True
+
+        data_rate = data_rate or self.adc.MAX_DATA_RATE
+        try:
+            self.adc.start_scan(channels=channels, frame_size=frame_size,
+                                data_rate=data_rate)
+        except Exception:
+            self.stop()
+            raise
+        self._own_scan = tuple(channels)
+
+        per_channel = frame_size // len(channels)
+        latency = self.worst_case_latency(per_channel, data_rate / len(channels))
+        print(f"✓ Protection actief op {len(self.rules)} regel(s), "
+              f"max reactietijd {latency * 1000:.1f}ms")
+        return True
+
+    def stop(self):
+        """Stop bewaking (een scan van start() wordt ook gestopt)"""
+        self.armed = False
+        self.adc.protected_channels = ()
+        self.adc.remove_block_listener(self.process_block)
+        if (self._own_scan is not None and self.adc.scanning and
+                tuple(self.adc.scan_channels) == self._own_scan):
+            self.adc.stop_scan()
+        self._own_scan = None
+
+
+# Test functie
+if __name__ == "__main__":
+    print("Protection Rules Test")
+    print("=" * 50)
+
+    from adc_controller import ADCController
+
+    adc = ADCController()
+    engine = RuleEngine(adc)
+    engine.add_rule(ProtectionRule("CH2 hoog", 2, 3.0, hysteresis=0.1,
+                                   duration=0.005, latch=False,
+                                   action=lambda reason: print(f"  actie: {reason}")))
+
+    # 860 SPS, signaal boven 3.0V van 10ms tot 14ms (te kort) en vanaf 30ms
+    t = np.arange(64) / 860.0
+    volts = np.where(((t > 0.010) & (t < 0.014)) | (t > 0.030), 3.2, 2.0)
+    raw = np.round(volts / adc.channel_lsb[2]).astype(np.int16)
+    for tb, rb in zip(np.array_split(t, 8), np.array_split(raw, 8)):
+        engine.process_block(2, tb, rb)
+
+    print(f"  Alarmen: {[round(e['time'] * 1000, 1) for e in engine.events]} ms "
+          f"(verwacht: één alarm rond 35ms)")
+    print(f"  Max reactietijd (8 samples/blok): "
+          f"{engine.worst_case_latency(8, 860.0) * 1000:.1f}ms")
+
+    print("\n✓ Test voltooid")
@@ -30,6 +30,20 @@ class RelayController:
         self.current_frequency = 0
         self.state = False
         
+        # Voorkomt dat de schakel thread na force_off() nog AAN schakelt
+        self._gpio_lock = threading.Lock()
+        
+        # Optioneel LatencyHistogram voor de schakelflanken (zie latency_histogram.py)
+        self.edge_latency = None
+        
+        # Optioneel EventJournal voor de stimulus tijdlijn (zie event_journal.py)
+        self.journal = None
+        
+        # Geschakelde flanken tegenover het aantal volgens de frequentie
+        self.edges_emitted = 0
+        self._edges_requested = 0  # Van afgeronde schakel periodes
+        self._switch_started = None
+        
         try:
             if GPIO:
                 # Configureer GPIO pin als output
@@ -59,6 +73,8 @@ class RelayController:
                 print(f"✗ Fout bij zetten relay state: {e}")
         else:
             print(f"[TEST] Relay zou {'AAN' if state else 'UIT'} gezet worden")
+        if state:
+            self._journal_edge(True)  # stop() heeft de relay UIT gezet
     
     def start_switching(self, frequency):
         """
@@ -78,6 +94,7 @@ class RelayController:
         self.stop()
         
         self.current_frequency = frequency
+        self._switch_started = time.monotonic()
         self.is_switching = True
         
         # Start schakel thread
@@ -102,9 +119,19 @@ class RelayController:
         try:
             while self.is_switching:
                 # Zet relay AAN
-                self.state = True
-                if GPIO:
-                    GPIO.output(self.gpio_pin, GPIO.HIGH)
+                histogram = self.edge_latency
+                if histogram is not None:
+                    start = time.perf_counter_ns()
+                with self._gpio_lock:
+                    if not self.is_switching:
+                        break
+                    self.state = True
+                    if GPIO:
+                        GPIO.output(self.gpio_pin, GPIO.HIGH)
+                self._journal_edge(True)
+                self.edges_emitted += 1
+                if histogram is not None:
+                    histogram.record(time.perf_counter_ns() - start)
                 
                 # Wacht halve periode
                 time.sleep(half_period)
@@ -113,20 +140,29 @@ class RelayController:
                     break
                 
                 # Zet relay UIT
+                histogram = self.edge_latency
+                if histogram is not None:
+                    start = time.perf_counter_ns()
                 self.state = False
                 if GPIO:
                     GPIO.output(self.gpio_pin, GPIO.LOW)
+                self._journal_edge(False)
+                self.edges_emitted += 1
+                if histogram is not None:
+                    histogram.record(time.perf_counter_ns() - start)
                 
                 # Wacht halve periode
                 time.sleep(half_period)
                 
         except Exception as e:
             print(f"✗ Fout in schakel loop: {e}")
+            self._close_switch_period()
             self.is_switching = False
     
     def stop(self):
         """Stop het schakelen en zet relay UIT"""
         if self.is_switching:
+            self._close_switch_period()
             self.is_switching = False
             
             # Wacht tot thread klaar is
@@ -136,6 +172,7 @@ class RelayController:
             self.current_frequency = 0
         
         # Zet relay uit
+        was_on = self.state
         self.state = False
         if GPIO:
             try:
@@ -144,6 +181,67 @@ class RelayController:
                 print(f"✗ Fout bij stoppen relay: {e}")
         else:
             print("[TEST] Relay zou UIT gezet worden")
+        if was_on:
+            self._journal_edge(False)
+    
+    def force_off(self):
+        """
+        Zet relay direct UIT zonder op de schakel thread te wachten
+        
+        Bedoeld voor safe-state acties vanuit andere threads (bijv. de ADC
+        acquisitie thread); de schakel thread stopt bij de volgende cyclus.
+        """
+        self.force_state(False)
+    
+    def force_state(self, state):
+        """
+        Zet relay direct constant AAN of UIT zonder op de schakel thread te wachten
+        
+        Args:
+            state: True = AAN, False = UIT
+        """
+        with self._gpio_lock:
+            if self.is_switching:
+                self._close_switch_period()
+            self.is_switching = False
+            self.current_frequency = 0
+            changed = self.state != state
+            self.state = state
+            if GPIO:
+                try:
+                    GPIO.output(self.gpio_pin, GPIO.HIGH if state else GPIO.LOW)
+                except Exception as e:
+                    print(f"✗ Fout bij {'in' if state else 'uit'}schakelen relay: {e}")
+            if changed:
+                self._journal_edge(state)
+    
+    def _journal_edge(self, state):
+        """Registreer een flank in het journal (indien gekoppeld)"""
+        journal = self.journal
+        if journal is not None:
+            journal.relay_edge(state, time.monotonic())
+    
+    def _requested_in_period(self):
+        """Flanken die de lopende schakel periode tot nu toe vraagt"""
+        started = self._switch_started
+        if started is None:
+            return 0
+        return int((time.monotonic() - started) * 2 * self.current_frequency) + 1
+    
+    def _close_switch_period(self):
+        """Tel de gevraagde flanken van de beëindigde schakel periode op"""
+        self._edges_requested += self._requested_in_period()
+        self._switch_started = None
+    
+    def edge_counts(self):
+        """
+        Aantal gevraagde en geschakelde flanken sinds de start
+        
+        Returns:
+            Tuple (requested, emitted); een groeiend verschil betekent dat
+            de schakel thread de frequentie niet bijhoudt
+        """
+        return self._edges_requested + self._requested_in_period(), self.edges_emitted
     
     def get_state(self):
         """
@@ -172,8 +270,10 @@ class RelayController:
         try:
             if GPIO:
                 GPIO.output(self.gpio_pin, GPIO.HIGH)
+                self._journal_edge(True)
                 time.sleep(duration)
                 GPIO.output(self.gpio_pin, GPIO.LOW)
+                self._journal_edge(False)
             else:
                 print(f"[TEST] Relay puls van {duration}s zou gegeven worden")
                 
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Real-time Engine
+Output en acquisitie in een apart proces, gekoppeld via shared memory
+
+In het normale programma delen de output loops één proces en één GIL
+met het menu, de prints en eventuele analyse. De engine draait de DAC
+outputs en de relay in een eigen proces, en de ADC stream in een tweede
+proces (met een eigen GIL, zodat de acquisitie de output loop niet
+vertraagt):
+
+- SCHED_FIFO prioriteit (als de rechten het toestaan)
+- mlockall: geen page faults in de loop
+- buffers en rings worden vooraf gealloceerd, de garbage collector
+  staat uit tijdens de loop
+- commando's en samples gaan via lock-vrije shared memory rings
+  (shm_ring.py), status via een gedeelde array; de control kant kan
+  nooit de timing van de engine blokkeren
+- het acquisitie proces draait op normale prioriteit: de ADC stream
+  wacht tussen samples deels actief (spin) en zou met SCHED_FIFO de
+  rest van het systeem kunnen uithongeren
+
+De engine is eigenaar van de hardware: gebruik in hetzelfde systeem niet
+tegelijk een BeagleBoneController. Als het control proces verdwijnt zet
+de engine de outputs in de veilige toestand en stopt.
+
+Gebruik:
+    engine = RealtimeEngine()
+    engine.start()
+    engine.voltage_waveform("sine", 0.5, 2.5, 1.0)
+    engine.adc_stream(0, data_rate=860)
+    samples = engine.read_samples()   # structured array: t, channel, value
+    engine.stop()
+"""
+
+import os
+import gc
+import time
+import ctypes
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from shm_ring import ShmRing, _attach
+
+
+# Commando record: opcode en vier argumenten
+COMMAND = np.dtype([("op", np.uint8), ("a", np.float64), ("b", np.float64),
+                    ("c", np.float64), ("d", np.float64)])
+
+# Sample record van de ADC stream
+SAMPLE = np.dtype([("t", np.float64), ("channel", np.uint8), ("value", np.float32)])
+
+OP_SET_VOLTAGE = 1      # a = spanning
+OP_SET_CURRENT = 2      # a = stroom
+OP_WAVE_VOLTAGE = 3     # a = golfvorm index, b = min, c = max, d = frequentie
+OP_WAVE_CURRENT = 4
+OP_RAMP_VOLTAGE = 5     # a = start, b = eind, c = duur
+OP_RAMP_CURRENT = 6
+OP_RELAY = 7            # a = frequentie (0 = UIT, < 0 = constant AAN)
+OP_ADC_STREAM = 8       # a = kanaal, b = data rate, c = blok grootte
+OP_ADC_STOP = 9
+OP_STOP_ALL = 10
+OP_SHUTDOWN = 11
+
+WAVES = ("sine", "triangle", "square", "sawtooth")
+
+# Velden van de status array (alleen de engine schrijft)
+STATUS_FIELDS = ("alive", "ticks", "overruns", "max_lateness", "voltage", "current",
+                 "relay_frequency", "commands", "samples_dropped", "dac_failures",
+                 "rt_priority", "memory_locked", "adc_alive")
+
+# Poll interval van het acquisitie proces voor commando's (s)
+ACQUISITION_POLL = 0.01
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+
+def _make_realtime(priority):
+    """
+    Zet SCHED_FIFO prioriteit en vergrendel het geheugen
+
+    Returns:
+        Tuple (prioriteit of 0, True als het geheugen vergrendeld is)
+    """
+    rt_priority = 0
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        rt_priority = priority
+    except (AttributeError, PermissionError, OSError) as e:
+        print(f"⚠ RT engine: geen SCHED_FIFO ({e})")
+
+    locked = False
+    try:
+        libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        locked = libc.mlockall(MCL_CURRENT | MCL_FUTURE) == 0
+        if not locked:
+            print(f"⚠ RT engine: mlockall mislukt ({os.strerror(ctypes.get_errno())})")
+    except OSError as e:
+        print(f"⚠ RT engine: mlockall niet beschikbaar ({e})")
+    return rt_priority, locked
+
+
+class _Output:
+    """Setpoint bron van één output: constant, golfvorm of ramp"""
+
+    def __init__(self, value):
+        self.mode = "constant"
+        self.value = value
+        self.params = None
+        self.start = 0.0
+
+    def constant(self, value):
+        self.mode, self.value = "constant", value
+
+    def wave(self, wave, low, high, frequency, now):
+        self.mode, self.params, self.start = "wave", (WAVES[wave], low, high, frequency), now
+
+    def ramp(self, begin, end, duration, now):
+        self.mode, self.params, self.start = "ramp", (begin, end, duration), now
+
+    def evaluate(self, generator, now):
+        """Setpoint op tijdstip now"""
+        if self.mode == "wave":
+            wave, low, high, frequency = self.params
+            self.value = generator.value_at(wave, low, high, frequency, now - self.start)
+        elif self.mode == "ramp":
+            begin, end, duration = self.params
+            self.value = generator.generate_ramp(begin, end, duration, now - self.start)
+            if now - self.start >= duration:
+                self.mode = "constant"
+        return self.value
+
+
+def _acquisition_main(command_name, sample_name, status_name, parent_pid):
+    """Hoofdfunctie van het acquisitie proces (ADC stream naar de sample ring)"""
+    from adc_controller import ADCController
+
+    commands = ShmRing(COMMAND, name=command_name)
+    samples = ShmRing(SAMPLE, name=sample_name)
+    status_shm = _attach(status_name)
+    status = np.ndarray(len(STATUS_FIELDS), dtype=np.float64, buffer=status_shm.buf)
+    field = {name: i for i, name in enumerate(STATUS_FIELDS)}
+
+    adc = ADCController()
+
+    def on_block(channel, timestamps, raw):
+        volts = adc.raw_to_voltage(raw, channel)
+        samples.push_many(t=timestamps, channel=np.full(len(raw), channel), value=volts)
+        status[field["samples_dropped"]] = samples.dropped
+
+    adc.add_block_listener(on_block)
+
+    status[field["adc_alive"]] = 1
+    running = True
+    try:
+        while running:
+            while True:
+                command = commands.pop()
+                if command is None:
+                    break
+                op = command["op"]
+                if op == OP_ADC_STREAM:
+                    adc.start_stream(int(command["a"]), int(command["c"]), int(command["b"]))
+                elif op == OP_ADC_STOP:
+                    adc.stop_stream()
+                elif op == OP_SHUTDOWN:
+                    running = False
+
+            if os.getppid() != parent_pid:
+                print("⚠ RT acquisitie: control proces verdwenen")
+                running = False
+            time.sleep(ACQUISITION_POLL)
+    finally:
+        adc.stop_stream()
+        status[field["adc_alive"]] = 0
+        del status
+        commands.close()
+        samples.close()
+        status_shm.close()
+
+
+def _engine_main(command_name, status_name, tick, priority, parent_pid):
+    """Hoofdfunctie van het engine proces"""
+    from dac_controller import DACController
+    from relay_controller import RelayController
+    from waveform_generator import WaveformGenerator
+
+    commands = ShmRing(COMMAND, name=command_name)
+    status_shm = _attach(status_name)
+    status = np.ndarray(len(STATUS_FIELDS), dtype=np.float64, buffer=status_shm.buf)
+    field = {name: i for i, name in enumerate(STATUS_FIELDS)}
+
+    dac = DACController()
+    relay = RelayController()
+    generator = WaveformGenerator()
+    voltage = _Output(0.0)
+    current = _Output(4.0)
+
+    def apply(command, now):
+        op, a, b, c, d = (command["op"], float(command["a"]), float(command["b"]),
+                          float(command["c"]), float(command["d"]))
+        if op == OP_SET_VOLTAGE:
+            voltage.constant(a)
+        elif op == OP_SET_CURRENT:
+            current.constant(a)
+        elif op == OP_WAVE_VOLTAGE:
+            voltage.wave(int(a), b, c, d, now)
+        elif op == OP_WAVE_CURRENT:
+            current.wave(int(a), b, c, d, now)
+        elif op == OP_RAMP_VOLTAGE:
+            voltage.ramp(a, b, c, now)
+        elif op == OP_RAMP_CURRENT:
+            current.ramp(a, b, c, now)
+        elif op == OP_RELAY:
+            # force_off eerst: stop() zou op de schakel thread wachten
+            relay.force_off()
+            if a > 0:
+                relay.start_switching(a)
+            elif a < 0:
+                relay.set_state(True)
+            status[field["relay_frequency"]] = a
+        elif op == OP_STOP_ALL:
+            voltage.constant(0.0)
+            current.constant(4.0)
+            relay.force_off()
+            status[field["relay_frequency"]] = 0
+        elif op == OP_SHUTDOWN:
+            return False
+        return True
+
+    rt_priority, locked = _make_realtime(priority)
+    status[field["rt_priority"]] = rt_priority
+    status[field["memory_locked"]] = locked
+
+    # Alles wat nu bestaat is permanent; geen GC pauzes in de loop
+    gc.collect()
+    gc.freeze()
+    gc.disable()
+
+    status[field["alive"]] = 1
+    running = True
+    next_time = time.monotonic()
+    ticks = 0
+    try:
+        while running:
+            now = time.monotonic()
+            lateness = now - next_time
+            if lateness > status[field["max_lateness"]]:
+                status[field["max_lateness"]] = lateness
+            if lateness > tick:
+                status[field["overruns"]] += 1
+                next_time = now  # Gemiste ticks niet inhalen
+
+            # Commando's van de control kant
+            while True:
+                command = commands.pop()
+                if command is None:
+                    break
+                status[field["commands"]] += 1
+                if not apply(command, next_time):
+                    running = False
+
+            # Outputs op het tijdraster (niet op het moment van wakker worden)
+            if dac.set_voltage_output(voltage.evaluate(generator, next_time)):
+                status[field["voltage"]] = voltage.value
+            if dac.set_current_output(current.evaluate(generator, next_time)):
+                status[field["current"]] = current.value
+            status[field["dac_failures"]] = dac.write_failures
+
+            ticks += 1
+            status[field["ticks"]] = ticks
+
+            # Stop als het control proces verdwenen is
+            if os.getppid() != parent_pid:
+                print("⚠ RT engine: control proces verdwenen")
+                running = False
+
+            # Opgespaarde jonge objecten opruimen als er ruim tijd over is
+            if ticks % 1000 == 0 and time.monotonic() - next_time < tick / 2:
+                gc.collect(0)
+
+            next_time += tick
+            remaining = next_time - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+    finally:
+        # Veilige toestand, ook bij een exception
+        relay.force_off()
+        dac.set_current_output(4.0)
+        dac.set_voltage_output(0.0)
+        status[field["alive"]] = 0
+        gc.enable()
+        del status
+        commands.close()
+        status_shm.close()
+
+
+class RealtimeEngine:
+    """Control kant van de real-time engine"""
+
+    def __init__(self, tick=0.01, priority=80, command_capacity=256,
+                 sample_capacity=65536):
+        """
+        Initialiseer engine (nog niet gestart)
+
+        Args:
+            tick: Periode van de output loop in seconden
+            priority: SCHED_FIFO prioriteit (1-99)
+            command_capacity: Aantal commando's in de ring
+            sample_capacity: Aantal ADC samples in de ring
+        """
+        self.tick = tick
+        self.priority = priority
+        self.command_capacity = command_capacity
+        self.sample_capacity = sample_capacity
+        self.process = None
+        self.acquisition = None
+
+    def start(self):
+        """
+        Start het engine proces en het acquisitie proces
+
+        Returns:
+            True als beide processen draaien; anders worden ze gestopt en
+            het shared memory vrijgegeven
+        """
+        self.commands = ShmRing(COMMAND, self.command_capacity)
+        self.adc_commands = ShmRing(COMMAND, self.command_capacity)
+        self.samples = ShmRing(SAMPLE, self.sample_capacity)
+        self._status_shm = shared_memory.SharedMemory(
+            create=True, size=len(STATUS_FIELDS) * 8)
+        self._status = np.ndarray(len(STATUS_FIELDS), dtype=np.float64,
+                                  buffer=self._status_shm.buf)
+        self._status[:] = 0
+
+        # spawn: een schoon proces zonder de threads van de control kant
+        context = multiprocessing.get_context("spawn")
+        self.process = context.Process(
+            target=_engine_main, name="rt_engine", daemon=True,
+            args=(self.commands.name, self._status_shm.name,
+                  self.tick, self.priority, os.getpid()))
+        self.acquisition = context.Process(
+            target=_acquisition_main, name="rt_acquisition", daemon=True,
+            args=(self.adc_commands.name, self.samples.name, self._status_shm.name,
+                  os.getpid()))
+        self.process.start()
+        self.acquisition.start()
+
+        alive = [STATUS_FIELDS.index("alive"), STATUS_FIELDS.index("adc_alive")]
+        deadline = time.monotonic() + 10.0
+        while (not self._status[alive].all() and self.process.is_alive() and
+               self.acquisition.is_alive() and time.monotonic() < deadline):
+            time.sleep(0.01)
+        if not self._status[alive].all():
+            print("✗ RT engine niet gestart")
+            self._shutdown(0.0)
+            return False
+        print(f"✓ RT engine gestart (pid {self.process.pid}, acquisitie pid "
+              f"{self.acquisition.pid}, tick {self.tick * 1000:.1f}ms)")
+        return True
+
+    def _send(self, op, a=0.0, b=0.0, c=0.0, d=0.0):
+        """Zet een commando in de ring; False als de ring vol is"""
+        return self.commands.push((op, a, b, c, d))
+
+    def _send_adc(self, op, a=0.0, b=0.0, c=0.0, d=0.0):
+        """Zet een commando in de ring van het acquisitie proces"""
+        return self.adc_commands.push((op, a, b, c, d))
+
+    def set_voltage(self, voltage):
+        return self._send(OP_SET_VOLTAGE, voltage)
+
+    def set_current(self, current_ma):
+        return self._send(OP_SET_CURRENT, current_ma)
+
+    def voltage_waveform(self, wave_type, min_v, max_v, frequency):
+        return self._send(OP_WAVE_VOLTAGE, WAVES.index(wave_type), min_v, max_v, frequency)
+
+    def current_waveform(self, wave_type, min_i, max_i, frequency):
+        return self._send(OP_WAVE_CURRENT, WAVES.index(wave_type), min_i, max_i, frequency)
+
+    def voltage_ramp(self, start_v, end_v, duration):
+        return self._send(OP_RAMP_VOLTAGE, start_v, end_v, duration)
+
+    def current_ramp(self, start_i, end_i, duration):
+        return self._send(OP_RAMP_CURRENT, start_i, end_i, duration)
+
+    def relay(self, frequency=0.0, on=False):
+        """Relay schakelen op frequency Hz, of constant AAN/UIT bij frequency=0"""
+        return self._send(OP_RELAY, frequency if frequency > 0 else (-1.0 if on else 0.0))
+
+    def adc_stream(self, channel, data_rate=860, block_size=32):
+        return self._send_adc(OP_ADC_STREAM, channel, data_rate, block_size)
+
+    def adc_stop(self):
+        return self._send_adc(OP_ADC_STOP)
+
+    def stop_all(self):
+        return self._send(OP_STOP_ALL)
+
+    def read_samples(self, limit=None):
+        """
+        Haal de ontvangen ADC samples op
+
+        Returns:
+            Structured array met velden t, channel en value (Volt)
+        """
+        return self.samples.pop_all(limit)
+
+    def status(self):
+        """Status van de engine als dict"""
+        return dict(zip(STATUS_FIELDS, self._status.tolist()))
+
+    def stop(self, timeout=2.0):
+        """Stop de engine (outputs naar de veilige toestand) en ruim op"""
+        if self.process is None:
+            return
+        self._send(OP_SHUTDOWN)
+        self._send_adc(OP_SHUTDOWN)
+        self._shutdown(timeout)
+
+    def _shutdown(self, timeout):
+        """Wacht op (of beëindig) beide processen en geef het shared memory vrij"""
+        for process in (self.process, self.acquisition):
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join(max(timeout, 1.0))
+        self.process = None
+        self.acquisition = None
+        self.commands.close()
+        self.adc_commands.close()
+        self.samples.close()
+        self._status = None
+        self._status_shm.close()
+        self._status_shm.unlink()
+
+
+# Test functie
+if __name__ == "__main__":
+    print("Real-time Engine Test")
+    print("=" * 50)
+
+    engine = RealtimeEngine(tick=0.01)
+    if engine.start():
+        engine.voltage_waveform("sine", 0.5, 2.5, 1.0)
+        engine.adc_stream(0, data_rate=860, block_size=32)
+        time.sleep(1.0)
+        samples = engine.read_samples()
+        status = engine.status()
+        engine.stop()
+        print(f"  Ticks: {status['ticks']:.0f}, overruns: {status['overruns']:.0f}, "
+              f"max vertraging: {status['max_lateness'] * 1000:.2f}ms")
+        print(f"  Commando's: {status['commands']:.0f}, ADC samples: {len(samples)}, "
+              f"SCHED_FIFO: {status['rt_priority']:.0f}, mlockall: {bool(status['memory_locked'])}")
+
+    print("\n✓ Test voltooid")
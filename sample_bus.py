@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Sample Bus
+Gedeelde ADC sample stroom voor meerdere lokale processen
+
+Eén proces is eigenaar van de ADS1115 (de acquisitie owner) en schrijft
+elk ADC blok in een broadcast ringbuffer in shared memory. Elk ander
+lokaal proces (logger, live display, analyse) koppelt met een
+SampleBusReader en leest dezelfde stroom zonder kopie via numpy views.
+
+- De producent wacht nooit op consumenten; een consument die meer dan
+  de capaciteit achterloopt detecteert een overrun en gaat verder een
+  marge na het oudste nog beschikbare sample, zodat hij niet direct
+  weer ingehaald wordt (het aantal verloren samples wordt geteld).
+- Seqlock: de producent publiceert een reserveringsteller vóór het
+  kopiëren en de schrijfteller erna. Consumenten vergelijken met de
+  reserveringsteller, zodat een slot dat op dat moment overschreven
+  wordt nooit als geldig geldt; read(copy=True) controleert de kopie
+  achteraf en laat de overschreven samples vallen.
+- Elke consument heeft een eigen lees cursor; de cursors staan ook in
+  de header zodat de producent en status tools de achterstand zien.
+- Een view blijft geldig tot de producent capaciteit samples verder
+  is; overwritten() controleert dat achteraf.
+- Een tweede producent met dezelfde naam wordt geweigerd zolang de
+  eigenaar (pid in de header) nog leeft.
+
+Gebruik:
+    # Acquisitie owner
+    bus = SampleBusWriter(capacity=2**18)
+    bus.attach(controller.adc)
+    controller.adc.start_stream(0)
+
+    # Ander proces
+    reader = SampleBusReader()
+    records, lost = reader.read()
+    volts = records["value"]         # view, geen kopie
+"""
+
+import os
+import time
+import fcntl
+import numpy as np
+from multiprocessing import shared_memory
+from shm_ring import _attach
+
+
+DEFAULT_NAME = "imc_adc_bus"
+
+# Sample record: tijdstempel, kanaal, ruwe code en spanning
+SAMPLE = np.dtype([("t", np.float64), ("channel", np.uint8),
+                   ("raw", np.int16), ("value", np.float32)])
+
+MAX_CONSUMERS = 16
+
+# Header (uint64 woorden): producent tellers in een eigen cache line, daarna
+# per consument een cache line met [actief, cursor, overruns, pid]
+_WRITE = 0      # Samples tot hier zijn volledig geschreven
+_CAPACITY = 1
+_RESERVE = 2    # Samples tot hier zijn (of worden) geschreven
+_OWNER = 3      # pid van de producent
+_CONSUMER_BASE = 8
+_CONSUMER_STRIDE = 8
+_HEADER_WORDS = _CONSUMER_BASE + MAX_CONSUMERS * _CONSUMER_STRIDE
+
+
+def _load(header, index):
+    """
+    Lees een 64-bit teller consistent
+
+    Op de 32-bit ARM van de BeagleBone is een 64-bit store niet atomair;
+    lees tot twee opeenvolgende waarden gelijk zijn.
+    """
+    while True:
+        first = int(header[index])
+        if int(header[index]) == first:
+            return first
+
+
+class SampleBusWriter:
+    """Producent van de sample bus (één per systeem)"""
+
+    def __init__(self, name=DEFAULT_NAME, capacity=2**18):
+        """
+        Maak de sample bus aan
+
+        Args:
+            name: Naam van het shared memory blok
+            capacity: Aantal samples in de ring
+
+        Raises:
+            RuntimeError: Als een levende producent de bus al gebruikt
+        """
+        size = _HEADER_WORDS * 8 + capacity * SAMPLE.itemsize
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            existing = _attach(name)
+            owner = 0
+            if existing.size >= _HEADER_WORDS * 8:
+                owner = int(np.ndarray(1, dtype=np.uint64, buffer=existing.buf,
+                                       offset=_OWNER * 8)[0])
+            existing.close()
+            if _pid_alive(owner):
+                raise RuntimeError(f"Sample bus {name} is in gebruik door pid {owner}")
+            # Overblijfsel van een vorige owner die niet netjes stopte
+            existing.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.name = name
+        self.capacity = capacity
+        self._header = np.ndarray(_HEADER_WORDS, dtype=np.uint64, buffer=self.shm.buf)
+        self._header[:] = 0
+        self._header[_CAPACITY] = capacity
+        self._header[_OWNER] = os.getpid()
+        self._data = np.ndarray(capacity, dtype=SAMPLE, buffer=self.shm.buf,
+                                offset=_HEADER_WORDS * 8)
+        self._write = 0
+        self._adc = None
+
+    def publish(self, timestamps, channel, raw, volts):
+        """
+        Schrijf een blok samples van één kanaal
+
+        Args:
+            timestamps: Tijdstempels (numpy array)
+            channel: Kanaal nummer (of array per sample)
+            raw: Ruwe ADC codes
+            volts: Spanningen
+        """
+        n = len(timestamps)
+        if n > self.capacity:
+            timestamps, raw, volts = timestamps[-self.capacity:], raw[-self.capacity:], volts[-self.capacity:]
+            if not np.isscalar(channel):
+                channel = channel[-self.capacity:]
+            n = self.capacity
+
+        # Reservering eerst: consumenten zien deze slots vanaf nu als ongeldig
+        self._header[_RESERVE] = self._write + n
+
+        start = self._write % self.capacity
+        first = min(n, self.capacity - start)
+        for lo, hi, offset in ((0, first, start), (first, n, 0)):
+            if hi <= lo:
+                continue
+            dest = self._data[offset:offset + hi - lo]
+            dest["t"] = timestamps[lo:hi]
+            dest["channel"] = channel if np.isscalar(channel) else channel[lo:hi]
+            dest["raw"] = raw[lo:hi]
+            dest["value"] = volts[lo:hi]
+
+        # Pas na het schrijven van de data zichtbaar maken
+        self._write += n
+        self._header[_WRITE] = self._write
+
+    def _on_block(self, channel, timestamps, raw):
+        """Block listener van de ADCController"""
+        if self._data is None:
+            return
+        self.publish(timestamps, channel, raw, self._adc.raw_to_voltage(raw, channel))
+
+    def attach(self, adc):
+        """Voed de bus met alle blokken (stream en scan) van een ADCController"""
+        self._adc = adc
+        adc.add_block_listener(self._on_block)
+
+    def detach(self):
+        """Stop met voeden"""
+        if self._adc:
+            self._adc.remove_block_listener(self._on_block)
+            self._adc = None
+
+    def consumers(self):
+        """
+        Actieve consumenten en hun achterstand
+
+        Returns:
+            List met dicts (slot, pid, lag, overruns)
+        """
+        result = []
+        for slot in range(MAX_CONSUMERS):
+            base = _CONSUMER_BASE + slot * _CONSUMER_STRIDE
+            if self._header[base]:
+                result.append({
+                    "slot": slot,
+                    "pid": int(self._header[base + 3]),
+                    "lag": self._write - _load(self._header, base + 1),
+                    "overruns": int(self._header[base + 2]),
+                })
+        return result
+
+    def close(self):
+        """Stop de bus en geef het geheugen vrij"""
+        self.detach()
+        self._header = None
+        self._data = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SampleBusReader:
+    """Consument van de sample bus"""
+
+    def __init__(self, name=DEFAULT_NAME, from_start=False, margin=None):
+        """
+        Koppel aan de sample bus
+
+        Args:
+            name: Naam van het shared memory blok
+            from_start: True = begin bij het oudste beschikbare sample
+                        (plus de marge), False = alleen nieuwe samples
+            margin: Afstand tot het oudste sample bij from_start en na
+                    een overrun (default: 1/16 van de capaciteit)
+        """
+        self.shm = _attach(name)
+        self._header = np.ndarray(_HEADER_WORDS, dtype=np.uint64, buffer=self.shm.buf)
+        self.capacity = int(self._header[_CAPACITY])
+        self._data = np.ndarray(self.capacity, dtype=SAMPLE, buffer=self.shm.buf,
+                                offset=_HEADER_WORDS * 8)
+
+        self.margin = self.capacity // 16 if margin is None else margin
+
+        write = _load(self._header, _WRITE)
+        self.cursor = self._resume_point(write) if from_start else write
+        self.lost = 0
+        self._view_start = self.cursor
+        self._slot = self._claim_slot(name)
+
+    def _claim_slot(self, name):
+        """Reserveer een cursor slot in de header (alleen bij het koppelen)"""
+        lock_path = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else "/tmp",
+                                 f"{name}.lock")
+        with open(lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            for slot in range(MAX_CONSUMERS):
+                base = _CONSUMER_BASE + slot * _CONSUMER_STRIDE
+                pid = int(self._header[base + 3])
+                # Vrij slot, of een slot van een proces dat niet meer bestaat
+                if not self._header[base] or not _pid_alive(pid):
+                    self._header[base + 1] = self.cursor
+                    self._header[base + 2] = 0
+                    self._header[base + 3] = os.getpid()
+                    self._header[base] = 1
+                    return base
+        print(f"⚠ Sample bus: geen vrij consumer slot (maximaal {MAX_CONSUMERS})")
+        return None
+
+    def _resume_point(self, write):
+        """Eerste sample om te lezen na een overrun (of bij from_start)"""
+        oldest = _load(self._header, _RESERVE) - self.capacity
+        return min(max(oldest + self.margin, 0), write)
+
+    def _overrun(self, resume):
+        """Sla de samples tot resume over en tel ze als verloren"""
+        lost = resume - self.cursor
+        self.lost += lost
+        self.cursor = resume
+        if self._slot is not None:
+            self._header[self._slot + 2] += 1
+        return lost
+
+    def read(self, max_samples=None, copy=False):
+        """
+        Lees de nieuwe samples
+
+        Bij een ringgrens wordt alleen het deel tot het einde van de ring
+        teruggegeven; de volgende aanroep levert de rest.
+
+        Args:
+            max_samples: Maximaal aantal samples
+            copy: False = view zonder kopie (controleer na verwerking met
+                  overwritten()), True = kopie die na het kopiëren tegen de
+                  reserveringsteller gecontroleerd is
+
+        Returns:
+            Tuple (records, lost): structured array (velden t, channel,
+            raw, value) en het aantal samples dat sinds de vorige read
+            verloren is door een overrun
+        """
+        write = _load(self._header, _WRITE)
+        lost = 0
+        if self.cursor < _load(self._header, _RESERVE) - self.capacity:
+            lost = self._overrun(self._resume_point(write))
+
+        count = write - self.cursor
+        if max_samples is not None:
+            count = min(count, max_samples)
+        start = self.cursor % self.capacity
+        count = min(count, self.capacity - start)
+
+        records = self._data[start:start + count]
+        self._view_start = self.cursor
+        self.cursor += count
+        if copy:
+            records = records.copy()
+            # Samples die tijdens het kopiëren gereserveerd werden vallen af
+            clobbered = _load(self._header, _RESERVE) - self.capacity - self._view_start
+            if clobbered > 0:
+                clobbered = min(clobbered, count)
+                records = records[clobbered:]
+                self._view_start += clobbered
+                self.lost += clobbered
+                lost += clobbered
+                if self._slot is not None:
+                    self._header[self._slot + 2] += 1
+        if self._slot is not None:
+            self._header[self._slot + 1] = self.cursor
+        return records, lost
+
+    def overwritten(self):
+        """
+        Controleer of de laatst gelezen view inmiddels overschreven is
+
+        Returns:
+            True als de producent de view (deels) overschreven heeft;
+            de verwerkte data is dan onbetrouwbaar
+        """
+        return _load(self._header, _RESERVE) - self.capacity > self._view_start
+
+    def wait(self, timeout=1.0, poll=0.001):
+        """
+        Wacht tot er nieuwe samples zijn
+
+        Returns:
+            True als er samples beschikbaar zijn
+        """
+        deadline = time.monotonic() + timeout
+        while _load(self._header, _WRITE) == self.cursor:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+    def close(self):
+        """Ontkoppel van de bus en geef het cursor slot vrij"""
+        if self._slot is not None and self._header is not None:
+            self._header[self._slot] = 0
+        self._header = None
+        self._data = None
+        self.shm.close()
+
+
+def _pid_alive(pid):
+    """True als er een proces met dit pid bestaat"""
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Test functie
+if __name__ == "__main__":
+    print("Sample Bus Test")
+    print("=" * 50)
+
+    writer = SampleBusWriter(name="imc_adc_bus_test", capacity=1024)
+    fast = SampleBusReader(name="imc_adc_bus_test")
+    slow = SampleBusReader(name="imc_adc_bus_test")
+
+    received = 0
+    for block in range(40):
+        t = time.monotonic() + np.arange(64) / 860.0
+        raw = np.arange(block * 64, (block + 1) * 64, dtype=np.int16)
+        writer.publish(t, 0, raw, raw * 0.000125)
+        while True:
+            records, _ = fast.read()
+            if not len(records):
+                break
+            received += len(records)
+
+    records, lost = slow.read()
+    print(f"  Snelle consument: {received} samples, {fast.lost} verloren")
+    print(f"  Trage consument:  {lost} verloren, daarna vanaf raw {records['raw'][0]}")
+    print(f"  Consumenten: {writer.consumers()}")
+
+    fast.close()
+    slow.close()
+    writer.close()
+
+    print("\n✓ Test voltooid")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Shared Memory Ring
+Lock-vrije ringbuffer tussen twee processen (één producent, één consument)
+
+De ring staat in een multiprocessing.shared_memory blok: een header met
+de schrijf- en leesteller en een numpy structured array met de records.
+Alleen de producent schrijft de schrijfteller en alleen de consument de
+leesteller, dus er zijn geen locks nodig. De tellers lopen door (64-bit)
+en de slot index is teller % capaciteit. Een record wordt eerst
+volledig geschreven voordat de schrijfteller verhoogd wordt.
+
+De tellers staan elk in een eigen cache line om false sharing tussen de
+processen te voorkomen.
+"""
+
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+
+_HEADER_BYTES = 128
+_WRITE = 0   # Index van de schrijfteller in de header (uint64)
+_READ = 8    # Index van de leesteller (64 bytes verder)
+
+
+def _attach(name):
+    """
+    Koppel aan een bestaand shared memory blok zonder het te registreren
+
+    Voor Python 3.13 registreert elke koppeling het blok bij de resource
+    tracker, die het dan bij het einde van het koppelende proces opruimt
+    terwijl de eigenaar het nog gebruikt. Alleen de eigenaar registreert.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class ShmRing:
+    """SPSC ringbuffer met vaste record grootte in shared memory"""
+
+    def __init__(self, dtype, capacity=None, name=None):
+        """
+        Maak een nieuwe ring (name=None) of koppel aan een bestaande
+
+        Args:
+            dtype: numpy dtype van een record
+            capacity: Aantal records (alleen bij aanmaken)
+            name: Naam van een bestaand shared memory blok
+        """
+        self.dtype = np.dtype(dtype)
+        if name is None:
+            size = _HEADER_BYTES + capacity * self.dtype.itemsize
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = _attach(name)
+            self.owner = False
+            capacity = (self.shm.size - _HEADER_BYTES) // self.dtype.itemsize
+
+        self.capacity = capacity
+        self._header = np.ndarray(16, dtype=np.uint64, buffer=self.shm.buf)
+        self._data = np.ndarray(capacity, dtype=self.dtype, buffer=self.shm.buf,
+                                offset=_HEADER_BYTES)
+        if self.owner:
+            self._header[:] = 0
+        self.dropped = 0  # Records die niet pasten (lokaal bij de producent)
+
+    @property
+    def name(self):
+        """Naam om vanuit het andere proces te koppelen"""
+        return self.shm.name
+
+    def __len__(self):
+        return int(self._header[_WRITE] - self._header[_READ])
+
+    # Producent
+
+    def push(self, record):
+        """
+        Voeg één record toe
+
+        Args:
+            record: Tuple met de velden van het dtype
+
+        Returns:
+            False als de ring vol is (record niet toegevoegd)
+        """
+        write = int(self._header[_WRITE])
+        if write - int(self._header[_READ]) >= self.capacity:
+            self.dropped += 1
+            return False
+        self._data[write % self.capacity] = record
+        self._header[_WRITE] = write + 1
+        return True
+
+    def push_many(self, **fields):
+        """
+        Voeg een blok records toe (gevectoriseerd)
+
+        Records die niet passen worden weggegooid (het nieuwste deel).
+
+        Args:
+            **fields: numpy array per veld, allemaal even lang
+
+        Returns:
+            Aantal toegevoegde records
+        """
+        n = len(next(iter(fields.values())))
+        write = int(self._header[_WRITE])
+        free = self.capacity - (write - int(self._header[_READ]))
+        count = min(n, free)
+        self.dropped += n - count
+        if count <= 0:
+            return 0
+
+        slots = (write + np.arange(count)) % self.capacity
+        for field, values in fields.items():
+            self._data[field][slots] = values[:count]
+        self._header[_WRITE] = write + count
+        return count
+
+    # Consument
+
+    def pop(self):
+        """
+        Haal het oudste record op
+
+        Returns:
+            numpy record (kopie) of None als de ring leeg is
+        """
+        read = int(self._header[_READ])
+        if read == int(self._header[_WRITE]):
+            return None
+        record = self._data[read % self.capacity].copy()
+        self._header[_READ] = read + 1
+        return record
+
+    def pop_all(self, limit=None):
+        """
+        Haal alle beschikbare records op
+
+        Args:
+            limit: Maximaal aantal records
+
+        Returns:
+            numpy structured array (kopie, oudste eerst)
+        """
+        read = int(self._header[_READ])
+        count = int(self._header[_WRITE]) - read
+        if limit is not None:
+            count = min(count, limit)
+        if count <= 0:
+            return np.empty(0, dtype=self.dtype)
+        slots = (read + np.arange(count)) % self.capacity
+        records = self._data[slots]  # Fancy indexing maakt een kopie
+        self._header[_READ] = read + count
+        return records
+
+    def close(self):
+        """Ontkoppel; de eigenaar geeft het geheugen ook vrij"""
+        self._header = None
+        self._data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+_TEST_SAMPLE = np.dtype([("t", np.float64), ("value", np.float32)])
+
+
+def _test_producer(name, n):
+    """Producent proces voor de test"""
+    import time
+    ring = ShmRing(_TEST_SAMPLE, name=name)
+    sent = 0
+    while sent < n:
+        chunk = min(100, n - sent)
+        values = np.arange(sent, sent + chunk, dtype=np.float32)
+        sent += ring.push_many(t=np.full(chunk, time.monotonic()), value=values)
+    ring.close()
+
+
+# Test functie
+if __name__ == "__main__":
+    import time
+    import multiprocessing
+
+    print("Shared Memory Ring Test")
+    print("=" * 50)
+
+    ring = ShmRing(_TEST_SAMPLE, capacity=1024)
+    process = multiprocessing.get_context("spawn").Process(
+        target=_test_producer, args=(ring.name, 100000))
+    start = time.monotonic()
+    process.start()
+
+    received = []
+    while process.is_alive() or len(ring):
+        records = ring.pop_all()
+        if len(records):
+            received.append(records["value"])
+    process.join()
+    values = np.concatenate(received)
+    print(f"  {len(values)} records in {time.monotonic() - start:.2f}s, "
+          f"volgorde correct: {bool(np.all(np.diff(values) == 1))}")
+    ring.close()
+
+    print("\n✓ Test voltooid")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Step Response Meting
+Meet rise time, overshoot en settling time van de voltage en current output
+
+Een DAC stap wordt uitgevoerd tijdens een continuous ADC opname op maximale
+data rate. De tijdstempel van de DAC write ligt op dezelfde time.monotonic()
+tijdbasis als de samples, zodat alle tijden relatief aan de write zijn.
+"""
+
+import time
+import numpy as np
+from calibration import measurement_setup
+
+
+class StepResponseMeter:
+    """Meet de stapresponsie van de analoge output trappen"""
+
+    RISE_LOW = 0.1       # 10% niveau voor rise time
+    RISE_HIGH = 0.9      # 90% niveau voor rise time
+    SETTLE_BAND = 0.02   # Settling band (+/- 2% van de stapgrootte)
+
+    def __init__(self, dac, adc, data_rate=None, pre_samples=16, post_samples=256):
+        """
+        Initialiseer step response meter
+
+        Args:
+            dac: DACController instantie
+            adc: ADCController instantie
+            data_rate: ADC data rate (default: maximale data rate)
+            pre_samples: Samples voor de stap (basislijn)
+            post_samples: Samples na de stap
+        """
+        self.dac = dac
+        self.adc = adc
+        self.data_rate = data_rate or adc.MAX_DATA_RATE
+        self.pre_samples = pre_samples
+        self.post_samples = post_samples
+
+    def capture_step(self, output, start_value, end_value, settle_time=0.05):
+        """
+        Voer een enkele stap uit en neem de responsie op
+
+        Args:
+            output: 'voltage' of 'current'
+            start_value: Beginwaarde (V of mA)
+            end_value: Eindwaarde (V of mA)
+            settle_time: Wachttijd op de beginwaarde voor de opname
+
+        Returns:
+            Tuple (t, values): tijd relatief aan de DAC write (s) en
+            gemeten waarden (V of mA)
+        """
+        setter, adc_channel, scale = measurement_setup(self.dac, output)
+
+        setter(start_value)
+        time.sleep(settle_time)
+
+        write_time = [0.0]
+
+        def step():
+            # Midden van de I2C write als referentie tijdstip
+            before = time.monotonic()
+            setter(end_value)
+            write_time[0] = (before + time.monotonic()) / 2.0
+
+        timestamps, raw = self.adc.capture_block(
+            adc_channel, self.pre_samples + self.post_samples,
+            data_rate=self.data_rate, trigger=step,
+            trigger_index=self.pre_samples)
+
+        t = timestamps - write_time[0]
+        values = self.adc.raw_to_voltage(raw.astype(np.float64), adc_channel) * scale
+        return t, values
+
+    def analyze(self, t, values):
+        """
+        Bereken stapresponsie parameters voor een of meer stappen
+
+        Alle berekeningen zijn gevectoriseerd over de stappen (rijen).
+
+        Args:
+            t: Tijd relatief aan de write, shape (n_samples,) of (n_steps, n_samples)
+            values: Gemeten waarden, zelfde shape als t
+
+        Returns:
+            dict met numpy arrays per stap: 'initial', 'final', 'rise_time',
+            'overshoot' (%), 'settling_time' (s, vanaf de write)
+        """
+        t = np.atleast_2d(t)
+        values = np.atleast_2d(values)
+        n_post = values.shape[1] - self.pre_samples
+        post = values[:, self.pre_samples:]
+        t_post = t[:, self.pre_samples:]
+        rows = np.arange(values.shape[0])
+
+        initial = values[:, :self.pre_samples].mean(axis=1)
+        final = post[:, -max(n_post // 4, 1):].mean(axis=1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Genormaliseerde responsie: 0 = beginwaarde, 1 = eindwaarde
+            norm = (post - initial[:, None]) / (final - initial)[:, None]
+
+            def crossing_time(level):
+                # Eerste sample boven level, lineair geïnterpoleerd
+                above = norm >= level
+                idx = np.argmax(above, axis=1)
+                prev = np.maximum(idx - 1, 0)
+                y0, y1 = norm[rows, prev], norm[rows, idx]
+                t0, t1 = t_post[rows, prev], t_post[rows, idx]
+                frac = np.where(y1 != y0, (level - y0) / (y1 - y0), 0.0)
+                result = t0 + np.clip(frac, 0.0, 1.0) * (t1 - t0)
+                return np.where(above.any(axis=1), result, np.nan)
+
+            rise_time = crossing_time(self.RISE_HIGH) - crossing_time(self.RISE_LOW)
+            overshoot = np.maximum(np.fmax.reduce(norm, axis=1) - 1.0, 0.0) * 100.0
+
+            # Settling: eerste sample waarna de responsie binnen de band blijft
+            outside = np.abs(norm - 1.0) > self.SETTLE_BAND
+            last_outside = n_post - 1 - np.argmax(outside[:, ::-1], axis=1)
+            settle_idx = np.where(outside.any(axis=1),
+                                  np.minimum(last_outside + 1, n_post - 1), 0)
+            settling_time = t_post[rows, settle_idx]
+            settling_time[outside[:, -1]] = np.nan  # Niet gesetteld in het venster
+
+        return {
+            "initial": initial,
+            "final": final,
+            "rise_time": rise_time,
+            "overshoot": overshoot,
+            "settling_time": settling_time,
+        }
+
+    def measure_steps(self, output, steps, repeats=1, settle_time=0.05):
+        """
+        Meet een reeks stappen en analyseer ze in een keer
+
+        Args:
+            output: 'voltage' of 'current'
+            steps: Lijst met (start_value, end_value) tuples
+            repeats: Aantal herhalingen per stap
+            settle_time: Wachttijd op de beginwaarde per stap
+
+        Returns:
+            dict met 'steps' (n_steps x 2), 't' en 'values' (n_steps x n_samples)
+            en de parameters van analyze() per stap
+        """
+        all_steps = [step for step in steps for _ in range(repeats)]
+        n_samples = self.pre_samples + self.post_samples
+        t = np.empty((len(all_steps), n_samples))
+        values = np.empty((len(all_steps), n_samples))
+
+        for i, (start_value, end_value) in enumerate(all_steps):
+            t[i], values[i] = self.capture_step(output, start_value, end_value,
+                                                settle_time)
+
+        result = self.analyze(t, values)
+        result["steps"] = np.asarray(all_steps, dtype=np.float64)
+        result["t"] = t
+        result["values"] = values
+        return result
+
+    @staticmethod
+    def max_update_rate(result):
+        """
+        Bepaal de hoogste update rate die de analoge trap kan volgen
+
+        Args:
+            result: Resultaat van measure_steps() of analyze()
+
+        Returns:
+            Update rate in Hz (1 / slechtste settling time), of None als
+            geen enkele stap gesetteld is
+        """
+        settling = result["settling_time"]
+        if np.all(np.isnan(settling)):
+            return None
+        worst = np.nanmax(settling)
+        if worst <= 0:
+            return None
+        return 1.0 / worst
+
+
+# Test functie
+if __name__ == "__main__":
+    from dac_controller import DACController
+    from adc_controller import ADCController
+
+    print("Step Response Meting")
+    print("=" * 50)
+
+    dac = DACController()
+    adc = ADCController()
+    meter = StepResponseMeter(dac, adc)
+
+    tests = [
+        ("voltage", [(0.0, 3.0), (3.0, 0.0), (1.0, 2.0), (2.0, 1.0)], "V"),
+        ("current", [(4.0, 20.0), (20.0, 4.0), (8.0, 16.0), (16.0, 8.0)], "mA"),
+    ]
+
+    for output, steps, unit in tests:
+        print(f"\n{output} output ({len(steps)} stappen x 5):")
+        result = meter.measure_steps(output, steps, repeats=5)
+        for i, (start_value, end_value) in enumerate(result["steps"][::5]):
+            sl = slice(i * 5, (i + 1) * 5)
+            print(f"  {start_value:5.2f} -> {end_value:5.2f}{unit}: "
+                  f"rise={np.nanmean(result['rise_time'][sl]) * 1000:6.2f}ms  "
+                  f"overshoot={np.nanmean(result['overshoot'][sl]):5.1f}%  "
+                  f"settling={np.nanmax(result['settling_time'][sl]) * 1000:6.2f}ms")
+        rate = meter.max_update_rate(result)
+        if rate:
+            print(f"  -> Maximale update rate: {rate:.0f}Hz")
+        else:
+            print("  -> Geen gesettelde stappen gemeten")
+
+    dac.reset_all()
+    print("\n✓ Test voltooid")
@@ -36,7 +36,22 @@ class WaveformGenerator:
         """
         current_time = time.time()
         elapsed = current_time - self.start_time
+        return self.value_at(wave_type, min_value, max_value, frequency, elapsed)
+    
+    def value_at(self, wave_type, min_value, max_value, frequency, elapsed):
+        """
+        Waarde van een golfvorm op een gegeven tijdstip
         
+        Args:
+            wave_type: Type golfvorm ('sine', 'triangle', 'square', 'sawtooth')
+            min_value: Minimum waarde
+            max_value: Maximum waarde
+            frequency: Frequentie in Hz
+            elapsed: Tijd sinds de start van de golfvorm in seconden
+            
+        Returns:
+            Waarde van de golfvorm
+        """
         # Bereken fase (0 tot 1) voor huidige cyclus
         phase = (elapsed * frequency) % 1.0
         